@@ -0,0 +1,131 @@
+"""Long-lived local Chrome that the scrapers attach to instead of launching their own.
+
+    python browser_daemon.py start    # launch Chrome with a persistent profile + disk cache
+    python browser_daemon.py status
+    python browser_daemon.py stop
+
+While it is running, driver_factory.create_driver() attaches to it through
+the DevTools port, so scripts skip Chrome startup and find cookies, cache and
+already-open tabs from earlier runs.
+"""
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = int(os.environ.get('SCRAPER_BROWSER_PORT', 9222))
+PROFILE_DIR = os.path.join(os.getcwd(), 'browser_profile')
+CACHE_DIR = os.path.join(PROFILE_DIR, 'disk_cache')
+PID_FILE = os.path.join(PROFILE_DIR, 'daemon.pid')
+# ใส่ False ถ้าต้องการเห็นหน้าต่าง Chrome
+HEADLESS = True
+
+CHROME_CANDIDATES = [
+    os.environ.get('CHROME_PATH', ''),
+    r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+    r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    'google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome',
+]
+
+
+def debugger_address():
+    return f"{DAEMON_HOST}:{DAEMON_PORT}"
+
+
+def is_running(timeout=1):
+    """True if a browser is answering on the DevTools port"""
+    try:
+        with urllib.request.urlopen(f"http://{debugger_address()}/json/version", timeout=timeout) as resp:
+            return resp.status == 200
+    except Exception:
+        return False
+
+
+def find_chrome():
+    for candidate in CHROME_CANDIDATES:
+        if not candidate:
+            continue
+        path = candidate if os.path.isabs(candidate) else shutil.which(candidate)
+        if path and os.path.exists(path):
+            return path
+    raise FileNotFoundError("Chrome not found; set CHROME_PATH to the browser executable")
+
+
+def start():
+    if is_running():
+        print(f"Browser daemon already running on {debugger_address()}")
+        return
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    args = [
+        find_chrome(),
+        f'--remote-debugging-port={DAEMON_PORT}',
+        f'--user-data-dir={PROFILE_DIR}',
+        f'--disk-cache-dir={CACHE_DIR}',
+        '--no-first-run',
+        '--no-default-browser-check',
+        '--disable-dev-shm-usage',
+        '--disable-blink-features=AutomationControlled',
+    ]
+    if HEADLESS:
+        args += ['--headless=new', '--disable-gpu']
+
+    # แยก process ออกจาก terminal เพื่อให้ Chrome อยู่ต่อหลังสคริปต์นี้จบ
+    if os.name == 'nt':
+        flags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        process = subprocess.Popen(args, creationflags=flags, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        process = subprocess.Popen(args, start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    with open(PID_FILE, 'w') as f:
+        f.write(str(process.pid))
+
+    for _ in range(30):
+        if is_running():
+            print(f"✅ Browser daemon started (pid {process.pid}) on {debugger_address()}")
+            return
+        time.sleep(0.5)
+    print("❌ Browser daemon did not open its DevTools port in time")
+
+
+def status():
+    if not is_running():
+        print("Browser daemon is not running")
+        return
+    with urllib.request.urlopen(f"http://{debugger_address()}/json/list", timeout=2) as resp:
+        tabs = [t for t in json.load(resp) if t.get('type') == 'page']
+    print(f"Browser daemon running on {debugger_address()} with {len(tabs)} tab(s):")
+    for tab in tabs:
+        print(f"  - {tab.get('url')}")
+
+
+def stop():
+    if not os.path.exists(PID_FILE):
+        print("No pid file; browser daemon was not started by this script")
+        return
+    with open(PID_FILE) as f:
+        pid = int(f.read().strip())
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/PID', str(pid), '/T', '/F'], check=False)
+        else:
+            os.kill(pid, signal.SIGTERM)
+        print(f"Stopped browser daemon (pid {pid})")
+    except ProcessLookupError:
+        print(f"Browser daemon (pid {pid}) was not running")
+    os.remove(PID_FILE)
+
+
+if __name__ == "__main__":
+    commands = {'start': start, 'stop': stop, 'status': status}
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command not in commands:
+        print(f"Usage: python {os.path.basename(__file__)} [start|stop|status]")
+        sys.exit(1)
+    commands[command]()
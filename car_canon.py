@@ -0,0 +1,143 @@
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# ชื่อมาตรฐาน -> ชื่อแบบอื่นที่เจอในแต่ละเว็บ (ตัวพิมพ์เล็ก/ใหญ่ ช่องว่าง และขีดไม่มีผล)
+BRAND_ALIASES = {
+    "Audi": ["ออดี้"],
+    "BMW": ["บีเอ็มดับเบิลยู", "บีเอ็ม"],
+    "BYD": ["บีวายดี"],
+    "Chevrolet": ["Chevy", "เชฟโรเลต", "เชฟโรเล็ต"],
+    "Ford": ["ฟอร์ด"],
+    "GWM": ["Great Wall", "Great Wall Motor", "Ora", "เกรทวอลล์"],
+    "Honda": ["ฮอนด้า"],
+    "Hyundai": ["ฮุนได", "ฮุนไดย"],
+    "Isuzu": ["อีซูซุ"],
+    "Kia": ["เกีย"],
+    "Land Rover": ["Landrover", "แลนด์โรเวอร์"],
+    "Lexus": ["เล็กซัส"],
+    "Mazda": ["มาสด้า"],
+    "Mercedes-Benz": ["Mercedes", "Benz", "Mercedes Benz", "เมอร์เซเดส-เบนซ์", "เบนซ์"],
+    "MG": ["เอ็มจี"],
+    "Mini": ["มินิ"],
+    "Mitsubishi": ["มิตซูบิชิ"],
+    "Nissan": ["นิสสัน"],
+    "Porsche": ["ปอร์เช่"],
+    "Subaru": ["ซูบารุ"],
+    "Suzuki": ["ซูซูกิ"],
+    "Toyota": ["โตโยต้า"],
+    "Volkswagen": ["VW", "โฟล์คสวาเกน"],
+    "Volvo": ["วอลโว่"],
+}
+
+# ยี่ห้อมาตรฐาน -> {รุ่นมาตรฐาน: ชื่อแบบอื่น} รุ่นที่ไม่อยู่ในตารางจะผ่าน _tidy_name แทน
+MODEL_ALIASES = {
+    "Chevrolet": {"Captiva": [], "Colorado": [], "Cruze": [], "Trailblazer": ["Trail Blazer"]},
+    "Ford": {"EcoSport": [], "Everest": [], "Fiesta": [], "Focus": [], "Ranger": []},
+    "GWM": {"ORA Good Cat": ["Good Cat", "Ora Goodcat"]},
+    "Honda": {"Accord": [], "BR-V": [], "City": [], "Civic": [], "CR-V": [], "HR-V": [], "Jazz": []},
+    "Hyundai": {"Grand Starex": ["Starex"], "H-1": []},
+    "Isuzu": {"D-Max": ["Dmax", "D-Max V-Cross", "V-Cross"], "MU-X": ["Mux"]},
+    "Mazda": {"Mazda2": ["2"], "Mazda3": ["3"], "BT-50": [], "CX-3": [], "CX-30": [], "CX-5": [], "CX-8": []},
+    "Mercedes-Benz": {"A-Class": [], "C-Class": [], "CLA-Class": ["CLA"], "E-Class": [], "GLA-Class": ["GLA"],
+                      "GLC-Class": ["GLC"], "S-Class": []},
+    "MG": {"MG3": ["3"], "MG5": ["5"], "MG ZS": ["ZS"], "MG HS": ["HS"]},
+    "Mitsubishi": {"Attrage": [], "Mirage": [], "Pajero Sport": [], "Triton": [], "Xpander": []},
+    "Nissan": {"Almera": [], "Kicks": [], "Navara": [], "Note": [], "Sylphy": [], "Terra": []},
+    "Toyota": {"Alphard": [], "C-HR": [], "Camry": [], "Commuter": ["Hiace Commuter"],
+               "Corolla Altis": ["Altis"], "Corolla Cross": [], "Fortuner": [], "Hilux Revo": ["Revo"],
+               "Hilux Vigo": ["Vigo"], "Innova": ["Innova Crysta"], "Vellfire": [], "Vios": [],
+               "Yaris": [], "Yaris Ativ": ["Ativ"]},
+}
+
+_NOT_A_NAME = {"", "n/a", "nan", "none", "null", "-"}
+_KEY_NOISE = re.compile(r"\(.*?\)|[\s\-_./]+")
+
+
+def alias_key(text):
+    """คีย์สำหรับเทียบชื่อ: ตัวพิมพ์เล็ก ไม่มีช่องว่าง/ขีด/จุด และตัดหมายเหตุในวงเล็บ เช่น 'D-MAX(ปี11-18)' -> 'dmax'"""
+    return _KEY_NOISE.sub("", text).casefold()
+
+
+def _build_index(table):
+    index = {}
+    for canonical, aliases in table.items():
+        for name in [canonical, *aliases]:
+            index[alias_key(name)] = canonical
+    return index
+
+
+# ตารางค้นหาที่คำนวณไว้ล่วงหน้าตอน import
+_BRAND_INDEX = _build_index(BRAND_ALIASES)
+_MODEL_INDEX = {brand: _build_index(models) for brand, models in MODEL_ALIASES.items()}
+
+
+def _tidy_name(text):
+    """ชื่อที่ไม่อยู่ในตาราง: ยุบช่องว่าง และเปลี่ยนคำตัวใหญ่ล้วนยาวๆ (เช่น 'CAMRY') เป็น 'Camry'"""
+    words = text.split()
+    return " ".join(w.title() if w.isalpha() and w.isupper() and len(w) > 3 else w for w in words)
+
+
+def _is_name(raw):
+    return isinstance(raw, str) and raw.strip().casefold() not in _NOT_A_NAME
+
+
+@lru_cache(maxsize=None)
+def _canonical_brand(raw):
+    return _BRAND_INDEX.get(alias_key(raw)) or _tidy_name(raw)
+
+
+@lru_cache(maxsize=None)
+def _canonical_model(brand, raw):
+    index = _MODEL_INDEX.get(brand)
+    if index:
+        canonical = index.get(alias_key(raw))
+        if canonical:
+            return canonical
+    return _tidy_name(raw)
+
+
+def canonical_brand(raw):
+    """
+    ชื่อยี่ห้อมาตรฐาน เช่น 'HONDA', 'honda', 'ฮอนด้า' -> 'Honda'
+
+    ผลของแต่ละข้อความถูกจำไว้ (lru_cache) ข้อความเดิมจึงถูกแปลงเพียงครั้งเดียวต่อการรัน
+    ค่าที่ไม่ใช่ชื่อ (None, NaN, 'N/A', '') คืนค่าเดิม
+    """
+    if not _is_name(raw):
+        return raw
+    return _canonical_brand(raw.strip())
+
+
+def canonical_model(brand, raw):
+    """ชื่อรุ่นมาตรฐานของยี่ห้อ ``brand`` (ใช้ยี่ห้อมาตรฐานหรือดิบก็ได้) เช่น ('ISUZU', 'D-MAX(ปี11-18)') -> 'D-Max'"""
+    if not _is_name(raw):
+        return raw
+    brand = canonical_brand(brand)
+    return _canonical_model(brand if _is_name(brand) else "", raw.strip())
+
+
+def canonical_columns(brands, models):
+    """
+    แปลงคอลัมน์ Brand/Model ทั้งคอลัมน์ (pandas.Series) ค่าที่ซ้ำกันได้ผลจาก cache ทันที
+
+    Returns:
+        tuple: (Series ของยี่ห้อมาตรฐาน, Series ของรุ่นมาตรฐาน) ใช้ index เดียวกับข้อมูลเดิม
+    """
+    canonical_brands = pd.Series([canonical_brand(b) for b in brands], index=brands.index, dtype=object)
+    canonical_models = pd.Series([canonical_model(b, m) for b, m in zip(brands, models)],
+                                 index=models.index, dtype=object)
+    return canonical_brands, canonical_models
+
+
+def sub_model_from_name(full_name, *parts):
+    """
+    รุ่นย่อยจากชื่อเต็มของประกาศ โดยตัดยี่ห้อ/รุ่น/ปีออก (ตัดทั้งคำ ไม่สนตัวพิมพ์ เช่น 'TOYOTA Vios 2019 1.5 G' -> '1.5 G')
+    """
+    sub_model = full_name or ""
+    for part in parts:
+        if part in (None, ""):
+            continue
+        sub_model = re.sub(r"(?<!\S)" + re.escape(str(part)) + r"(?!\S)", " ", sub_model, count=1, flags=re.IGNORECASE)
+    return " ".join(sub_model.split())
@@ -0,0 +1,194 @@
+from operator import attrgetter
+
+import pandas as pd
+
+# Template 11 คอลัมน์ที่ทุกแหล่งข้อมูลต้องแปลงมาให้ตรงกัน
+COLUMNS = [
+    "Sources", "Brand", "Model", "Sub Model", "Year",
+    "Price", "Mileage", "Plate No.", "Seller Name", "Phone Number", "URL"
+]
+
+# ชื่อ attribute ของ CarRecord เรียงตรงกับ COLUMNS
+FIELDS = (
+    "sources", "brand", "model", "sub_model", "year",
+    "price", "mileage", "plate_no", "seller_name", "phone_number", "url"
+)
+
+# ค่าที่ใช้แทนข้อมูลที่ไม่มีใน Source (ในตารางเป็นค่าว่างจริง ใช้ 'N/A' เฉพาะตอนเขียน CSV)
+MISSING = "N/A"
+
+# dtype ของแต่ละคอลัมน์: ข้อความที่ซ้ำกันมากเป็น category, ตัวเลขเป็นแบบ nullable (ค่าว่างเป็น <NA>)
+DTYPES = {
+    "Sources": "category",
+    "Brand": "category",
+    "Model": "category",
+    "Sub Model": "string",
+    "Year": "Int64",
+    "Price": "Float64",
+    "Mileage": "Int64",
+    "Plate No.": "string",
+    "Seller Name": "string",
+    "Phone Number": "string",
+    "URL": "string",
+}
+
+_field_values = attrgetter(*FIELDS)
+
+
+class CarRecord:
+    """One car in template form
+
+    A slotted object instead of an 11-key dict: no per-row ``__dict__`` and
+    no repeated column-name keys. Records are meant to be appended to a
+    ColumnarBuilder straight away, not kept in a list.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, sources=MISSING, brand=MISSING, model=MISSING, sub_model=MISSING, year=MISSING,
+                 price=MISSING, mileage=MISSING, plate_no=MISSING, seller_name=MISSING,
+                 phone_number=MISSING, url=MISSING):
+        self.sources = sources
+        self.brand = brand
+        self.model = model
+        self.sub_model = sub_model
+        self.year = year
+        self.price = price
+        self.mileage = mileage
+        self.plate_no = plate_no
+        self.seller_name = seller_name
+        self.phone_number = phone_number
+        self.url = url
+
+    def values(self):
+        """Field values as a tuple in COLUMNS order"""
+        return _field_values(self)
+
+    def as_dict(self):
+        """The record keyed by template column name"""
+        return dict(zip(COLUMNS, self.values()))
+
+    def __repr__(self):
+        return f"CarRecord({self.as_dict()!r})"
+
+
+class ColumnarBuilder:
+    """Column buffers for the 11-column template
+
+    ``append`` pushes each field of a CarRecord onto its column list, so rows
+    are never held as dicts; ``to_frame`` hands the lists to pandas once,
+    already in template order. Builders are picklable, so a worker process
+    can return one and the parent ``merge``s it. ``to_frame(dtypes=False)``
+    leaves the raw values for chunks that are concatenated (and typed once
+    by concat_frames) later.
+    """
+
+    def __init__(self):
+        self.columns = {column: [] for column in COLUMNS}
+
+    def __len__(self):
+        return len(self.columns[COLUMNS[0]])
+
+    def append(self, record):
+        for buffer, value in zip(self.columns.values(), _field_values(record)):
+            buffer.append(value)
+
+    def extend(self, records):
+        buffers = list(self.columns.values())
+        for record in records:
+            for buffer, value in zip(buffers, _field_values(record)):
+                buffer.append(value)
+        return self
+
+    def merge(self, other):
+        for column, buffer in self.columns.items():
+            buffer.extend(other.columns[column])
+        return self
+
+    def clear(self):
+        for buffer in self.columns.values():
+            buffer.clear()
+
+    def to_frame(self, dtypes=True):
+        # ชิ้นดิบต้องเป็น object: ถ้า pandas เดา dtype เป็น string ให้ apply_dtypes จะข้ามคอลัมน์นั้นไป
+        df = pd.DataFrame(self.columns, columns=COLUMNS, dtype=object)
+        return apply_dtypes(df) if dtypes else df
+
+
+def _blank_to_na(values):
+    """ข้อความถูกตัดช่องว่างหัวท้าย ส่วน '', 'N/A', None และ NaN กลายเป็นค่าว่าง (None)"""
+    values = values.astype(object).map(lambda v: v.strip() if isinstance(v, str) else v)
+    return values.where(values.notna() & ~values.isin(["", MISSING]), None)
+
+
+def _to_number(values):
+    """ตัวเลขจากค่าที่อาจเป็นข้อความ เช่น '85,061' หรือ '85061 km' ค่าที่อ่านไม่ได้เป็น NaN"""
+    values = _blank_to_na(values)
+    text = values.map(lambda v: v if not isinstance(v, str) else
+                      v.replace(",", "").removesuffix("km").removesuffix("กม.").strip())
+    return pd.to_numeric(text, errors="coerce")
+
+
+def _has_dtype(values, dtype):
+    """True ถ้าคอลัมน์เป็น dtype ตาม DTYPES อยู่แล้ว (category ต้องมี categories เป็น string ด้วย)"""
+    # เทียบชื่อ dtype ตรงๆ: dtype 'str' ของ pandas 3 ถือว่าเท่ากับ "string" แต่ใช้ NaN แทน <NA>
+    if str(values.dtype) != dtype:
+        return False
+    # parquet อ่าน category กลับมาเป็น categories แบบ str/object ชื่อ dtype เหมือนกันแต่ไม่ตรงกับ template
+    return dtype != "category" or str(values.cat.categories.dtype) == "string"
+
+
+def apply_dtypes(df):
+    """
+    แปลงคอลัมน์ template ให้เป็น dtype ตาม DTYPES และเปลี่ยน 'N/A'/ค่าว่างเป็น null จริง
+
+    category ใช้หน่วยความจำน้อยและ groupby เร็ว, Int64/Float64 เก็บ null ได้โดยไม่ต้องเป็น object
+    เรียกซ้ำกับตารางที่แปลงแล้วได้ (เช่นหลัง pd.concat ซึ่งทำให้ category กลับเป็น object)
+    คอลัมน์ที่ไม่อยู่ใน template (เช่น Cluster ID) ไม่ถูกแตะ
+
+    Args:
+        df (pandas.DataFrame): ตารางที่มีคอลัมน์ตาม template
+
+    Returns:
+        pandas.DataFrame: ตารางใหม่ที่ใช้ dtype ตาม DTYPES
+    """
+    df = df.copy()
+    for column, dtype in DTYPES.items():
+        if column not in df or _has_dtype(df[column], dtype):
+            continue
+        values = df[column]
+        if dtype == "Int64":
+            df[column] = _to_number(values).round().astype("Int64")
+        elif dtype == "Float64":
+            df[column] = _to_number(values).astype("Float64")
+        else:
+            text = _blank_to_na(values).map(lambda v: None if pd.isna(v) else str(v))
+            df[column] = text.astype("string").astype(dtype)
+    return df
+
+
+def concat_frames(frames):
+    """รวมหลายตาราง template แล้วคืน dtype ให้ (category ของแต่ละชิ้นต่างกัน pd.concat จึงได้ object)"""
+    return apply_dtypes(pd.concat(frames, ignore_index=True))
+
+
+def normalize_frame(df, source_name=None, dtypes=True):
+    """
+    ปรับ DataFrame จาก formatter ใดๆ ให้เป็น template เดียวกันก่อนรวมไฟล์
+
+    - เรียงคอลัมน์ตาม COLUMNS (คอลัมน์ที่ไม่มีจะเป็นค่าว่าง, คอลัมน์เกินจะถูกตัดทิ้ง)
+    - ตัดช่องว่างหัวท้ายของข้อความ และเปลี่ยน 'N/A'/ข้อความว่างเป็น null จริง
+    - ใช้ dtype ตาม DTYPES (ผ่าน apply_dtypes)
+
+    Args:
+        df (pandas.DataFrame): ตารางที่ได้จากฟังก์ชัน build_* ของแต่ละ formatter
+        source_name (str): ถ้าระบุ จะใช้เติมคอลัมน์ Sources ที่ว่างอยู่
+        dtypes (bool): False = ยังไม่แปลง dtype (เมื่อจะรวมหลายชิ้นด้วย concat_frames ซึ่งแปลงให้ครั้งเดียว)
+
+    Returns:
+        pandas.DataFrame: ตารางที่มีคอลัมน์ตาม COLUMNS
+    """
+    df = df.reindex(columns=COLUMNS)
+    if source_name is not None:
+        df["Sources"] = df["Sources"].astype(object).where(df["Sources"].notna(), source_name)
+    return apply_dtypes(df) if dtypes else df
@@ -1,31 +1,37 @@
 import json
 import os
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from driver_factory import create_driver, ensure_on, quit_driver, DATA_ONLY_BLOCK_TYPES
+from listing_store import upsert_listings
+from rate_limiter import get_limiter, status_from_error
+from roddonjai_api import RoddonjaiClient, SEARCH_BLUEBOOK_URL
 
 # ensure output folder exists
 os.makedirs('blue_search', exist_ok=True)
 
 PAGE_SIZE = 4
 
+# Bulk mode: harvest the browser session once, find the largest page size the
+# endpoint accepts, then fetch the remaining pages concurrently over HTTP.
+BULK_MODE = True
+BULK_PAGE_SIZES = [1000, 500, 200, 100, 50, 20]
+BULK_WORKERS = 6
+
 def setup_driver():
-    opts = Options()
-    # comment out headless so you can see errors
-    # opts.add_argument("--headless")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--disable-blink-features=AutomationControlled")
-    opts.add_experimental_option("excludeSwitches", ["enable-automation"])
-    opts.add_experimental_option("useAutomationExtension", False)
-
-    driver = webdriver.Chrome(options=opts)
+    # headless=False so you can see errors; stealth masks navigator.webdriver
+    driver = create_driver(headless=False, stealth=True, block_types=DATA_ONLY_BLOCK_TYPES)
     driver.set_script_timeout(30)
-    # mask webdriver
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get:()=>undefined});")
     return driver
 
 def fetch_page_sync(driver, page_no):
+    with get_limiter().throttle(SEARCH_BLUEBOOK_URL) as slot:
+        resp = _fetch_page_sync(driver, page_no)
+        slot['status'] = status_from_error((resp or {}).get("error"))
+    return resp
+
+
+def _fetch_page_sync(driver, page_no):
     js = f"""
     try {{
       var xhr = new XMLHttpRequest();
@@ -71,38 +77,154 @@ def fetch_page_sync(driver, page_no):
     """
     return driver.execute_script(js)
 
+def bluebook_key(car):
+    return "|".join(str(car.get(field)) for field in ('carBrand', 'carModel', 'carSubModel', 'year'))
+
+
+def save_page(p, content):
+    path = f"blue_search/{p}.json"
+    with open(path, "w", encoding="utf-8-sig") as f:
+        json.dump(content, f, ensure_ascii=False, indent=2)
+    # เก็บลง store ทีละรุ่นย่อย/ปี เหมือนที่ formatter อ่าน
+    rows = [car for model_group in content for car in model_group.get('data', [])]
+    upsert_listings("blue_search", rows, bluebook_key)
+    print(f"  ✅ Saved {len(content)} items to {path}")
+
+
+def page_content(resp):
+    """(content, None) for a usable API page, else (None, reason)
+
+    Throttled or error responses can come back without result/content, and
+    must be counted as a failed page rather than crash the crawl.
+    """
+    if not isinstance(resp, dict):
+        return None, "no response"
+    if "error" in resp:
+        return None, resp["error"]
+    result = resp.get("result")
+    content = result.get("content") if isinstance(result, dict) else None
+    if not isinstance(content, list):
+        return None, f"unexpected response: {json.dumps(resp, ensure_ascii=False)[:200]}"
+    return content, None
+
+
+def remove_page_files():
+    """Delete the page files of the previous run before writing new ones
+
+    Page numbers depend on the page size, and the formatter reads every file
+    in blue_search/, so an old file under a page number that fails (or no
+    longer exists) this run would mix stale or duplicate data into the output.
+    """
+    removed = 0
+    for filename in os.listdir('blue_search'):
+        stem, ext = os.path.splitext(filename)
+        if ext == '.json' and stem.isdigit():
+            os.remove(os.path.join('blue_search', filename))
+            removed += 1
+    if removed:
+        print(f"  🗑️ Removed {removed} page files from the previous run")
+
+
+def probe_page_size(client):
+    """Return (page_size, page-1 response) for the largest size the API really honours
+
+    A size counts only if page 1 holds exactly min(size, totalElements)
+    items; an API that silently caps the page would otherwise make us skip
+    every item past the cap on each page.
+    """
+    for size in BULK_PAGE_SIZES:
+        resp = client.search_bluebook_card(1, size)
+        content, error = page_content(resp)
+        if content is None:
+            print(f"  pageSize={size} rejected: {error}")
+            continue
+        result = resp["result"]
+        expected = min(size, result.get("totalElements") or 0)
+        if len(content) != expected:
+            print(f"  pageSize={size} returned {len(content)} items, expected {expected}")
+            continue
+        print(f"  pageSize={size} accepted ({result.get('totalPages')} pages)")
+        return size, resp
+    raise RuntimeError("Bootstrap failed: no page size accepted")
+
+
+def fetch_all_bulk(client):
+    """Pull the whole bluebook in a few large, concurrent requests"""
+    page_size, first = probe_page_size(client)
+    total_pages = first["result"]["totalPages"]
+    print(f"Total pages = {total_pages} (pageSize={page_size})")
+
+    # หน้าแรกได้มาแล้วตอน probe ไม่ต้องยิงซ้ำ
+    remove_page_files()
+    save_page(1, first["result"]["content"])
+
+    def fetch_pages(pages):
+        """Fetch and save pages concurrently; returns the pages that failed"""
+        failed = []
+        with ThreadPoolExecutor(max_workers=BULK_WORKERS) as pool:
+            futures = {pool.submit(client.search_bluebook_card, p, page_size): p for p in pages}
+            for future in as_completed(futures):
+                p = futures[future]
+                try:
+                    content, error = page_content(future.result())
+                except Exception as e:
+                    content, error = None, str(e)
+                if content is None:
+                    print(f"  ❌ Page {p} error: {error}")
+                    failed.append(p)
+                    continue
+                save_page(p, content)
+        return sorted(failed)
+
+    failed = fetch_pages(range(2, total_pages + 1))
+    if failed:
+        # หน้าที่ล้มเหลวมักเป็น 429/5xx ชั่วคราว ลองอีกรอบหลังหน้าอื่นเสร็จแล้ว
+        print(f"🔁 Retrying {len(failed)} failed pages...")
+        failed = fetch_pages(failed)
+    if failed:
+        print(f"⚠️ {len(failed)} pages failed and are missing from blue_search/: {failed}")
+
+
 def main():
     driver = setup_driver()
     try:
-        # 1) Establish session/cookies
-        driver.get("https://www.roddonjai.com")
-        time.sleep(2)
+        if BULK_MODE:
+            client = RoddonjaiClient.from_driver(driver, max_per_host=BULK_WORKERS)
+            try:
+                fetch_all_bulk(client)
+            finally:
+                client.close()
+            return
+
+        # 1) Establish session/cookies (skipped if a warm tab is already there)
+        ensure_on(driver, "https://www.roddonjai.com")
 
         # 2) Bootstrap to find totalPages
         first = fetch_page_sync(driver, 1)
-        if not first or "error" in first:
-            raise RuntimeError("Bootstrap failed: " + (first or {}).get("error", "no response"))
+        content, error = page_content(first)
+        if content is None:
+            raise RuntimeError("Bootstrap failed: " + error)
         total_pages = first["result"]["totalPages"]
         print(f"Total pages = {total_pages}")
+        remove_page_files()
 
         # 3) Loop and save only the content array
+        failed = []
         for p in range(1, total_pages + 1):
             print(f"Fetching page {p}/{total_pages}…")
-            resp = fetch_page_sync(driver, p)
-            if not resp or "error" in resp:
-                print(f"  ❌ Page {p} error: {resp.get('error')}")
+            content, error = page_content(fetch_page_sync(driver, p))
+            if content is None:
+                print(f"  ❌ Page {p} error: {error}")
+                failed.append(p)
                 continue
 
-            content = resp["result"]["content"]
-            path = f"blue_search/{p}.json"
-            with open(path, "w", encoding="utf-8-sig") as f:
-                json.dump(content, f, ensure_ascii=False, indent=2)
-            print(f"  ✅ Saved {len(content)} items to {path}")
-
-            time.sleep(1)
+            save_page(p, content)
+        if failed:
+            print(f"⚠️ {len(failed)} pages failed and are missing from blue_search/: {failed}")
 
     finally:
-        driver.quit()
+        get_limiter().report()
+        quit_driver(driver)
         print("Done.")
 
 if __name__ == "__main__":
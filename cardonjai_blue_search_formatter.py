@@ -1,98 +1,98 @@
-import json
+import multiprocessing
 import os
 import pandas as pd
 
+from car_canon import canonical_brand, canonical_model
+from car_template import CarRecord, ColumnarBuilder
+from formatter_output import output_path_for, write_output
+from formatter_parallel import build_from_directory
+from listing_store import ListingStore, STORE_PATH
 
-def build_bluebook_database_from_json(directory_path):
+
+def bluebook_car_info(car_details, source_name="blue_search"):
+    """แปลงข้อมูลราคากลาง 1 รุ่นย่อย/ปี ให้อยู่ในรูปแบบ template"""
+    return CarRecord(
+        sources=source_name,
+        brand=canonical_brand(car_details.get('carBrand')),
+        model=canonical_model(car_details.get('carBrand'), car_details.get('carModel')),
+        sub_model=car_details.get('carSubModel'),
+        year=car_details.get('year'),
+        price=car_details.get('marketPriceSecondhand'),
+        mileage="N/A",  # ไม่มีข้อมูลนี้ใน Source
+        plate_no="N/A", # ไม่มีข้อมูลนี้ใน Source
+        seller_name="N/A",# ไม่มีข้อมูลนี้ใน Source
+        phone_number="N/A",
+        url="N/A" # ไม่มีข้อมูลนี้ใน Source
+    )
+
+
+def bluebook_cars(data_list):
+    """รุ่นย่อย/ปีทั้งหมดในไฟล์ Blue Book (list ของรุ่น แต่ละรุ่นมี list ใน key 'data')"""
+    return [car_details for model_group in data_list for car_details in model_group.get('data', [])]
+
+
+def build_bluebook_database_from_json(directory_path, workers=1):
     """
     สแกนไฟล์ JSON ของข้อมูล Blue Book ทั้งหมดในไดเรกทอรีที่ระบุ,
     ดึงข้อมูลราคากลางรถยนต์, และแปลงเป็น Pandas DataFrame ตาม template
 
     Args:
         directory_path (str): เส้นทางไปยังโฟลเดอร์ที่มีไฟล์ JSON
+        workers (int): จำนวน process ที่ใช้อ่านไฟล์พร้อมกัน (1 = อ่านทีละไฟล์ใน process นี้)
 
     Returns:
         pandas.DataFrame: ตารางข้อมูลรถยนต์ทั้งหมดที่รวบรวมได้
                           หรือ DataFrame ว่างถ้าไม่พบข้อมูล
     """
-    all_cars_data = []
-    source_name = "blue_search"  # กำหนดแหล่งข้อมูลสำหรับไฟล์ชุดนี้
+    return build_from_directory(directory_path, bluebook_cars, bluebook_car_info, "blue_search",
+                                workers)
 
-    # ตรวจสอบว่าไดเรกทอรีมีอยู่จริงหรือไม่
-    if not os.path.isdir(directory_path):
-        print(f"ผิดพลาด: ไม่พบโฟลเดอร์ '{directory_path}' กรุณาตรวจสอบตำแหน่ง")
-        return pd.DataFrame()
 
-    print(f"เริ่มต้นสแกนไฟล์ในโฟลเดอร์ '{directory_path}'...")
+def build_bluebook_database_from_store(store_path=STORE_PATH, changed_since=None):
+    """
+    อ่านข้อมูลดิบของ blue_search จาก listing store (SQLite) แทนการอ่านไฟล์ JSON ในโฟลเดอร์
+    และแปลงเป็น Pandas DataFrame ตาม template เดียวกัน
 
-    # วนลูปอ่านทุกไฟล์ในโฟลเดอร์
-    files_in_directory = os.listdir(directory_path)
-    json_files = [f for f in files_in_directory if f.endswith('.json')]
+    Args:
+        store_path (str): เส้นทางไปยังไฟล์ฐานข้อมูล listing store
+        changed_since (str): ถ้าระบุ จะอ่านเฉพาะรายการที่เปลี่ยนตั้งแต่เวลานี้ ("YYYY-mm-dd HH:MM:SS")
 
-    if not json_files:
-        print("ไม่พบไฟล์ .json ในโฟลเดอร์")
+    Returns:
+        pandas.DataFrame: ตารางข้อมูลรถยนต์ หรือ DataFrame ว่างถ้าไม่พบข้อมูล
+    """
+    if not os.path.exists(store_path):
+        print(f"ผิดพลาด: ไม่พบ listing store '{store_path}'")
         return pd.DataFrame()
 
-    print(f"พบ {len(json_files)} ไฟล์ JSON จะเริ่มทำการประมวลผล...")
-
-    for filename in json_files:
-        file_path = os.path.join(directory_path, filename)
-        print(f"  - กำลังอ่านไฟล์: {filename}")
-        try:
-            with open(file_path, 'r', encoding='utf-8-sig') as f:
-                # โครงสร้างไฟล์นี้เป็น list of objects
-                data_list = json.load(f)
-
-            # วนลูปใน list หลัก (แต่ละ object คือ 1 model)
-            for model_group in data_list:
-                # เข้าถึง list ของรถรุ่นย่อย/ปี ใน key 'data'
-                for car_details in model_group.get('data', []):
-                    car_info = {
-                        "Sources": source_name,
-                        "Brand": car_details.get('carBrand'),
-                        "Model": car_details.get('carModel'),
-                        "Sub Model": car_details.get('carSubModel'),
-                        "Year": car_details.get('year'),
-                        "Price": car_details.get('marketPriceSecondhand'),
-                        "Mileage": "N/A",  # ไม่มีข้อมูลนี้ใน Source
-                        "Plate No.": "N/A", # ไม่มีข้อมูลนี้ใน Source
-                        "Seller Name": "N/A",# ไม่มีข้อมูลนี้ใน Source
-                        "Phone Number":"N/A",
-                        "URL": "N/A" # ไม่มีข้อมูลนี้ใน Source
-                    }
-                    all_cars_data.append(car_info)
-
-        except json.JSONDecodeError:
-            print(f"    คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {filename} ได้")
-        except Exception as e:
-            print(f"    เกิดข้อผิดพลาดขณะประมวลผลไฟล์ {filename}: {e}")
+    with ListingStore(store_path) as store:
+        all_cars_data = ColumnarBuilder().extend(bluebook_car_info(car)
+                                                 for car in store.iter_payloads("blue_search", changed_since))
 
-    if not all_cars_data:
-        print("ไม่พบข้อมูลรถยนต์ในไฟล์ JSON ทั้งหมด")
+    if not len(all_cars_data):
+        print("ไม่พบข้อมูลรถยนต์ใน listing store")
         return pd.DataFrame()
 
-    # สร้าง DataFrame จาก list ของข้อมูลทั้งหมด
-    df = pd.DataFrame(all_cars_data)
-
-    # จัดลำดับคอลัมน์ให้ตรงกับ Template ที่ต้องการ
-    column_order = [
-        "Sources", "Brand", "Model", "Sub Model", "Year",
-        "Price", "Mileage", "Plate No.", "Seller Name","Phone Number", "URL"
-    ]
-    df = df[column_order]
-
-    return df
+    return all_cars_data.to_frame()
 
 
 # --- ส่วนหลักของโปรแกรม ---
 if __name__ == "__main__":
+    # จำเป็นสำหรับ process pool เมื่อ build เป็น .exe ด้วย PyInstaller
+    multiprocessing.freeze_support()
+
     # กำหนดชื่อโฟลเดอร์ที่เก็บข้อมูลและโฟลเดอร์/ไฟล์ผลลัพธ์
     DATA_DIRECTORY = 'blue_search'
     OUTPUT_DIRECTORY = 'combined'
     OUTPUT_FILENAME = 'blue_search_combined_data.csv'
+    READ_FROM_STORE = False  # True = อ่านจาก listing store (listings.db) แทนไฟล์ JSON
+    OUTPUT_FORMAT = 'csv'  # 'csv', 'parquet' หรือ 'dataset' (parquet แบ่งโฟลเดอร์ตาม Sources)
+    WORKERS = os.cpu_count() or 1  # จำนวน process ที่อ่านไฟล์ JSON พร้อมกัน (1 = ไม่ใช้ process pool)
 
     # เรียกใช้ฟังก์ชันหลักเพื่อประมวลผล
-    combined_dataframe = build_bluebook_database_from_json(DATA_DIRECTORY)
+    if READ_FROM_STORE:
+        combined_dataframe = build_bluebook_database_from_store()
+    else:
+        combined_dataframe = build_bluebook_database_from_json(DATA_DIRECTORY, WORKERS)
 
     # ตรวจสอบว่ามีข้อมูลที่ถูกประมวลผลหรือไม่ ก่อนทำการบันทึก
     if not combined_dataframe.empty:
@@ -102,10 +102,10 @@ if __name__ == "__main__":
             os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
 
             # กำหนดเส้นทางเต็มของไฟล์ผลลัพธ์
-            output_path = os.path.join(OUTPUT_DIRECTORY, OUTPUT_FILENAME)
+            output_path = output_path_for(OUTPUT_DIRECTORY, OUTPUT_FILENAME, OUTPUT_FORMAT)
 
-            # บันทึก DataFrame เป็นไฟล์ CSV
-            combined_dataframe.to_csv(output_path, index=False, encoding='utf-8-sig')
+            # บันทึกเป็น CSV หรือ Parquet ตาม OUTPUT_FORMAT
+            write_output(combined_dataframe, output_path, OUTPUT_FORMAT)
 
             print("\n----------------------------------------------------")
             print("การประมวลผลเสร็จสมบูรณ์!")
@@ -1,12 +1,26 @@
 import json
 import os
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from driver_factory import create_driver, ensure_on, quit_driver, DATA_ONLY_BLOCK_TYPES
+from listing_store import key_from, upsert_listings
+from rate_limiter import get_limiter, status_from_error
+from roddonjai_api import RoddonjaiClient, SEARCH_CAR_PROFILE_URL
 
 # Create directory if it doesn't exist
 os.makedirs('cardonjai', exist_ok=True)
 
+# "http" = use the browser once for cookies, then call the API directly
+# "browser" = send every request through driver.execute_script(fetch(...))
+ENGINE = "http"
+
+# Concurrent crawl (HTTP engine only): fetch several brands/pages at once.
+# MAX_CONCURRENCY_PER_HOST caps in-flight requests to api-buyer.roddonjai.com.
+CONCURRENT = True
+MAX_WORKERS = 16
+MAX_CONCURRENCY_PER_HOST = 6
+
 brands = [
     {
         "brand": "Audi",
@@ -137,18 +151,9 @@ brands = [
 
 def setup_driver():
     """Setup Chrome driver with options"""
-    chrome_options = Options()
-    chrome_options.add_argument('--headless')  # Remove this line if you want to see the browser
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
-
-    driver = webdriver.Chrome(options=chrome_options)
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-
-    return driver
+    # We only call the API from the page, so images/fonts/CSS/trackers are blocked.
+    # Set headless=False if you want to see the browser
+    return create_driver(headless=True, stealth=True, block_types=DATA_ONLY_BLOCK_TYPES)
 
 
 def fetch_brand_data(driver, brand_name, page_size=100):
@@ -202,11 +207,12 @@ def fetch_brand_data(driver, brand_name, page_size=100):
     """
 
     try:
-        # Navigate to the site first to establish session
-        driver.get('https://www.roddonjai.com')
-        time.sleep(2)
+        # Navigate to the site first to establish session (skipped if already there)
+        ensure_on(driver, 'https://www.roddonjai.com')
 
-        response = driver.execute_script(js_code_first)
+        with get_limiter().throttle(SEARCH_CAR_PROFILE_URL) as slot:
+            response = driver.execute_script(js_code_first)
+            slot['status'] = status_from_error(response.get('error'))
 
         if 'error' in response:
             print(f"Error fetching {brand_name}: {response['error']}")
@@ -273,7 +279,10 @@ def fetch_brand_data(driver, brand_name, page_size=100):
             .catch(error => ({{error: error.message}}));
             """
 
-            page_response = driver.execute_script(js_code_page)
+            # pacing is handled by the shared adaptive limiter instead of fixed sleeps
+            with get_limiter().throttle(SEARCH_CAR_PROFILE_URL) as slot:
+                page_response = driver.execute_script(js_code_page)
+                slot['status'] = status_from_error(page_response.get('error'))
 
             if 'error' in page_response:
                 print(f"    Error on page {page_no}: {page_response['error']}")
@@ -284,8 +293,52 @@ def fetch_brand_data(driver, brand_name, page_size=100):
                 all_cars_data.extend(cars_data)
                 print(f"    Added {len(cars_data)} cars from page {page_no}")
 
-            # Add small delay to avoid rate limiting
-            time.sleep(1)
+        print(f"  - Total collected: {len(all_cars_data)} cars")
+        return all_cars_data
+
+    except Exception as e:
+        print(f"Exception while fetching {brand_name}: {str(e)}")
+        return []
+
+
+def fetch_brand_data_http(client, brand_name, page_size=100):
+    """Fetch all data for a specific brand through the pooled HTTP client"""
+    print(f"Fetching data for {brand_name}...")
+
+    try:
+        response = client.search_car_profile(brand_name, 1, page_size)
+
+        if 'error' in response:
+            print(f"Error fetching {brand_name}: {response['error']}")
+            return []
+
+        if 'getCarProfile' not in response:
+            print(f"No car profile data found for {brand_name}")
+            return []
+
+        total_pages = response['getCarProfile']['totalPages']
+        total_elements = response['getCarProfile']['totalElements']
+
+        print(f"  - Total pages: {total_pages}")
+        print(f"  - Total cars: {total_elements}")
+
+        # หน้าแรกได้มาแล้วจากการหา totalPages ไม่ต้องยิงซ้ำ
+        all_cars_data = list(response['getCarProfile'].get('content', []))
+        print(f"    Added {len(all_cars_data)} cars from page 1")
+
+        for page_no in range(2, total_pages + 1):
+            print(f"  - Fetching page {page_no}/{total_pages}")
+
+            page_response = client.search_car_profile(brand_name, page_no, page_size)
+
+            if 'error' in page_response:
+                print(f"    Error on page {page_no}: {page_response['error']}")
+                continue
+
+            if 'getCarProfile' in page_response and 'content' in page_response['getCarProfile']:
+                cars_data = page_response['getCarProfile']['content']
+                all_cars_data.extend(cars_data)
+                print(f"    Added {len(cars_data)} cars from page {page_no}")
 
         print(f"  - Total collected: {len(all_cars_data)} cars")
         return all_cars_data
@@ -295,48 +348,124 @@ def fetch_brand_data(driver, brand_name, page_size=100):
         return []
 
 
+def _extract_page(brand_name, page_no, response):
+    """Return the car list from one API response, printing any error"""
+    if 'error' in response:
+        print(f"    Error on {brand_name} page {page_no}: {response['error']}")
+        return []
+    return response.get('getCarProfile', {}).get('content', [])
+
+
+def crawl_brands_concurrently(client, brand_list, page_size=100, max_workers=MAX_WORKERS):
+    """Fetch every page of every brand in parallel and save each brand to its file
+
+    Page 1 of all brands is fetched first (it also tells us totalPages),
+    then the remaining pages of all brands go through the same pool. The
+    per-host cap lives in the client, so max_workers only bounds threads.
+    """
+    pages = {brand["brand"]: {} for brand in brand_list}
+    total_pages = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        first_pages = {
+            pool.submit(client.search_car_profile, brand["brand"], 1, page_size): brand["brand"]
+            for brand in brand_list
+        }
+        for future in as_completed(first_pages):
+            brand_name = first_pages[future]
+            response = future.result()
+            if 'getCarProfile' not in response:
+                print(f"❌ No car profile data found for {brand_name}: {response.get('error', 'no data')}")
+                continue
+            total_pages[brand_name] = response['getCarProfile']['totalPages']
+            pages[brand_name][1] = _extract_page(brand_name, 1, response)
+            print(f"  - {brand_name}: {total_pages[brand_name]} pages, "
+                  f"{response['getCarProfile']['totalElements']} cars")
+
+        rest = {
+            pool.submit(client.search_car_profile, brand_name, page_no, page_size): (brand_name, page_no)
+            for brand_name, n_pages in total_pages.items()
+            for page_no in range(2, n_pages + 1)
+        }
+        print(f"Fetching {len(rest)} remaining pages with {max_workers} workers...")
+        for future in as_completed(rest):
+            brand_name, page_no = rest[future]
+            pages[brand_name][page_no] = _extract_page(brand_name, page_no, future.result())
+
+    for brand in brand_list:
+        brand_pages = pages[brand["brand"]]
+        # เรียงตามเลขหน้าเพื่อให้ลำดับรถเหมือนกับโหมดทีละหน้า
+        cars = [car for page_no in sorted(brand_pages) for car in brand_pages[page_no]]
+        save_brand_data(brand, cars)
+
+
+def save_brand_data(brand, current_brands_data):
+    """Write one brand's cars to cardonjai/{brand}.json"""
+    brand_name = brand["brand"]
+
+    if current_brands_data:
+        # Save to JSON file with UTF-8 encoding
+        filename = f"cardonjai/{brand_name}.json"
+
+        # Create data structure
+        brand_data = {
+            "brand": brand_name,
+            "imgUrl": brand["imgUrl"],
+            "totalCars": len(current_brands_data),
+            "cars": current_brands_data,
+            "fetchedAt": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+        with open(filename, 'w', encoding='utf-8-sig') as f:
+            json.dump(brand_data, f, ensure_ascii=False, indent=2)
+
+        upsert_listings("roddonjai_used_car_list", current_brands_data, key_from('carId', 'id', 'carUrl'))
+
+        print(f"✅ Saved {len(current_brands_data)} cars for {brand_name} to {filename}")
+    else:
+        print(f"❌ No data collected for {brand_name}")
+
+
 def main():
     """Main function to process all brands"""
     driver = setup_driver()
+    client = None
 
     try:
+        if ENGINE == "http":
+            # ใช้ browser แค่ครั้งเดียวเพื่อเอา cookies/headers แล้วปิดทิ้ง
+            client = RoddonjaiClient.from_driver(driver, max_per_host=MAX_CONCURRENCY_PER_HOST)
+            quit_driver(driver)
+            driver = None
+            print("Session harvested, browser closed")
+
+            if CONCURRENT:
+                crawl_brands_concurrently(client, brands)
+                return
+
         for brand in brands:
             brand_name = brand["brand"]
 
             # Fetch all data for this brand
-            current_brands_data = fetch_brand_data(driver, brand_name)
-
-            if current_brands_data:
-                # Save to JSON file with UTF-8 encoding
-                filename = f"cardonjai/{brand_name}.json"
-
-                # Create data structure
-                brand_data = {
-                    "brand": brand_name,
-                    "imgUrl": brand["imgUrl"],
-                    "totalCars": len(current_brands_data),
-                    "cars": current_brands_data,
-                    "fetchedAt": time.strftime("%Y-%m-%d %H:%M:%S")
-                }
-
-                with open(filename, 'w', encoding='utf-8-sig') as f:
-                    json.dump(brand_data, f, ensure_ascii=False, indent=2)
-
-                print(f"✅ Saved {len(current_brands_data)} cars for {brand_name} to {filename}")
+            if client:
+                current_brands_data = fetch_brand_data_http(client, brand_name)
             else:
-                print(f"❌ No data collected for {brand_name}")
+                current_brands_data = fetch_brand_data(driver, brand_name)
 
-            # Add delay between brands to be respectful
-            time.sleep(2)
+            save_brand_data(brand, current_brands_data)
 
     except KeyboardInterrupt:
         print("\nScript interrupted by user")
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
     finally:
-        driver.quit()
-        print("Driver closed")
+        get_limiter().report()
+        if client:
+            client.close()
+        if driver:
+            quit_driver(driver)
+            print("Driver closed")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,100 +1,101 @@
-import json
+import multiprocessing
 import os
 import pandas as pd
 
-
-def build_car_database_from_json(directory_path):
+from car_canon import canonical_brand, canonical_model
+from car_template import CarRecord, ColumnarBuilder
+from formatter_output import output_path_for, write_output
+from formatter_parallel import build_from_directory
+from listing_store import ListingStore, STORE_PATH
+
+
+def cardonjai_car_info(car, source_name="roddonjai_used_car_list"):
+    """แปลงข้อมูลรถ 1 คันจากไฟล์ cardonjai ให้อยู่ในรูปแบบ template"""
+    # ใช้ .get() เพื่อเข้าถึงข้อมูลอย่างปลอดภัย ป้องกัน error หาก key ไม่มีอยู่
+    seller_name = car.get('dealerProfileDocument', {}).get('dealerName', 'N/A')
+    phone_number = car.get('dealerProfileDocument', {}).get('contactMobileNumber1', 'N/A')
+    return CarRecord(
+        sources=source_name,
+        brand=canonical_brand(car.get('carBrand')),
+        model=canonical_model(car.get('carBrand'), car.get('carModel')),
+        sub_model=car.get('carSubModel'),
+        year=car.get('carYear'),
+        price=car.get('carPrice'),
+        mileage=car.get('mileage'),
+        plate_no=car.get('licensePlateNumber'),
+        seller_name=seller_name,
+        phone_number=phone_number,  # ✅ เพิ่มตรงนี้,
+        url=car.get('carUrl') if car.get('carUrl') else "N/A"
+    )
+
+
+def cardonjai_cars(data):
+    """รถทั้งหมดในไฟล์ cardonjai 1 หน้า (อยู่ใน key 'cars')"""
+    return data.get('cars', [])
+
+
+def build_car_database_from_json(directory_path, workers=1):
     """
     สแกนไฟล์ JSON ทั้งหมดในไดเรกทอรีที่ระบุ, ดึงข้อมูลรถยนต์ทั้งหมด,
     และแปลงเป็น Pandas DataFrame ตาม template ที่กำหนด
 
     Args:
         directory_path (str): เส้นทางไปยังโฟลเดอร์ที่มีไฟล์ JSON
+        workers (int): จำนวน process ที่ใช้อ่านไฟล์พร้อมกัน (1 = อ่านทีละไฟล์ใน process นี้)
 
     Returns:
         pandas.DataFrame: ตารางข้อมูลรถยนต์ทั้งหมดที่รวบรวมได้
                           หรือ DataFrame ว่างถ้าไม่พบข้อมูล
     """
-    all_cars_data = []
-    source_name = "roddonjai_used_car_list"
+    return build_from_directory(directory_path, cardonjai_cars, cardonjai_car_info, "roddonjai_used_car_list",
+                                workers)
 
-    # ตรวจสอบว่าไดเรกทอรีมีอยู่จริงหรือไม่
-    if not os.path.isdir(directory_path):
-        print(f"ผิดพลาด: ไม่พบโฟลเดอร์ '{directory_path}' กรุณาตรวจสอบว่าวางสคริปต์ถูกที่")
-        return pd.DataFrame()
 
-    print(f"เริ่มต้นสแกนไฟล์ในโฟลเดอร์ '{directory_path}'...")
+def build_car_database_from_store(store_path=STORE_PATH, changed_since=None):
+    """
+    อ่านข้อมูลดิบของ roddonjai_used_car_list จาก listing store (SQLite) แทนการอ่านไฟล์ JSON ในโฟลเดอร์
+    และแปลงเป็น Pandas DataFrame ตาม template เดียวกัน
 
-    # วนลูปอ่านทุกไฟล์ในโฟลเดอร์
-    files_in_directory = os.listdir(directory_path)
-    json_files = [f for f in files_in_directory if f.endswith('.json')]
+    Args:
+        store_path (str): เส้นทางไปยังไฟล์ฐานข้อมูล listing store
+        changed_since (str): ถ้าระบุ จะอ่านเฉพาะรายการที่เปลี่ยนตั้งแต่เวลานี้ ("YYYY-mm-dd HH:MM:SS")
 
-    if not json_files:
-        print("ไม่พบไฟล์ .json ในโฟลเดอร์")
+    Returns:
+        pandas.DataFrame: ตารางข้อมูลรถยนต์ หรือ DataFrame ว่างถ้าไม่พบข้อมูล
+    """
+    if not os.path.exists(store_path):
+        print(f"ผิดพลาด: ไม่พบ listing store '{store_path}'")
         return pd.DataFrame()
 
-    print(f"พบ {len(json_files)} ไฟล์ JSON จะเริ่มทำการประมวลผล...")
-
-    for filename in json_files:
-        file_path = os.path.join(directory_path, filename)
-        print(f"  - กำลังอ่านไฟล์: {filename}")
-        try:
-            with open(file_path, 'r', encoding='utf-8-sig') as f:
-                data = json.load(f)
-
-            # ดึงข้อมูลจาก list ของ 'cars' ในแต่ละไฟล์
-            for car in data.get('cars', []):
-                # ใช้ .get() เพื่อเข้าถึงข้อมูลอย่างปลอดภัย ป้องกัน error หาก key ไม่มีอยู่
-                seller_name = car.get('dealerProfileDocument', {}).get('dealerName', 'N/A')
-                phone_number = car.get('dealerProfileDocument', {}).get('contactMobileNumber1', 'N/A')
-                car_info = {
-                    "Sources": source_name,
-                    "Brand": car.get('carBrand'),
-                    "Model": car.get('carModel'),
-                    "Sub Model": car.get('carSubModel'),
-                    "Year": car.get('carYear'),
-                    "Price": car.get('carPrice'),
-                    "Mileage": car.get('mileage'),
-                    "Plate No.": car.get('licensePlateNumber'),
-                    "Seller Name": seller_name,
-                    "Phone Number": phone_number,  # ✅ เพิ่มตรงนี้,
-                    "URL": car.get('carUrl') if car.get('carUrl') else "N/A"
-                }
-                all_cars_data.append(car_info)
-
-        except json.JSONDecodeError:
-            print(f"    คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {filename} ได้ (อาจมีโครงสร้างผิด)")
-        except Exception as e:
-            print(f"    เกิดข้อผิดพลาดขณะประมวลผลไฟล์ {filename}: {e}")
+    with ListingStore(store_path) as store:
+        all_cars_data = ColumnarBuilder().extend(cardonjai_car_info(car)
+                                                 for car in store.iter_payloads("roddonjai_used_car_list", changed_since))
 
-    if not all_cars_data:
-        print("ไม่พบข้อมูลรถยนต์ในไฟล์ JSON ทั้งหมด")
+    if not len(all_cars_data):
+        print("ไม่พบข้อมูลรถยนต์ใน listing store")
         return pd.DataFrame()
 
-    # สร้าง DataFrame จาก list ของข้อมูลทั้งหมด
-    df = pd.DataFrame(all_cars_data)
-
-    # จัดลำดับคอลัมน์ให้ตรงกับ Template ที่ต้องการ
-    column_order = [
-        "Sources", "Brand", "Model", "Sub Model", "Year",
-        "Price", "Mileage", "Plate No.", "Seller Name", "Phone Number","URL"
-    ]
-
-    # กรองเอาเฉพาะคอลัมน์ที่ต้องการและจัดลำดับ
-    df = df[column_order]
-
-    return df
+    return all_cars_data.to_frame()
 
 
 # --- ส่วนหลักของโปรแกรม ---
 if __name__ == "__main__":
+    # จำเป็นสำหรับ process pool เมื่อ build เป็น .exe ด้วย PyInstaller
+    multiprocessing.freeze_support()
+
     # กำหนดชื่อโฟลเดอร์ที่เก็บข้อมูลและโฟลเดอร์/ไฟล์ผลลัพธ์
     DATA_DIRECTORY = 'cardonjai'
     OUTPUT_DIRECTORY = 'combined' # <--- ชื่อโฟลเดอร์สำหรับเก็บผลลัพธ์
     OUTPUT_FILENAME = 'roddonjai_combined_data.csv'
+    READ_FROM_STORE = False  # True = อ่านจาก listing store (listings.db) แทนไฟล์ JSON
+    OUTPUT_FORMAT = 'csv'  # 'csv', 'parquet' หรือ 'dataset' (parquet แบ่งโฟลเดอร์ตาม Sources)
+    WORKERS = os.cpu_count() or 1  # จำนวน process ที่อ่านไฟล์ JSON พร้อมกัน (1 = ไม่ใช้ process pool)
 
     # เรียกใช้ฟังก์ชันหลักเพื่อประมวลผล
-    combined_dataframe = build_car_database_from_json(DATA_DIRECTORY)
+    if READ_FROM_STORE:
+        combined_dataframe = build_car_database_from_store()
+    else:
+        combined_dataframe = build_car_database_from_json(DATA_DIRECTORY, WORKERS)
 
     # ตรวจสอบว่ามีข้อมูลที่ถูกประมวลผลหรือไม่ ก่อนทำการบันทึก
     if not combined_dataframe.empty:
@@ -104,11 +105,10 @@ if __name__ == "__main__":
             os.makedirs(OUTPUT_DIRECTORY, exist_ok=True) # สร้างโฟลเดอร์ถ้ายังไม่มี
 
             # ---- ส่วนที่แก้ไข: กำหนดเส้นทางเต็มของไฟล์ผลลัพธ์ ----
-            output_path = os.path.join(OUTPUT_DIRECTORY, OUTPUT_FILENAME)
+            output_path = output_path_for(OUTPUT_DIRECTORY, OUTPUT_FILENAME, OUTPUT_FORMAT)
 
-            # บันทึก DataFrame เป็นไฟล์ CSV ไปยังเส้นทางใหม่
-            # ใช้ encoding 'utf-8-sig' เพื่อให้โปรแกรม Excel เปิดไฟล์ภาษาไทยได้ถูกต้อง
-            combined_dataframe.to_csv(output_path, index=False, encoding='utf-8-sig')
+            # บันทึกเป็น CSV หรือ Parquet ตาม OUTPUT_FORMAT
+            write_output(combined_dataframe, output_path, OUTPUT_FORMAT)
 
             print("\n----------------------------------------------------")
             print("การประมวลผลเสร็จสมบูรณ์!")
@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import pandas as pd
+
+from car_template import COLUMNS, concat_frames, normalize_frame
+from cardonjai_blue_search_formatter import bluebook_car_info, bluebook_cars
+from cardonjai_normal_formatter import cardonjai_car_info, cardonjai_cars
+from formatter_output import output_path_for, write_output
+from formatter_parallel import iter_directory_frames
+from json_stream import frames_from_records, iter_json_array
+from krungsri_formatter import build_krungsri_database_from_csv, build_krungsri_database_from_store
+from listing_dedupe import add_cluster_ids
+from listing_store import ListingStore, STORE_PATH
+from one2car_formatter import one2car_car_info, one2car_cars
+from rod_kaidee_formatter import kaidee_car_info
+from talarod_formatter import taladrod_car_info
+
+# ตำแหน่งข้อมูลดิบของแต่ละแหล่ง (ตรงกับที่ formatter แต่ละตัวใช้)
+CARDONJAI_DIRECTORY = 'cardonjai'
+BLUE_SEARCH_DIRECTORY = 'blue_search'
+ONE2CAR_DIRECTORY = 'one2car'
+KAIDEE_FILE = 'rod_kaidee.json'
+TALADROD_FILE = 'talarod.json'
+KRUNGSRI_FILE = 'krungsrimarket_demo.csv'
+
+
+class SourceAdapter:
+    """One source of the combined pipeline
+
+    Wraps an existing ``build_*_database_*`` function: ``frames()`` yields the
+    whole DataFrame of this source in template form. Sources that can produce
+    their rows in pieces use ChunkedSourceAdapter instead.
+    """
+
+    def __init__(self, name, build, *args, **kwargs):
+        self.name = name
+        self.build = build
+        self.args = args
+        self.kwargs = kwargs
+
+    def frames(self):
+        yield self.build(*self.args, **self.kwargs)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, {self.build.__name__})"
+
+
+class ChunkedSourceAdapter(SourceAdapter):
+    """A source whose ``build`` is a generator of raw template chunks
+
+    ``frames()`` passes each chunk on as soon as it is built, so a source is
+    never held as one big DataFrame before the final concat.
+    """
+
+    def frames(self):
+        yield from self.build(*self.args, **self.kwargs)
+
+
+def json_file_frames(input_filepath, car_info):
+    """Stream the cars of one JSON array file (rod_kaidee.json, talarod.json) as raw chunks"""
+    if not os.path.exists(input_filepath):
+        print(f"ผิดพลาด: ไม่พบไฟล์ '{input_filepath}' กรุณาตรวจสอบว่ามีไฟล์นี้อยู่จริง")
+        return
+    print(f"กำลังอ่านข้อมูลจากไฟล์ '{input_filepath}'...")
+    yield from frames_from_records(iter_json_array(input_filepath), car_info)
+
+
+def store_frames(source_name, car_info, changed_since=None, store_path=STORE_PATH):
+    """Stream the raw payloads of one source in the listing store as raw chunks"""
+    if not os.path.exists(store_path):
+        print(f"ผิดพลาด: ไม่พบ listing store '{store_path}'")
+        return
+    with ListingStore(store_path) as store:
+        yield from frames_from_records(store.iter_payloads(source_name, changed_since), car_info)
+
+
+def default_sources(read_from_store=False, workers=1, changed_since=None):
+    """Adapters for all six sources, reading either the scraped files or the listing store"""
+    # krungsri แปลงทั้งตารางด้วย pandas ในครั้งเดียว (build_krungsri_frame) จึงไม่แบ่งเป็นชิ้น
+    if read_from_store:
+        return [
+            ChunkedSourceAdapter("roddonjai_used_car_list", store_frames, "roddonjai_used_car_list",
+                                 cardonjai_car_info, changed_since),
+            ChunkedSourceAdapter("blue_search", store_frames, "blue_search", bluebook_car_info, changed_since),
+            ChunkedSourceAdapter("one2car", store_frames, "one2car", one2car_car_info, changed_since),
+            ChunkedSourceAdapter("rod_kaidee", store_frames, "rod_kaidee", kaidee_car_info, changed_since),
+            ChunkedSourceAdapter("talad_rod", store_frames, "talad_rod", taladrod_car_info, changed_since),
+            SourceAdapter("krungsri_market", build_krungsri_database_from_store, changed_since=changed_since),
+        ]
+    return [
+        ChunkedSourceAdapter("roddonjai_used_car_list", iter_directory_frames, CARDONJAI_DIRECTORY,
+                             cardonjai_cars, cardonjai_car_info, "roddonjai_used_car_list", workers),
+        ChunkedSourceAdapter("blue_search", iter_directory_frames, BLUE_SEARCH_DIRECTORY,
+                             bluebook_cars, bluebook_car_info, "blue_search", workers),
+        ChunkedSourceAdapter("one2car", iter_directory_frames, ONE2CAR_DIRECTORY,
+                             one2car_cars, one2car_car_info, "one2car", workers),
+        ChunkedSourceAdapter("rod_kaidee", json_file_frames, KAIDEE_FILE, kaidee_car_info),
+        ChunkedSourceAdapter("talad_rod", json_file_frames, TALADROD_FILE, taladrod_car_info),
+        SourceAdapter("krungsri_market", build_krungsri_database_from_csv, KRUNGSRI_FILE),
+    ]
+
+
+def build_combined_database(sources):
+    """
+    ดึงข้อมูลจากทุกแหล่งผ่าน adapter ทีละชิ้น ปรับให้เป็น template เดียวกันด้วย normalize_frame
+    แล้วรวมเป็น DataFrame เดียว (อ่านข้อมูลแต่ละรายการเพียงครั้งเดียว ไม่ต้องรวม CSV เอง)
+    dtype ตาม template ถูกแปลงครั้งเดียวตอนรวมท้ายสุด ไม่ใช่ทุกชิ้น
+
+    Args:
+        sources (list[SourceAdapter]): แหล่งข้อมูลที่ต้องการรวม
+
+    Returns:
+        pandas.DataFrame: ตารางข้อมูลรถยนต์จากทุกแหล่ง หรือ DataFrame ว่างถ้าไม่พบข้อมูล
+    """
+    frames = []
+    for source in sources:
+        print(f"\n=== {source.name} ===")
+        rows = 0
+        try:
+            for frame in source.frames():
+                if frame is None or frame.empty:
+                    continue
+                frames.append(normalize_frame(frame, source.name, dtypes=False))
+                rows += len(frame)
+        except Exception as e:
+            print(f"เกิดข้อผิดพลาดขณะอ่านแหล่งข้อมูล {source.name}: {e}")
+            if rows:
+                print(f"คำเตือน: ข้อมูลของ {source.name} ไม่ครบ ใช้ได้เพียง {rows} รายการที่อ่านก่อนเกิดข้อผิดพลาด")
+        print(f"[{source.name}] ได้ข้อมูล {rows} รายการ")
+
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    return concat_frames(frames)
+
+
+# --- ส่วนหลักของโปรแกรม ---
+if __name__ == "__main__":
+    # จำเป็นสำหรับ process pool เมื่อ build เป็น .exe ด้วย PyInstaller
+    multiprocessing.freeze_support()
+
+    OUTPUT_DIRECTORY = 'combined'
+    OUTPUT_FILENAME = 'all_sources_combined_data.csv'
+    READ_FROM_STORE = False  # True = อ่านจาก listing store (listings.db) แทนไฟล์ที่ scrape ไว้
+    OUTPUT_FORMAT = 'csv'  # 'csv', 'parquet' หรือ 'dataset' (parquet แบ่งโฟลเดอร์ตาม Sources)
+    WORKERS = os.cpu_count() or 1  # จำนวน process ที่อ่านไฟล์ JSON ของแหล่งที่เป็นโฟลเดอร์
+    DEDUPE = True  # True = เพิ่มคอลัมน์ Cluster ID ให้ประกาศที่เป็นรถคันเดียวกันข้ามแหล่งข้อมูล
+
+    combined_dataframe = build_combined_database(default_sources(READ_FROM_STORE, WORKERS))
+    if DEDUPE and not combined_dataframe.empty:
+        combined_dataframe = add_cluster_ids(combined_dataframe)
+
+    if not combined_dataframe.empty:
+        try:
+            print(f"\nกำลังเตรียมบันทึกไฟล์... ตรวจสอบโฟลเดอร์ '{OUTPUT_DIRECTORY}'")
+            os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
+
+            output_path = output_path_for(OUTPUT_DIRECTORY, OUTPUT_FILENAME, OUTPUT_FORMAT)
+
+            # บันทึกเป็น CSV หรือ Parquet ตาม OUTPUT_FORMAT
+            write_output(combined_dataframe, output_path, OUTPUT_FORMAT)
+
+            print("\n----------------------------------------------------")
+            print("การประมวลผลเสร็จสมบูรณ์!")
+            print(f"รวบรวมข้อมูลรถยนต์ทั้งหมด {len(combined_dataframe)} รายการ")
+            print(combined_dataframe["Sources"].value_counts().to_string())
+            print(f"ไฟล์ผลลัพธ์ถูกบันทึกเรียบร้อยที่: '{output_path}'")
+            print("----------------------------------------------------")
+
+        except Exception as e:
+            print(f"\nเกิดข้อผิดพลาดในการบันทึกไฟล์: {e}")
+    else:
+        print("\nไม่สามารถสร้างไฟล์ผลลัพธ์ได้ เนื่องจากไม่พบข้อมูลที่สามารถประมวลผลได้")
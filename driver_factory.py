@@ -0,0 +1,249 @@
+import json
+import os
+import time
+from urllib.parse import urlparse
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+import browser_daemon
+from rate_limiter import get_limiter
+
+# Attach to the warm browser from browser_daemon.py when it is running,
+# otherwise launch a fresh Chrome as before.
+ATTACH_TO_DAEMON = True
+CHROMEDRIVER_CACHE_FILE = os.path.join(os.getcwd(), 'drivers', 'chromedriver_path.txt')
+CHROMEDRIVER_CACHE_DAYS = 7
+
+# File extensions blocked through Network.setBlockedURLs, grouped by resource type.
+# Each becomes '*.ext' plus '*.ext?*' so resized CDN variants (img.jpg?w=640) match too.
+# (Fetch.enable could block by resourceType, but every paused request then needs a
+# Fetch.requestPaused handler, and execute_cdp_cmd cannot listen for events.)
+BLOCK_EXTENSIONS = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'media': ['mp4', 'webm', 'm3u8', 'mp3', 'ts'],
+    'stylesheet': ['css'],
+}
+
+# Ad / tracker / analytics hosts none of the scrapers read from
+AD_TRACKER_DOMAINS = [
+    'doubleclick.net', 'googlesyndication.com', 'googleadservices.com', 'adservice.google.com',
+    'google-analytics.com', 'googletagmanager.com', 'googletagservices.com',
+    'facebook.net', 'connect.facebook.net', 'facebook.com/tr',
+    'hotjar.com', 'clarity.ms', 'criteo.com', 'criteo.net', 'taboola.com', 'outbrain.com',
+    'tiktok.com', 'analytics.tiktok.com', 'line-scdn.net', 'scorecardresearch.com',
+    'adnxs.com', 'amazon-adsystem.com', 'yimg.jp', 'branch.io', 'segment.io', 'mixpanel.com',
+]
+
+# Image/font/media are safe for every scraper. Stylesheets are only safe where
+# we read JSON or inline scripts, not element .text (CSS decides visibility).
+DEFAULT_BLOCK_TYPES = ('image', 'font', 'media')
+DATA_ONLY_BLOCK_TYPES = ('image', 'font', 'media', 'stylesheet')
+
+# Rough average transfer size per blocked request, used to estimate savings
+# (blocked requests are never downloaded, so their real size is unknown).
+AVG_BLOCKED_BYTES = {
+    'Image': 45_000, 'Font': 35_000, 'Media': 400_000, 'Stylesheet': 30_000,
+    'Script': 40_000, 'XHR': 5_000, 'Fetch': 5_000, 'Ping': 500, 'Other': 10_000,
+}
+
+
+def blocked_url_patterns(block_types=DEFAULT_BLOCK_TYPES, block_domains=AD_TRACKER_DOMAINS):
+    patterns = []
+    for resource_type in block_types:
+        for extension in BLOCK_EXTENSIONS[resource_type]:
+            patterns.extend([f"*.{extension}", f"*.{extension}?*"])
+    patterns.extend(f"*{domain}*" for domain in block_domains)
+    return patterns
+
+
+def build_chrome_options(headless=True, window_size=None, user_agent=None, stealth=False,
+                         extra_args=(), meter=True):
+    """Build the Chrome Options shared by every scraper"""
+    options = Options()
+    if headless:
+        options.add_argument('--headless')
+        options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    if window_size:
+        options.add_argument(f'--window-size={window_size}')
+    if user_agent:
+        options.add_argument(f'user-agent={user_agent}')
+    if stealth:
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+    for arg in extra_args:
+        options.add_argument(arg)
+    if meter:
+        # performance log ให้เรานับ bytes ที่โหลดจริงและ request ที่ถูกบล็อก
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return options
+
+
+def apply_resource_blocking(driver, block_types=DEFAULT_BLOCK_TYPES, block_domains=AD_TRACKER_DOMAINS):
+    """Block requests by resource type and domain through the DevTools protocol"""
+    patterns = blocked_url_patterns(block_types, block_domains)
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+
+class BandwidthMeter:
+    """Accumulates bytes received and blocked requests from Chrome's performance log"""
+
+    def __init__(self):
+        self.bytes_received = 0
+        self.requests_finished = 0
+        self.blocked = {}
+        self._types = {}
+
+    def collect(self, driver):
+        """Drain the performance log (call between pages on long crawls)"""
+        try:
+            entries = driver.get_log('performance')
+        except Exception:
+            return
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method, params = message.get('method'), message.get('params', {})
+            if method == 'Network.requestWillBeSent':
+                self._types[params.get('requestId')] = params.get('type', 'Other')
+            elif method == 'Network.loadingFinished':
+                self.bytes_received += params.get('encodedDataLength', 0)
+                self.requests_finished += 1
+                self._types.pop(params.get('requestId'), None)
+            elif method == 'Network.loadingFailed':
+                resource_type = params.get('type') or self._types.get(params.get('requestId'), 'Other')
+                self._types.pop(params.get('requestId'), None)
+                if params.get('blockedReason'):
+                    self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+
+    @property
+    def estimated_bytes_saved(self):
+        return sum(AVG_BLOCKED_BYTES.get(t, AVG_BLOCKED_BYTES['Other']) * n for t, n in self.blocked.items())
+
+    def summary(self):
+        return {
+            'bytes_received': self.bytes_received,
+            'requests_finished': self.requests_finished,
+            'requests_blocked': sum(self.blocked.values()),
+            'blocked_by_type': dict(self.blocked),
+            'estimated_bytes_saved': self.estimated_bytes_saved,
+        }
+
+
+def chromedriver_service(refresh=False):
+    """Service for a webdriver_manager chromedriver, cached so install() runs at most weekly"""
+    if not refresh and os.path.exists(CHROMEDRIVER_CACHE_FILE):
+        age_days = (time.time() - os.path.getmtime(CHROMEDRIVER_CACHE_FILE)) / 86400
+        with open(CHROMEDRIVER_CACHE_FILE, encoding='utf-8') as f:
+            cached_path = f.read().strip()
+        if age_days < CHROMEDRIVER_CACHE_DAYS and os.path.exists(cached_path):
+            return Service(cached_path)
+
+    from webdriver_manager.chrome import ChromeDriverManager
+    driver_path = ChromeDriverManager().install()
+    os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE_FILE), exist_ok=True)
+    with open(CHROMEDRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+        f.write(driver_path)
+    return Service(driver_path)
+
+
+def create_driver(headless=True, block_types=DEFAULT_BLOCK_TYPES, block_domains=AD_TRACKER_DOMAINS,
+                  window_size=None, user_agent=None, stealth=False, extra_args=(), service=None,
+                  meter=True, attach=ATTACH_TO_DAEMON):
+    """Create a lean Chrome driver: shared options, CDP resource blocking, bandwidth meter
+
+    Pass ``block_types=()`` and ``block_domains=()`` to load pages in full.
+    With ``attach=True`` and browser_daemon running, the driver attaches to
+    that warm browser (launch options such as headless/window size are then
+    the daemon's).
+    """
+    if attach and browser_daemon.is_running():
+        options = Options()
+        options.debugger_address = browser_daemon.debugger_address()
+        if meter:
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        driver = webdriver.Chrome(service=service, options=options)
+        driver.attached = True
+        print(f"♻️ Attached to warm browser at {options.debugger_address}")
+    else:
+        options = build_chrome_options(headless=headless, window_size=window_size, user_agent=user_agent,
+                                       stealth=stealth, extra_args=extra_args, meter=meter)
+        driver = webdriver.Chrome(service=service, options=options)
+        driver.attached = False
+
+    if block_types or block_domains:
+        apply_resource_blocking(driver, block_types, block_domains)
+    if stealth:
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+
+    driver.bandwidth = BandwidthMeter() if meter else None
+    return driver
+
+
+def ensure_on(driver, url, wait=2):
+    """Make sure the driver is on ``url``'s site, reusing a warm tab when possible
+
+    Returns True if a navigation was needed. On an attached daemon browser a
+    tab left on the same host by an earlier run is simply switched to.
+    """
+    host = urlparse(url).netloc
+    if urlparse(driver.current_url).netloc == host:
+        return False
+
+    if getattr(driver, 'attached', False):
+        current = driver.current_window_handle
+        for handle in driver.window_handles:
+            driver.switch_to.window(handle)
+            if urlparse(driver.current_url).netloc == host:
+                return False
+        driver.switch_to.window(current)
+
+    driver.get(url)
+    time.sleep(wait)
+    return True
+
+
+def get_throttled(driver, url, limiter=None):
+    """driver.get() paced by the shared per-host rate limiter"""
+    limiter = limiter or get_limiter()
+    with limiter.throttle(url):
+        driver.get(url)
+
+
+def collect_bandwidth(driver):
+    meter = getattr(driver, 'bandwidth', None)
+    if meter:
+        meter.collect(driver)
+
+
+def report_bandwidth(driver, log=print):
+    """Print and return this driver's bandwidth summary"""
+    meter = getattr(driver, 'bandwidth', None)
+    if not meter:
+        return None
+    meter.collect(driver)
+    stats = meter.summary()
+    log(f"📉 Bandwidth: {stats['bytes_received'] / 1_048_576:.1f} MB received in "
+        f"{stats['requests_finished']} requests, {stats['requests_blocked']} blocked "
+        f"(~{stats['estimated_bytes_saved'] / 1_048_576:.1f} MB saved)")
+    return stats
+
+
+def quit_driver(driver, log=print):
+    """Report bandwidth for the run, then quit the driver
+
+    Attached drivers only stop their chromedriver; the daemon browser, its
+    tabs and cookies stay warm for the next run.
+    """
+    try:
+        report_bandwidth(driver, log=log)
+    except Exception as e:
+        log(f"Could not read bandwidth stats: {e}")
+    if getattr(driver, 'attached', False):
+        driver.service.stop()
+    else:
+        driver.quit()
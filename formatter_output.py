@@ -0,0 +1,118 @@
+import os
+import pandas as pd
+
+from car_template import COLUMNS, MISSING, apply_dtypes
+
+# 'csv' = ไฟล์เดิม (utf-8-sig สำหรับ Excel)
+# 'parquet' = ไฟล์ columnar เดียว บีบอัด zstd + dictionary encoding
+# 'dataset' = parquet แบ่งโฟลเดอร์ตาม PARTITION_COLS (เช่น Sources=one2car/)
+OUTPUT_FORMATS = ('csv', 'parquet', 'dataset')
+PARTITION_COLS = ['Sources']
+PARQUET_COMPRESSION = 'zstd'
+
+# คอลัมน์ตัวเลขที่อาจยังใช้ 'N/A' แทนค่าว่าง (ตารางแบบ object ที่ยังไม่ผ่าน apply_dtypes)
+NUMERIC_COLUMNS = ['Year', 'Price', 'Mileage']
+
+
+def output_path_for(directory, filename, fmt):
+    """Output path for ``filename`` in ``directory`` with the extension of ``fmt``"""
+    base = os.path.splitext(filename)[0]
+    if fmt == 'parquet':
+        return os.path.join(directory, f"{base}.parquet")
+    if fmt == 'dataset':
+        return os.path.join(directory, base)
+    return os.path.join(directory, filename)
+
+
+def arrow_safe(df):
+    """Copy of ``df`` whose object columns each hold a single type
+
+    Arrow cannot store a column mixing numbers and the 'N/A' placeholder.
+    Numeric template columns become real numbers with nulls for 'N/A'/blank;
+    any other mixed column is stored as text.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        values = df[column]
+        if column in NUMERIC_COLUMNS:
+            present = values.where(~values.isin(['N/A', '']))
+            numbers = pd.to_numeric(present, errors='coerce')
+            # แปลงเป็นตัวเลขเฉพาะเมื่อไม่มีค่าอื่นหายไประหว่างแปลง
+            if numbers.notna().sum() == present.notna().sum():
+                df[column] = numbers
+                continue
+        if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+            df[column] = values.map(lambda v: v if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+    return df
+
+
+def write_output(df, path, fmt='csv', partition_cols=PARTITION_COLS):
+    """Write the combined DataFrame as CSV, a Parquet file or a partitioned Parquet dataset
+
+    Parquet needs ``pyarrow``; it is only imported when a Parquet format is
+    requested, so CSV output keeps working without it.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {OUTPUT_FORMATS}")
+
+    if fmt == 'csv':
+        # ใช้ encoding 'utf-8-sig' เพื่อให้โปรแกรม Excel เปิดไฟล์ภาษาไทยได้ถูกต้อง
+        # ค่าว่าง (null) เขียนเป็น 'N/A' เหมือนไฟล์เดิม read_output จะแปลงกลับเป็น null
+        df.to_csv(path, index=False, encoding='utf-8-sig', na_rep=MISSING)
+        return path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from None
+
+    table = pa.Table.from_pandas(arrow_safe(df), preserve_index=False)
+    if fmt == 'parquet':
+        pq.write_table(table, path, compression=PARQUET_COMPRESSION, use_dictionary=True)
+    else:
+        pq.write_to_dataset(table, root_path=path, partition_cols=list(partition_cols),
+                            compression=PARQUET_COMPRESSION, use_dictionary=True,
+                            existing_data_behavior='delete_matching')
+    return path
+
+
+def read_output(path, fmt=None):
+    """Read a file written by write_output back with the template dtypes
+
+    CSV is read as text with 'N/A' as null, so phone numbers keep their
+    leading zero, and ``apply_dtypes`` restores the category and nullable
+    numeric columns. Parquet files and datasets store the dtypes themselves.
+    ``fmt`` defaults to the one implied by ``path``.
+    """
+    if fmt is None:
+        if os.path.isdir(path):
+            fmt = 'dataset'
+        elif path.lower().endswith('.parquet'):
+            fmt = 'parquet'
+        else:
+            fmt = 'csv'
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {OUTPUT_FORMATS}")
+
+    if fmt == 'csv':
+        df = pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False, na_values=[MISSING, ''])
+        # คอลัมน์นอก template (เช่น Cluster ID) แปลงเป็นตัวเลขถ้าทุกค่าเป็นตัวเลข
+        for column in df.columns.difference(COLUMNS):
+            try:
+                df[column] = pd.to_numeric(df[column])
+            except (ValueError, TypeError):
+                pass
+        return apply_dtypes(df)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from None
+
+    # dataset: คอลัมน์ที่ใช้แบ่งโฟลเดอร์ (Sources) ถูกอ่านกลับมาต่อท้าย จึงเรียงคอลัมน์ใหม่
+    df = pd.read_parquet(path)
+    ordered = [c for c in COLUMNS if c in df] + [c for c in df.columns if c not in COLUMNS]
+    return apply_dtypes(df[ordered])
@@ -0,0 +1,111 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from car_template import ColumnarBuilder, concat_frames
+from json_stream import CHUNK_ROWS
+
+# จำนวนไฟล์ต่อ 1 งานที่ส่งให้ worker (ไฟล์หน้าเล็กๆ หลายพันไฟล์ ถ้าส่งทีละไฟล์จะเสียเวลากับ IPC)
+TASKS_PER_WORKER = 4
+
+
+def _file_order(filename):
+    """Sort key: numeric stems by value (2.json before 10.json), then any other names by text"""
+    stem = os.path.splitext(filename)[0]
+    return (0, int(stem), filename) if stem.isdigit() else (1, 0, filename)
+
+
+def list_json_files(directory_path):
+    """All .json files in a directory, in page order so every run sees them in the same order"""
+    return sorted((f for f in os.listdir(directory_path) if f.endswith('.json')), key=_file_order)
+
+
+def read_file_columns(file_path, cars_of, car_info, source_name):
+    """Read one JSON file and map its cars into a columnar chunk
+
+    Runs inside a worker process, so it returns problems instead of printing
+    them: ``(filename, ColumnarBuilder, warning)``. ``cars_of`` pulls the
+    list of cars out of the decoded file and ``car_info`` maps one car to a
+    CarRecord; both must be module-level functions so they can be pickled.
+    If a car fails to map, the cars before it are still returned (as the
+    sequential formatters always did) together with the warning.
+    """
+    filename = os.path.basename(file_path)
+    chunk = ColumnarBuilder()
+    try:
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            data = json.load(f)
+        for car in cars_of(data):
+            chunk.append(car_info(car, source_name))
+    except json.JSONDecodeError:
+        return filename, chunk, f"ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {filename} ได้"
+    except Exception as e:
+        return filename, chunk, f"เกิดข้อผิดพลาดขณะประมวลผลไฟล์ {filename}: {e}"
+    return filename, chunk, None
+
+
+def iter_directory_frames(directory_path, cars_of, car_info, source_name, workers=1, chunk_rows=CHUNK_ROWS):
+    """Format the JSON files of a directory into template DataFrames of about ``chunk_rows`` rows
+
+    With ``workers`` > 1 the files are spread over a process pool; each
+    worker returns a columnar chunk per file and the chunks are yielded as
+    soon as enough rows have arrived. ``Executor.map`` yields results in
+    submission order and the files are sorted, so the rows come out in the
+    same order for any ``workers``. ``workers=1`` reads the files in this
+    process. The chunks hold raw values; concat_frames applies the dtypes.
+    """
+    if not os.path.isdir(directory_path):
+        print(f"ผิดพลาด: ไม่พบโฟลเดอร์ '{directory_path}' กรุณาตรวจสอบตำแหน่ง")
+        return
+
+    print(f"เริ่มต้นสแกนไฟล์ในโฟลเดอร์ '{directory_path}'...")
+
+    json_files = list_json_files(directory_path)
+    if not json_files:
+        print("ไม่พบไฟล์ .json ในโฟลเดอร์")
+        return
+
+    print(f"พบ {len(json_files)} ไฟล์ JSON จะเริ่มทำการประมวลผล...")
+
+    paths = [os.path.join(directory_path, filename) for filename in json_files]
+    reader = partial(read_file_columns, cars_of=cars_of, car_info=car_info, source_name=source_name)
+
+    workers = max(1, min(workers or 1, len(paths)))
+    pending = ColumnarBuilder()
+    total = 0
+
+    def collect(results):
+        nonlocal total
+        for filename, chunk, warning in results:
+            print(f"  - กำลังอ่านไฟล์: {filename}")
+            if warning:
+                print(f"    คำเตือน: {warning}")
+            pending.merge(chunk)
+            total += len(chunk)
+            if len(pending) >= chunk_rows:
+                yield pending.to_frame(dtypes=False)
+                pending.clear()
+
+    if workers == 1:
+        yield from collect(map(reader, paths))
+    else:
+        print(f"ใช้ {workers} process ในการอ่านไฟล์")
+        chunksize = max(1, len(paths) // (workers * TASKS_PER_WORKER))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from collect(pool.map(reader, paths, chunksize=chunksize))
+
+    if len(pending):
+        yield pending.to_frame(dtypes=False)
+    elif not total:
+        print("ไม่พบข้อมูลรถยนต์ในไฟล์ JSON ทั้งหมด")
+
+
+def build_from_directory(directory_path, cars_of, car_info, source_name, workers=1):
+    """Format every JSON file in a directory into one DataFrame (see iter_directory_frames)"""
+    frames = list(iter_directory_frames(directory_path, cars_of, car_info, source_name, workers))
+    if not frames:
+        return pd.DataFrame()
+    return concat_frames(frames)
@@ -0,0 +1,36 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+
+def make_session(pool_size=10, headers=None):
+    """Create a requests Session with a keep-alive connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': DEFAULT_USER_AGENT})
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def harvest_browser_session(driver, session):
+    """Copy cookies and the User-Agent from a live Selenium driver into a Session"""
+    user_agent = driver.execute_script("return navigator.userAgent")
+    if user_agent:
+        # headless Chrome ใส่คำว่า HeadlessChrome ไว้ใน UA ซึ่งบางเว็บใช้บล็อก
+        session.headers['User-Agent'] = user_agent.replace('HeadlessChrome', 'Chrome')
+
+    for cookie in driver.get_cookies():
+        session.cookies.set(
+            cookie['name'],
+            cookie['value'],
+            domain=cookie.get('domain'),
+            path=cookie.get('path', '/'),
+        )
+    return session
@@ -0,0 +1,93 @@
+import json
+import re
+
+from car_template import ColumnarBuilder
+
+# อ่านไฟล์ทีละ 1 MB และสร้าง DataFrame ทีละ 5,000 คัน หน่วยความจำจึงคงที่ไม่ว่าไฟล์จะใหญ่แค่ไหน
+READ_SIZE = 1 << 20
+CHUNK_ROWS = 5000
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+
+def iter_json_array(path, encoding='utf-8', read_size=READ_SIZE):
+    """Yield the items of a top-level JSON array one at a time
+
+    Only a window of the file is held in memory: each item is decoded with
+    ``JSONDecoder.raw_decode`` straight from the buffer, and the buffer is
+    refilled (and grown if a single item is larger) as the parser reaches
+    its end. Items must be separated by exactly one comma. Raises
+    json.JSONDecodeError on malformed input, after every item before the
+    damage has been yielded.
+    """
+    with open(path, 'r', encoding=encoding) as f:
+        # ตัด BOM (ไฟล์ที่บันทึกด้วย utf-8-sig) ออกก่อนเริ่ม parse
+        buffer = f.read(read_size).lstrip('\ufeff')
+        pos, eof = 0, False
+        # สิ่งที่ต้องเจอถัดไป: '[' เปิด array, 'first' ค่าแรกหรือ ']', 'item' ค่าหลัง ',', 'comma' ',' หรือ ']'
+        expect = '['
+
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                char = buffer[pos]
+                if expect == '[':
+                    if char != '[':
+                        raise json.JSONDecodeError("Expected a top-level JSON array", buffer, pos)
+                    expect = 'first'
+                    pos += 1
+                    continue
+                if expect == 'comma':
+                    if char == ']':
+                        return
+                    if char != ',':
+                        raise json.JSONDecodeError("Expected ',' or ']' after array item", buffer, pos)
+                    expect = 'item'
+                    pos += 1
+                    continue
+                if char == ']' and expect == 'first':
+                    return
+                try:
+                    item, end = _DECODER.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # รับค่าเมื่อเห็น ',' หรือ ']' ตามหลังแล้วเท่านั้น ตัวเลขที่ถูกตัดท้าย buffer
+                    # (เช่น '2.' ของ '2.5') decode ได้แต่ยังไม่ครบ ต้องอ่านต่อก่อน
+                    after = _WHITESPACE.match(buffer, end).end()
+                    if eof or (after < len(buffer) and buffer[after] in ',]'):
+                        yield item
+                        pos = end
+                        expect = 'comma'
+                        continue
+            elif eof:
+                raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+
+            more = f.read(read_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+
+
+def frames_from_records(records, mapper, chunk_rows=CHUNK_ROWS):
+    """Map records to CarRecords one by one and yield template DataFrames of at most ``chunk_rows`` rows
+
+    The chunks hold the raw values; pass them to concat_frames, which applies
+    the template dtypes once for all of them. If ``records`` raises json.JSONDecodeError, the rows read so far are
+    yielded first and the error is raised after them.
+    """
+    chunk = ColumnarBuilder()
+    try:
+        for record in records:
+            chunk.append(mapper(record))
+            if len(chunk) >= chunk_rows:
+                yield chunk.to_frame(dtypes=False)
+                chunk.clear()
+    except json.JSONDecodeError:
+        if len(chunk):
+            yield chunk.to_frame(dtypes=False)
+        raise
+    if len(chunk):
+        yield chunk.to_frame(dtypes=False)
@@ -0,0 +1,231 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_client import make_session, harvest_browser_session
+from rate_limiter import get_limiter, retry_after_seconds
+
+KAIDEE_HOME = 'https://rod.kaidee.com/c11-auto-car'
+LISTING_URL = 'https://rod.kaidee.com/_next/data/{token}/th/auto/listing.json?categoryId=11&attributeId=1&page={page}'
+TOKEN_CACHE_FILE = 'kaidee_token.json'
+MAX_WORKERS = 8
+TOKEN_TTL = 6 * 3600  # buildId เปลี่ยนเมื่อเว็บ deploy ใหม่ เก็บไว้ใช้ได้ไม่เกิน 6 ชั่วโมง
+# หน้าที่ probe แล้ว error (429/5xx/timeout) ลองใหม่กี่ครั้ง และรอเริ่มต้นกี่วินาที (เพิ่มเท่าตัวทุกรอบ)
+PROBE_RETRIES = 4
+PROBE_BACKOFF = 2.0
+
+LISTING_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:137.0) Gecko/20100101 Firefox/137.0',
+    'Accept': '*/*',
+    'Accept-Language': 'th,en-US;q=0.7,en;q=0.3',
+    'Referer': 'https://rod.kaidee.com/',
+    'x-nextjs-data': '1',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin'
+}
+
+_BUILD_ID_RE = re.compile(r'"buildId"\s*:\s*"([^"]+)"')
+
+
+def build_id_from_html(html):
+    """Read the Next.js buildId out of a page's __NEXT_DATA__ script"""
+    match = _BUILD_ID_RE.search(html)
+    return match.group(1) if match else None
+
+
+def build_id_from_driver(driver):
+    """Read the buildId from the live page, no request capture needed"""
+    return driver.execute_script("return window.__NEXT_DATA__ ? window.__NEXT_DATA__.buildId : null")
+
+
+def build_id_from_http(session):
+    """Fetch one Kaidee page over HTTP and read its buildId"""
+    response = session.get(KAIDEE_HOME, timeout=30)
+    response.raise_for_status()
+    return build_id_from_html(response.text)
+
+
+class BuildIdCache:
+    """buildId stored on disk with a TTL so most runs skip discovery entirely"""
+
+    def __init__(self, path=TOKEN_CACHE_FILE, ttl=TOKEN_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if time.time() - cached.get('fetched_at', 0) > self.ttl:
+            return None
+        return cached.get('token')
+
+    def save(self, token):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'token': token, 'fetched_at': time.time()}, f)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class KaideeListingClient:
+    """Fetches listing.json pages over plain HTTP, refreshing a stale buildId on 404"""
+
+    def __init__(self, token=None, session=None, cache=None, log=print):
+        self.session = session or make_session(headers=LISTING_HEADERS)
+        self.cache = cache or BuildIdCache()
+        self.log = log
+        self.token = token
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def from_driver(cls, driver, token=None, **kwargs):
+        client = cls(token=token, **kwargs)
+        harvest_browser_session(driver, client.session)
+        # listing.json คาดหวัง header ของ Firefox ตามเดิม
+        client.session.headers['User-Agent'] = LISTING_HEADERS['User-Agent']
+        return client
+
+    def get_token(self, driver=None):
+        """Cached buildId if still fresh, else read it from the page and cache it"""
+        if self.token:
+            return self.token
+        token = self.cache.load()
+        if token:
+            self.log(f"Using cached token: {token}")
+        else:
+            token = build_id_from_driver(driver) if driver else None
+            token = token or build_id_from_http(self.session)
+            if token:
+                self.cache.save(token)
+        self.token = token
+        return token
+
+    def refresh_token(self, stale_token):
+        """Rediscover the buildId once, even if several threads hit 404 together"""
+        with self._refresh_lock:
+            if self.token != stale_token:
+                return self.token
+            self.log(f"Token {stale_token} returned 404, refreshing buildId...")
+            self.cache.clear()
+            token = build_id_from_http(self.session)
+            if token:
+                self.cache.save(token)
+                self.log(f"New token: {token}")
+            self.token = token
+            return token
+
+    def fetch_page(self, page_no):
+        """Return the decoded listing.json for one page, or {'error': ...}"""
+        for attempt in range(2):
+            try:
+                # การหา buildId ใหม่ก็ยิง HTTP (raise_for_status) จึงต้องอยู่ใน try เช่นกัน
+                token = self.get_token()
+                if not token:
+                    return {'error': 'no buildId'}
+                url = LISTING_URL.format(token=token, page=page_no)
+                with get_limiter().throttle(url) as slot:
+                    response = self.session.get(url, timeout=30)
+                    slot['status'] = response.status_code
+                    slot['retry_after'] = retry_after_seconds(response.headers)
+                if response.status_code == 404 and attempt == 0:
+                    self.refresh_token(token)
+                    continue
+                if response.status_code != 200:
+                    return {'error': f"HTTP {response.status_code}"}
+                return response.json()
+            except Exception as e:
+                return {'error': str(e)}
+        return {'error': 'HTTP 404'}
+
+
+def car_ads(response):
+    """Ads with a title (real car listings) from one listing.json response"""
+    ads = response.get('pageProps', {}).get('ads') or []
+    return [ad for ad in ads if 'title' in ad]
+
+
+def find_last_page(client, max_page=None, log=print):
+    """Find the last non-empty listing page: exponential probing, then binary search
+
+    Needs about 2*log2(N) requests instead of walking every page. ``max_page``
+    caps the search. A probe that errors is retried with backoff; if it keeps
+    failing a RuntimeError is raised, because counting it as an empty page
+    would silently cut the crawl short.
+    """
+    def has_ads(page_no):
+        delay = PROBE_BACKOFF
+        for attempt in range(1, PROBE_RETRIES + 1):
+            response = client.fetch_page(page_no)
+            if 'error' not in response:
+                return bool(response.get('pageProps', {}).get('ads'))
+            log(f"Probe page {page_no}: {response['error']} (attempt {attempt}/{PROBE_RETRIES})")
+            if attempt < PROBE_RETRIES:
+                time.sleep(delay)
+                delay *= 2
+        raise RuntimeError(f"Could not probe page {page_no}: {response['error']}")
+
+    if not has_ads(1):
+        return 0
+    low, high = 1, 2
+    while (max_page is None or high <= max_page) and has_ads(high):
+        low, high = high, high * 2
+    if max_page is not None and high > max_page:
+        if low == max_page or has_ads(max_page):
+            return max_page
+        high = max_page
+    # low มีข้อมูล, high ว่าง
+    while high - low > 1:
+        middle = (low + high) // 2
+        if has_ads(middle):
+            low = middle
+        else:
+            high = middle
+    log(f"Last page with ads: {low}")
+    return low
+
+
+def fetch_pages_concurrently(client, pages, workers=MAX_WORKERS, log=print):
+    """Fetch listing pages in parallel and return the ads deduplicated by id
+
+    Listings shift between pages while we crawl, so the same ad can show up
+    twice; the first copy seen is kept. Results are returned in page order.
+    """
+    by_page = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(client.fetch_page, page_no): page_no for page_no in pages}
+        for future in as_completed(futures):
+            page_no = futures[future]
+            try:
+                response = future.result()
+            except Exception as e:
+                log(f"An unexpected exception occurred on page {page_no}: {e}")
+                continue
+            if 'error' in response:
+                log(f"Error on page {page_no}: {response['error']}")
+                continue
+            by_page[page_no] = car_ads(response)
+            log(f"Page {page_no}: Scraped {len(by_page[page_no])} car ads ({len(by_page)}/{len(pages)} pages done)")
+
+    seen, unique_ads = set(), []
+    for page_no in sorted(by_page):
+        for ad in by_page[page_no]:
+            ad_id = ad.get('id')
+            if ad_id is not None:
+                if ad_id in seen:
+                    continue
+                seen.add(ad_id)
+            unique_ads.append(ad)
+    duplicates = sum(len(ads) for ads in by_page.values()) - len(unique_ads)
+    if duplicates:
+        log(f"Removed {duplicates} duplicate ads that shifted between pages")
+    return unique_ads
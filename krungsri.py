@@ -1,84 +1,298 @@
-from seleniumwire import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-import json
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import csv
+import os
+import re
+import time
 
-# Optional: configure Chrome options
-chrome_options = Options()
-chrome_options.add_argument("--window-size=1200,800")
-# chrome_options.add_argument("--headless")  # Uncomment to run headless
+from driver_factory import create_driver, chromedriver_service, collect_bandwidth, get_throttled, quit_driver
+from http_client import make_session
+from listing_store import ListingStore, key_from
+from page_extract import WAREHOUSE_FIELDS, parse_warehouse_rows, warehouse_record
+from rate_limiter import get_limiter, retry_after_seconds
 
-# Set up Chrome driver using WebDriver Manager
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+WAREHOUSE_URL = 'https://krungsrimarket.cjdataservice.com/usedcar/warehouse'
+OUTPUT_FILE = 'krungsrimarket_demo.csv'
 
-# --- Navigate to the initial page first ---
-print("Navigating to the Krungsri Market Used Car Warehouse page...")
-driver.get('https://krungsrimarket.cjdataservice.com/usedcar/warehouse')
+# False = หาจำนวนหน้าเองแล้วดึงผ่าน HTTP พร้อมกันหลายหน้า (รันใน scheduler ได้)
+# True = เปิด Chrome และถามจำนวนหน้าเหมือนเดิม
+INTERACTIVE = False
+# จำนวนหน้าที่ดึงพร้อมกัน (ความถี่จริงยังถูกคุมด้วย rate limiter ของ host)
+MAX_WORKERS = 6
+# เพดานของการไล่หาหน้าสุดท้าย กันไม่ให้ probe ไม่จบถ้าเว็บส่งหน้าเดิมซ้ำทุกเลขหน้า
+MAX_PAGES = 5000
+# หน้าที่ดึงไม่สำเร็จ (timeout/429/5xx) ลองใหม่กี่ครั้ง และรอเริ่มต้นกี่วินาที (เพิ่มเท่าตัวทุกรอบ)
+PAGE_RETRIES = 4
+PAGE_BACKOFF = 2.0
 
-# Ask user for the number of pages to scrape
-while True:
+HTTP_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'th,en-US;q=0.7,en;q=0.3',
+}
+
+# อ่านทั้งตารางใน execute_script ครั้งเดียว แทนการเรียก WebDriver ~7 ครั้งต่อแถว
+WAREHOUSE_ROWS_JS = """
+return Array.from(document.getElementsByClassName('clickable-row')).map(function (row) {
+    return {
+        cells: Array.from(row.getElementsByTagName('td')).map(function (td) { return td.innerText; }),
+        link: row.getAttribute('data-href')
+    };
+});
+"""
+
+_PAGE_LINK_RE = re.compile(r'[?&](?:amp;)?page=(\d+)')
+
+
+def build_page_url(page_number):
+    return f'{WAREHOUSE_URL}?page={page_number}'
+
+
+class CsvRowWriter:
+    """Streams records to the output CSV (and the listing store) as pages arrive
+
+    Rows go to ``<path>.tmp``; ``commit()`` swaps it in over ``path`` once the
+    crawl has finished, so a failed run leaves the previous CSV untouched.
+    """
+
+    def __init__(self, path=OUTPUT_FILE, store=None):
+        self.store = store
+        self.path = path
+        self.temp_path = path + '.tmp'
+        self.file = open(self.temp_path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=list(WAREHOUSE_FIELDS) + ['link'])
+        self.writer.writeheader()
+        self.count = 0
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+        if self.store:
+            self.store.upsert_many("krungsri_market", rows, key_from('link'))
+        self.count += len(rows)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def close(self):
+        """Close without committing: the temp file is discarded (no-op after commit)"""
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def fetch_page_html(session, page_number):
+    """Fetch one warehouse page over HTTP, or None on failure"""
+    url = build_page_url(page_number)
     try:
-        total_page_number = int(input("Enter the number of pages you want to scrape (e.g., if there are 100 pages, you can enter 100): "))
-        if total_page_number > 0:
-            break
+        with get_limiter().throttle(url) as slot:
+            response = session.get(url, timeout=30)
+            slot['status'] = response.status_code
+            slot['retry_after'] = retry_after_seconds(response.headers)
+    except Exception as e:
+        print(f"❌ Error fetching page {page_number}: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"❌ HTTP {response.status_code} on page {page_number}")
+        return None
+    return response.text
+
+
+def scrape_page_http(session, page_number, retries=PAGE_RETRIES, backoff=PAGE_BACKOFF):
+    """Fetch and parse one warehouse page without a browser
+
+    Returns the rows ([] for a page that really is empty), or None if the
+    page could not be fetched after ``retries`` attempts with doubling backoff.
+    """
+    delay = backoff
+    for attempt in range(1, retries + 1):
+        html = fetch_page_html(session, page_number)
+        if html is not None:
+            return parse_warehouse_rows(html)
+        if attempt < retries:
+            time.sleep(delay)
+            delay *= 2
+    return None
+
+
+def page_has_rows(session, page_number):
+    """True/False for a page with/without rows; raises if the page keeps failing
+
+    Counting a failed page as empty would end the page count early.
+    """
+    rows = scrape_page_http(session, page_number)
+    if rows is None:
+        raise RuntimeError(f"Could not fetch page {page_number} after {PAGE_RETRIES} attempts")
+    return bool(rows)
+
+
+def page_count_from_pagination(html):
+    """Highest ?page=N linked from the pagination control, or None"""
+    pages = [int(n) for n in _PAGE_LINK_RE.findall(html or '')]
+    return max(pages) if pages else None
+
+
+def probe_page_count(has_rows, max_page=MAX_PAGES):
+    """Last page with rows (at most ``max_page``): exponential probing, then binary search"""
+    if not has_rows(1):
+        return 0
+    low, high = 1, 2
+    while high <= max_page and has_rows(high):
+        low, high = high, high * 2
+    if high > max_page:
+        if low == max_page or has_rows(max_page):
+            print(f"⚠️ Page {max_page} still has rows, stopping the probe at max_page")
+            return max_page
+        high = max_page
+    while high - low > 1:
+        middle = (low + high) // 2
+        if has_rows(middle):
+            low = middle
         else:
-            print("Please enter a positive number.")
-    except ValueError:
-        print("Invalid input. Please enter a whole number.")
+            high = middle
+    return low
+
+
+def discover_page_count(session):
+    """Read the page count from page 1's pagination, falling back to probing"""
+    html = fetch_page_html(session, 1)
+    page_count = page_count_from_pagination(html)
+    # pagination อาจแสดงแค่บางหน้า จึงยืนยันว่าหน้าถัดไปว่างจริง
+    if page_count and page_has_rows(session, page_count) and not page_has_rows(session, page_count + 1):
+        print(f"📄 Pagination shows {page_count} pages")
+        return page_count
+
+    print("🔍 Page count not in pagination, probing for the last page...")
+    page_count = probe_page_count(lambda page: page_has_rows(session, page))
+    print(f"📄 Found {page_count} pages by probing")
+    return page_count
+
 
-all_data = []
+def crawl_http(page_count, writer, workers=MAX_WORKERS, session=None):
+    """Fetch pages 1..page_count concurrently and stream their rows to ``writer`` in page order
 
-print(f"\nStarting to scrape {total_page_number} pages...")
-for index in range(1, total_page_number + 1):
-    print(f"Scraping page {index}...")
-    driver.get(f'https://krungsrimarket.cjdataservice.com/usedcar/warehouse?page={index}')
+    Returns the pages that still failed after retries (sorted).
+    """
+    session = session or make_session(pool_size=workers, headers=HTTP_HEADERS)
+    # หน้าที่เสร็จก่อนลำดับจะรอใน finished จนหน้าก่อนหน้าเขียนครบ ไฟล์จึงเรียงตามเลขหน้าเสมอ
+    finished = {}
+    failed = []
+    next_page = 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(scrape_page_http, session, page): page
+                   for page in range(1, page_count + 1)}
+        for done, future in enumerate(as_completed(futures), 1):
+            page = futures[future]
+            rows = future.result()
+            if rows is None:
+                print(f"❌ Page {page} failed after {PAGE_RETRIES} attempts")
+                failed.append(page)
+            elif not rows:
+                print(f"⚠️ No data rows found on page {page}")
+            finished[page] = rows
+            while next_page in finished:
+                # เขียนจาก thread หลักเท่านั้น จึงไม่ต้องล็อกไฟล์
+                ready = finished.pop(next_page)
+                if ready:
+                    writer.write_rows(ready)
+                next_page += 1
+            print(f"✅ Page {page}: {len(rows or [])} rows ({done}/{page_count} pages, {writer.count} rows written)")
+    return sorted(failed)
 
+
+def scrape_page_browser(driver, page_number):
+    """Load one warehouse page in the browser and read its table, or None if it never rendered"""
+    get_throttled(driver, build_page_url(page_number))
     try:
         WebDriverWait(driver, 10).until(
             EC.presence_of_all_elements_located((By.CLASS_NAME, 'clickable-row'))
         )
     except Exception as e:
-        print(f"Could not find elements on page {index}. Skipping to next page. Error: {e}")
-        continue
-
-    rows = driver.find_elements(By.CLASS_NAME, 'clickable-row')
-    if not rows:
-        print(f"No data rows found on page {index}. It might be the end or an empty page.")
-        if index > 1:
-            print("Stopping scraping as no more data rows were found.")
-            break
-
-    for row in rows:
-        data = {}
-        tds = row.find_elements(By.TAG_NAME, "td")
-
-        if len(tds) >= 5:
-            data['index'] = tds[0].text.strip()
-            data['brand'] = tds[1].text.strip()
-            data['model'] = tds[2].text.strip()
-            data['mileage'] = tds[3].text.strip()
-            data['price_range'] = tds[4].text.strip()
-            data['link'] = row.get_attribute('data-href')
-
-            all_data.append(data)
-
-driver.quit()
-
-print("\n--- Scraped Data Summary ---")
-if all_data:
-    print(f"Successfully scraped {len(all_data)} records.")
-else:
-    print("No data was scraped.")
-
-# Save to CSV
-if all_data:
-    df = pd.DataFrame(all_data)
-    df.to_csv('krungsrimarket_demo.csv', encoding='utf-8-sig', index=False)
-    print(f"Data successfully saved to krungsrimarket_demo.csv. Total {len(all_data)} records.")
-else:
-    print("No data to save to CSV.")
+        print(f"Could not find elements on page {page_number}. Skipping to next page. Error: {e}")
+        return None
+
+    collect_bandwidth(driver)
+    records = (warehouse_record(row['cells'], row['link']) for row in driver.execute_script(WAREHOUSE_ROWS_JS))
+    return [record for record in records if record]
+
+
+def ask_page_count():
+    """Ask the user for the number of pages to scrape"""
+    while True:
+        try:
+            total_page_number = int(input("Enter the number of pages you want to scrape (e.g., if there are 100 pages, you can enter 100): "))
+            if total_page_number > 0:
+                return total_page_number
+            print("Please enter a positive number.")
+        except ValueError:
+            print("Invalid input. Please enter a whole number.")
+
+
+def crawl_browser(writer):
+    """Original visible-browser flow: ask for a page count and load pages one by one"""
+    # Set up Chrome driver using WebDriver Manager (path cached between runs)
+    # (table is read via innerText, so only images/fonts/media/trackers are blocked)
+    driver = create_driver(headless=False,  # set True to run headless
+                           window_size="1200,800",
+                           service=chromedriver_service())
+    try:
+        # --- Navigate to the initial page first ---
+        print("Navigating to the Krungsri Market Used Car Warehouse page...")
+        driver.get(WAREHOUSE_URL)
+        total_page_number = ask_page_count()
+
+        print(f"\nStarting to scrape {total_page_number} pages...")
+        for index in range(1, total_page_number + 1):
+            print(f"Scraping page {index}...")
+            rows = scrape_page_browser(driver, index)
+            if rows is None:
+                continue
+            if not rows:
+                print(f"No data rows found on page {index}. It might be the end or an empty page.")
+                if index > 1:
+                    print("Stopping scraping as no more data rows were found.")
+                    break
+            writer.write_rows(rows)
+    finally:
+        quit_driver(driver)
+
+
+def main():
+    store = ListingStore()
+    writer = CsvRowWriter(OUTPUT_FILE, store=store)
+    failed = []
+    try:
+        if INTERACTIVE:
+            crawl_browser(writer)
+        else:
+            session = make_session(pool_size=MAX_WORKERS, headers=HTTP_HEADERS)
+            try:
+                page_count = discover_page_count(session)
+                print(f"\nStarting to scrape {page_count} pages with {MAX_WORKERS} workers...")
+                failed = crawl_http(page_count, writer, session=session)
+            finally:
+                session.close()
+        # ไฟล์ที่ขาดบางหน้าไม่ถูกนำไปแทนไฟล์เดิม (แถวที่ได้ยังอยู่ใน listing store)
+        if writer.count and not failed:
+            writer.commit()
+    finally:
+        writer.close()
+        store.close()
+        get_limiter().report()
+
+    print("\n--- Scraped Data Summary ---")
+    if failed:
+        print(f"❌ {len(failed)} pages failed: {failed}")
+        print(f"The CSV would be incomplete, so {OUTPUT_FILE} was left unchanged. "
+              f"The {writer.count} rows that were scraped are in the listing store; run again to retry.")
+    elif writer.count:
+        print(f"Data successfully saved to {OUTPUT_FILE}. Total {writer.count} records.")
+    else:
+        print(f"No data was scraped. {OUTPUT_FILE} was left unchanged.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,95 @@
 import os
 import pandas as pd
 
+from car_canon import canonical_columns
+from car_template import COLUMNS, apply_dtypes
+from formatter_output import output_path_for, write_output
+from listing_store import ListingStore, STORE_PATH
+
+# จัดลำดับคอลัมน์ให้ตรงตาม Template
+COLUMN_ORDER = COLUMNS
+
+
+# จำนวนตัวอย่างค่าที่ผิดรูปแบบที่แสดงในรายงานสรุปต่อคอลัมน์
+MAX_REPORT_EXAMPLES = 5
+
+
+def _text_column(raw_df, column):
+    """คอลัมน์เป็นข้อความแบบเดียวกับ str(row.get(column, ''))"""
+    if column not in raw_df:
+        return pd.Series('', index=raw_df.index, dtype=object)
+    return raw_df[column].astype(object).map(str)
+
+
+def build_krungsri_frame(raw_df, source_name="krungsri_market"):
+    """
+    แปลงตารางดิบของ Krungsri Market (จาก CSV หรือ store) เป็น template แบบ vectorized
+    ค่าที่ไม่มีหรือแปลงไม่ได้เป็น null จริง และใช้ dtype ตาม car_template.DTYPES
+
+    Args:
+        raw_df (pandas.DataFrame): ตารางที่มีคอลัมน์ index, brand, model, mileage, price_range, link
+        source_name (str): ชื่อแหล่งข้อมูลในคอลัมน์ Sources
+
+    Returns:
+        tuple: (DataFrame ตาม template, dict ของค่าที่ผิดรูปแบบ {คอลัมน์: [(แถว, ค่า), ...]})
+    """
+    raw_df = raw_df.reset_index(drop=True)
+    row_numbers = raw_df.index + 1
+
+    def column(name):
+        return raw_df[name] if name in raw_df else pd.Series(None, index=raw_df.index, dtype=object)
+
+    # --- แยก Model และ Sub Model (แยกที่ช่องว่างแรกเท่านั้น) ---
+    model_parts = _text_column(raw_df, 'model').str.strip().str.split(' ', n=1, expand=True)
+    model_parts = model_parts.reindex(columns=[0, 1])
+    model = model_parts[0].fillna('')
+    # ชื่อยี่ห้อ/รุ่นมาตรฐาน เช่น 'HONDA' -> 'Honda', 'D-MAX(ปี11-18)' -> 'D-Max'
+    brand, model = canonical_columns(column('brand'), model)
+    sub_model = model_parts[1]
+
+    # --- คำนวณราคาเฉลี่ยจาก Price Range ("low - high") ---
+    price_range = _text_column(raw_df, 'price_range').str.strip()
+    has_range = price_range.str.contains(' - ', regex=False)
+    bounds = price_range.str.split(' - ', regex=False)
+    low = pd.to_numeric(bounds.str[0].str.replace(',', '', regex=False).str.strip(), errors='coerce')
+    high = pd.to_numeric(bounds.str[1].str.replace(',', '', regex=False).str.strip(), errors='coerce')
+    price_ok = has_range & (bounds.str.len() == 2) & low.notna() & high.notna()
+    avg_price = ((low + high) / 2).where(price_ok).astype('Float64')
+
+    # --- ทำความสะอาดข้อมูล Mileage (ต้องเป็นจำนวนเต็มทั้งค่า เหมือน int()) ---
+    mileage_text = _text_column(raw_df, 'mileage').str.replace(',', '', regex=False)
+    mileage_ok = mileage_text.str.fullmatch(r'\s*[+-]?\d+\s*').fillna(False).astype(bool)
+    mileage = pd.to_numeric(mileage_text.where(mileage_ok).str.strip(), errors='coerce').astype('Int64')
+
+    final_df = pd.DataFrame({
+        "Sources": source_name,
+        "Brand": brand,
+        "Model": model,
+        "Sub Model": sub_model,
+        "Year": None,  # ไม่มีข้อมูลนี้ใน Source
+        "Price": avg_price,
+        "Mileage": mileage,
+        "Plate No.": None,
+        "Seller Name": None,
+        "Phone Number": None,
+        "URL": column('link')
+    }, index=raw_df.index)
+
+    # เก็บค่าที่แปลงไม่ได้ไว้สรุปทีเดียว แทนการ print ทีละแถว
+    malformed = {}
+    for name, bad in (('price_range', has_range & ~price_ok), ('mileage', ~mileage_ok)):
+        if bad.any():
+            malformed[name] = list(zip(row_numbers[bad.to_numpy()], column(name)[bad]))
+    return apply_dtypes(final_df[COLUMN_ORDER]), malformed
+
+
+def report_malformed(malformed):
+    """พิมพ์สรุปค่าที่แปลงไม่ได้ของแต่ละคอลัมน์ พร้อมตัวอย่างไม่เกิน MAX_REPORT_EXAMPLES แถว"""
+    for name, rows in malformed.items():
+        examples = ", ".join(f"แถว {row_number}: '{value}'" for row_number, value in rows[:MAX_REPORT_EXAMPLES])
+        more = f" และอีก {len(rows) - MAX_REPORT_EXAMPLES} แถว" if len(rows) > MAX_REPORT_EXAMPLES else ""
+        print(f"  - คำเตือน: ไม่สามารถประมวลผล {name} ได้ {len(rows)} แถว ({examples}{more})")
+
 
 def build_krungsri_database_from_csv(input_filepath):
     """
@@ -15,7 +104,6 @@ def build_krungsri_database_from_csv(input_filepath):
                           หรือ DataFrame ว่างถ้าไม่พบข้อมูล/ไฟล์
     """
     source_name = "krungsri_market"
-    processed_data = []
 
     # ตรวจสอบว่าไฟล์มีอยู่จริงหรือไม่
     if not os.path.exists(input_filepath):
@@ -27,68 +115,46 @@ def build_krungsri_database_from_csv(input_filepath):
     try:
         # อ่านไฟล์ CSV ด้วย Pandas
         df = pd.read_csv(input_filepath)
+        if df.empty:
+            print("ไม่พบข้อมูลที่สามารถประมวลผลได้ในไฟล์")
+            return pd.DataFrame()
 
-        # วนลูปเพื่อประมวลผลข้อมูลทีละแถว
-        for index, row in df.iterrows():
-
-            # --- แยก Model และ Sub Model ---
-            model_full = str(row.get('model', '')).strip()
-            parts = model_full.split(' ', 1)
-            model = parts[0]
-            sub_model = parts[1] if len(parts) > 1 else 'N/A'
-
-            # --- คำนวณราคาเฉลี่ยจาก Price Range ---
-            avg_price = 'N/A'
-            try:
-                price_range_str = str(row.get('price_range', '')).strip()
-                if ' - ' in price_range_str:
-                    low_str, high_str = price_range_str.split(' - ')
-                    low_price = float(low_str.replace(',', ''))
-                    high_price = float(high_str.replace(',', ''))
-                    avg_price = (low_price + high_price) / 2
-            except (ValueError, AttributeError):
-                print(f"  - คำเตือน: ไม่สามารถประมวลผล price_range '{row.get('price_range')}' ที่แถว {index + 1}")
-
-            # --- ทำความสะอาดข้อมูล Mileage ---
-            mileage = 'N/A'
-            try:
-                mileage = int(str(row.get('mileage', '')).replace(',', ''))
-            except (ValueError, AttributeError):
-                print(f"  - คำเตือน: ไม่สามารถประมวลผล mileage '{row.get('mileage')}' ที่แถว {index + 1}")
-
-            car_info = {
-                "Sources": source_name,
-                "Brand": row.get('brand'),
-                "Model": model,
-                "Sub Model": sub_model,
-                "Year": "N/A",  # ไม่มีข้อมูลนี้ใน Source
-                "Price": avg_price,
-                "Mileage": mileage,
-                "Plate No.": "N/A",
-                "Seller Name": "N/A",
-                "Phone Number": "N/A",
-                "URL": row.get('link')
-            }
-            processed_data.append(car_info)
+        # ประมวลผลทั้งคอลัมน์พร้อมกัน (ไม่วนทีละแถว)
+        final_df, malformed = build_krungsri_frame(df, source_name)
 
     except Exception as e:
         print(f"เกิดข้อผิดพลาดร้ายแรงขณะอ่านหรือประมวลผลไฟล์ CSV: {e}")
         return pd.DataFrame()
 
-    if not processed_data:
-        print("ไม่พบข้อมูลที่สามารถประมวลผลได้ในไฟล์")
+    report_malformed(malformed)
+    return final_df
+
+
+def build_krungsri_database_from_store(store_path=STORE_PATH, changed_since=None):
+    """
+    อ่านข้อมูลดิบของ krungsri_market จาก listing store (SQLite) แทนการอ่านไฟล์ CSV
+    และแปลงเป็น Pandas DataFrame ตาม template เดียวกัน
+
+    Args:
+        store_path (str): เส้นทางไปยังไฟล์ฐานข้อมูล listing store
+        changed_since (str): ถ้าระบุ จะอ่านเฉพาะรายการที่เปลี่ยนตั้งแต่เวลานี้ ("YYYY-mm-dd HH:MM:SS")
+
+    Returns:
+        pandas.DataFrame: ตารางข้อมูลรถยนต์ หรือ DataFrame ว่างถ้าไม่พบข้อมูล
+    """
+    if not os.path.exists(store_path):
+        print(f"ผิดพลาด: ไม่พบ listing store '{store_path}'")
         return pd.DataFrame()
 
-    # สร้าง DataFrame จาก list ของข้อมูลที่ประมวลผลแล้ว
-    final_df = pd.DataFrame(processed_data)
+    with ListingStore(store_path) as store:
+        raw_df = pd.DataFrame(list(store.iter_payloads("krungsri_market", changed_since)))
 
-    # จัดลำดับคอลัมน์ให้ตรงตาม Template
-    column_order = [
-        "Sources", "Brand", "Model", "Sub Model", "Year",
-        "Price", "Mileage", "Plate No.", "Seller Name","Phone Number", "URL"
-    ]
-    final_df = final_df[column_order]
+    if raw_df.empty:
+        print("ไม่พบข้อมูลรถยนต์ใน listing store")
+        return pd.DataFrame()
 
+    final_df, malformed = build_krungsri_frame(raw_df)
+    report_malformed(malformed)
     return final_df
 
 
@@ -98,9 +164,14 @@ if __name__ == "__main__":
     DATA_FILE = 'krungsrimarket_demo.csv'
     OUTPUT_DIRECTORY = 'combined'
     OUTPUT_FILENAME = 'krungsri_market_combined_data.csv'
+    READ_FROM_STORE = False  # True = อ่านจาก listing store (listings.db) แทนไฟล์ CSV
+    OUTPUT_FORMAT = 'csv'  # 'csv', 'parquet' หรือ 'dataset' (parquet แบ่งโฟลเดอร์ตาม Sources)
 
     # เรียกใช้ฟังก์ชันหลักเพื่อประมวลผล
-    combined_dataframe = build_krungsri_database_from_csv(DATA_FILE)
+    if READ_FROM_STORE:
+        combined_dataframe = build_krungsri_database_from_store()
+    else:
+        combined_dataframe = build_krungsri_database_from_csv(DATA_FILE)
 
     # ตรวจสอบว่ามีข้อมูลที่ถูกประมวลผลหรือไม่ ก่อนทำการบันทึก
     if not combined_dataframe.empty:
@@ -108,9 +179,10 @@ if __name__ == "__main__":
             print(f"\nกำลังเตรียมบันทึกไฟล์... ตรวจสอบโฟลเดอร์ '{OUTPUT_DIRECTORY}'")
             os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
 
-            output_path = os.path.join(OUTPUT_DIRECTORY, OUTPUT_FILENAME)
+            output_path = output_path_for(OUTPUT_DIRECTORY, OUTPUT_FILENAME, OUTPUT_FORMAT)
 
-            combined_dataframe.to_csv(output_path, index=False, encoding='utf-8-sig')
+            # บันทึกเป็น CSV หรือ Parquet ตาม OUTPUT_FORMAT
+            write_output(combined_dataframe, output_path, OUTPUT_FORMAT)
 
             print("\n----------------------------------------------------")
             print("การประมวลผลเสร็จสมบูรณ์!")
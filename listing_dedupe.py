@@ -0,0 +1,283 @@
+import math
+import re
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from car_canon import canonical_columns
+
+CLUSTER_COLUMN = "Cluster ID"
+
+# แหล่งที่เป็นราคากลาง ไม่ใช่ประกาศขายรถจริง จึงไม่นำมาจับคู่
+NON_LISTING_SOURCES = {"blue_search"}
+# แหล่งที่ Plate No. ไม่ใช่ทะเบียนจริง (talad_rod = จังหวัด + ตัวนับยอดเข้าชม ipgvw) จึงไม่ใช้ทะเบียนของแหล่งนี้
+SYNTHETIC_PLATE_SOURCES = {"talad_rod"}
+
+# ความกว้างของช่วงเลขไมล์ที่ใช้เป็น blocking key (กม.)
+MILEAGE_BUCKET_KM = 5000
+# ถ้าไม่มีทะเบียนให้เทียบ ต้องรู้ไมล์และราคาทั้งสองประกาศ และแทบเท่ากัน
+# (รุ่นยอดนิยมมีรถปี/ไมล์ใกล้กันเยอะมาก เต็นท์เดียวกันก็มักมีรถรุ่นเดียวกันหลายคัน)
+MATCH_MILEAGE_KM = 200
+MATCH_PRICE_RATIO = 0.03
+# block ที่ใหญ่เกินนี้ (เช่น Vios/City/Hilux ปีเดียวกัน หรือเต็นท์ใหญ่) ไม่เทียบทุกคู่เพื่อไม่ให้เป็น O(n²)
+# แต่เรียงตามเลขไมล์แล้วเทียบเฉพาะแถวที่ไมล์ห่างกันไม่เกิน MATCH_MILEAGE_KM (สูงสุด MAX_BLOCK_SIZE แถวถัดไป)
+MAX_BLOCK_SIZE = 50
+
+_MISSING_TEXT = {"", "n/a", "nan", "none", "null", "-"}
+
+
+def normalize_text(values):
+    """ตัวพิมพ์เล็ก ตัดช่องว่าง/เครื่องหมาย ค่าว่างหรือ 'N/A' กลายเป็น ''"""
+    text = values.astype(object).where(values.notna(), "").astype(str).str.strip().str.lower()
+    text = text.where(~text.isin(_MISSING_TEXT), "")
+    return text.str.replace(r"[\s\-_.,()/]+", "", regex=True)
+
+
+_PHONE_SEPARATORS = re.compile(r"[,/;|\n]+")
+
+
+def _phone_digits(text):
+    """ตัวเลขของเบอร์เดียว แปลง +66 เป็น 0 คืน '' ถ้าไม่ใช่เบอร์ไทย 9-10 หลัก"""
+    digits = re.sub(r"\D", "", text)
+    if digits.startswith("66") and len(digits) == 11:
+        digits = "0" + digits[2:]
+    return digits if 9 <= len(digits) <= 10 else ""
+
+
+@lru_cache(maxsize=None)
+def phone_numbers(text):
+    """
+    เบอร์ทั้งหมดในข้อความเดียว เช่น '081-234-5678, 089-876-5432' (taladrod รวมหลายเบอร์ด้วย ', ')
+    แยกด้วย , / ; ก่อน ถ้าชิ้นไหนยาวเกินหนึ่งเบอร์ (คั่นด้วยช่องว่าง) จึงแยกด้วยช่องว่างอีกชั้น
+    """
+    numbers = set()
+    for part in _PHONE_SEPARATORS.split(text):
+        number = _phone_digits(part)
+        if number:
+            numbers.add(number)
+        elif len(re.sub(r"\D", "", part)) > 11:
+            numbers.update(filter(None, map(_phone_digits, part.split())))
+    return frozenset(numbers)
+
+
+def normalize_phone(values):
+    """ชุดเบอร์โทร (frozenset) ของแต่ละแถว ค่าว่าง/เบอร์ที่สั้นเกินไปได้ชุดว่าง"""
+    return values.astype(object).where(values.notna(), "").astype(str).map(phone_numbers)
+
+
+def normalize_number(values):
+    """ตัวเลขจากข้อความเช่น '1,250,000' หรือ '85061 km' ค่าที่อ่านไม่ได้เป็น NaN"""
+    text = values.astype(object).where(values.notna(), "").astype(str).str.replace(r"[^\d.]", "", regex=True)
+    return pd.to_numeric(text, errors="coerce").to_numpy(dtype=float)
+
+
+class DisjointSet:
+    """Union-find over row positions, with path halving and union by size"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+def _blocking_keys(brand, model, year, mileage, phone, plate, eligible):
+    """(key, row) ทั้งหมดของทุก blocking key แถวหนึ่งอาจอยู่หลาย block"""
+    rows = np.flatnonzero(eligible)
+    bmy = brand + "|" + model + "|" + pd.Series(year).map(lambda y: "" if np.isnan(y) else str(int(y))).to_numpy(object)
+    has_bmy = (brand != "") & (model != "") & ~np.isnan(year)
+    has_mileage = ~np.isnan(mileage)
+    keys = []
+
+    # 1. ทะเบียนรถ: เจอทะเบียนเดียวกันก็แทบจะเป็นคันเดียวกันแน่นอน
+    for row in rows[plate[rows] != ""]:
+        keys.append(("plate|" + plate[row], row))
+
+    # 2. เบอร์โทรผู้ขาย + ยี่ห้อ/รุ่น/ปี (เบอร์อย่างเดียวจะรวมรถทั้งเต็นท์เข้า block เดียว)
+    #    แถวที่มีหลายเบอร์อยู่ใน block ของทุกเบอร์
+    for row in rows[has_bmy[rows]]:
+        for number in phone[row]:
+            keys.append(("phone|" + number + "|" + bmy[row], row))
+
+    # 3. ยี่ห้อ/รุ่น/ปี + ช่วงเลขไมล์ (ใช้ 2 ช่วงเหลื่อมกันครึ่งช่วง รถที่ไมล์อยู่ใกล้รอยต่อจะได้ไม่หลุด)
+    for row in rows[has_bmy[rows] & has_mileage[rows]]:
+        low = int(mileage[row] // MILEAGE_BUCKET_KM)
+        shifted = int((mileage[row] + MILEAGE_BUCKET_KM / 2) // MILEAGE_BUCKET_KM)
+        keys.append((f"km|{bmy[row]}|{low}", row))
+        keys.append((f"km+|{bmy[row]}|{shifted}", row))
+    return keys
+
+
+def _candidate_pairs(members, mileage):
+    """
+    คู่ (i, j) ที่ต้องเทียบใน block หนึ่ง และแถวที่ไม่ได้ถูกเทียบ
+
+    block เล็กเทียบทุกคู่ ส่วน block ที่ใหญ่เกิน MAX_BLOCK_SIZE ใช้ sorted neighbourhood ตามเลขไมล์:
+    คู่ที่ไม่มีทะเบียนต้องไมล์ห่างไม่เกิน MATCH_MILEAGE_KM อยู่แล้ว จึงไม่เสียคู่ที่ควรเจอ
+    (ยกเว้นแถวที่ไม่มีเลขไมล์ ซึ่งถูกคืนไปเป็นแถวที่ไม่ได้ถูกเทียบ)
+    """
+    if len(members) <= MAX_BLOCK_SIZE:
+        return combinations(members, 2), []
+    known = sorted((row for row in members if not math.isnan(mileage[row])), key=lambda row: mileage[row])
+    unknown = [row for row in members if math.isnan(mileage[row])]
+    pairs = []
+    for position, i in enumerate(known):
+        for j in known[position + 1:position + 1 + MAX_BLOCK_SIZE]:
+            if mileage[j] - mileage[i] > MATCH_MILEAGE_KM:
+                break
+            pairs.append((min(i, j), max(i, j)))
+    return pairs, unknown
+
+
+def _close(a, b, tolerance_ratio, tolerance_abs=0.0):
+    return abs(a - b) <= max(tolerance_abs, tolerance_ratio * max(a, b))
+
+
+def assign_clusters(df):
+    """
+    หาประกาศที่เป็นรถคันเดียวกันข้ามแหล่งข้อมูล และคืน Cluster ID ของแต่ละแถว
+
+    เปรียบเทียบเฉพาะแถวที่อยู่ใน block เดียวกัน (ทะเบียน, เบอร์โทร+รุ่น+ปี, รุ่น+ปี+ช่วงไมล์)
+    จำนวนคู่ที่ต้องเทียบจึงโตเกือบเป็นเส้นตรงตามจำนวนแถว คู่ที่ผ่านเงื่อนไขถูกรวมด้วย union-find
+    โดยรวมคู่ที่ใกล้กันที่สุดก่อน และไม่ให้กลุ่มใดมีสองประกาศจากแหล่งเดียวกัน
+    Cluster ID คือตำแหน่งแถวแรกของกลุ่ม แถวที่ไม่ซ้ำกับใครจะมี ID เป็นตำแหน่งของตัวเอง
+
+    Args:
+        df (pandas.DataFrame): ตาราง 11 คอลัมน์ตาม template
+
+    Returns:
+        pandas.Series: Cluster ID (int) ของแต่ละแถว ใช้ index เดียวกับ df
+    """
+    n = len(df)
+    # ใช้ชื่อยี่ห้อ/รุ่นมาตรฐานก่อน 'HONDA CR-V' กับ 'Honda CRV' จะได้อยู่ block เดียวกัน
+    brands, models = canonical_columns(df["Brand"], df["Model"])
+    brand = normalize_text(brands).to_numpy(object)
+    model = normalize_text(models).to_numpy(object)
+    sub_model = normalize_text(df["Sub Model"]).to_numpy(object)
+    plate = normalize_text(df["Plate No."]).where(~df["Sources"].isin(SYNTHETIC_PLATE_SOURCES), "").to_numpy(object)
+    phone = normalize_phone(df["Phone Number"]).to_numpy(object)
+    year = normalize_number(df["Year"])
+    price = normalize_number(df["Price"])
+    mileage = normalize_number(df["Mileage"])
+    source = df["Sources"].astype(str).to_numpy(object)
+    url = df["URL"].astype(object).where(df["URL"].notna(), "").astype(str).str.strip().to_numpy(object)
+    eligible = ~df["Sources"].isin(NON_LISTING_SOURCES).to_numpy()
+
+    blocks = {}
+    for key, row in _blocking_keys(brand, model, year, mileage, phone, plate, eligible):
+        blocks.setdefault(key, []).append(row)
+
+    # เทียบคู่ด้วย list ธรรมดา (เร็วกว่าอ่านค่าทีละตัวจาก numpy array มาก)
+    brand, model, sub_model, plate, phone, source, url = (
+        a.tolist() for a in (brand, model, sub_model, plate, phone, source, url))
+    year, price, mileage = year.tolist(), price.tolist(), mileage.tolist()
+
+    def same_car(i, j):
+        if brand[i] != brand[j] or model[i] != model[j]:
+            return False
+        if not (math.isnan(year[i]) or math.isnan(year[j])) and year[i] != year[j]:
+            return False
+        if sub_model[i] and sub_model[j] and sub_model[i] != sub_model[j]:
+            # รุ่นย่อยต่างกัน (เช่น '2.0 S' กับ '2.2 XD') เป็นรถคนละคันแน่นอน
+            return False
+        if plate[i] and plate[j]:
+            # ทะเบียนเป็นหลักฐานที่ชัดที่สุด ทั้งตรงกันและขัดกัน
+            return plate[i] == plate[j]
+        # ไม่มีทะเบียน: ต้องรู้เลขไมล์และราคาทั้งสองฝั่ง และแทบเท่ากัน (เบอร์โทรอย่างเดียวไม่พอ)
+        if math.isnan(mileage[i]) or math.isnan(mileage[j]) or math.isnan(price[i]) or math.isnan(price[j]):
+            return False
+        if abs(mileage[i] - mileage[j]) > MATCH_MILEAGE_KM or not _close(price[i], price[j], MATCH_PRICE_RATIO):
+            return False
+        if source[i] == source[j]:
+            # เว็บเดียวกัน URL ต่างกันคือคนละประกาศ เต็นท์ที่ใช้เบอร์เดียวกันลงรถรุ่นเดียวกันหลายคันได้
+            return bool(url[i]) and url[i] == url[j]
+        # ต่างแหล่งกัน: เบอร์ที่ตรงกันสักเบอร์ยืนยันได้ แต่ถ้ามีเบอร์ทั้งคู่และไม่มีเบอร์ร่วมเลยคือผู้ขายคนละคน
+        return not (phone[i] and phone[j]) or not phone[i].isdisjoint(phone[j])
+
+    clusters = DisjointSet(n)
+    # root -> {source: url} ของประกาศในกลุ่ม กลุ่มหนึ่งมีได้ไม่เกินหนึ่งประกาศต่อแหล่ง
+    # (กัน union-find ต่อเป็นลูกโซ่ใน block ที่แน่น เช่นรถรุ่นยอดนิยมที่ไมล์/ราคาใกล้กันหลายร้อยคัน)
+    listings = {}
+
+    def listings_of(root):
+        return listings.get(root) or {source[root]: url[root]}
+
+    def compatible(a, b):
+        a, b = listings_of(a), listings_of(b)
+        if len(a) > len(b):
+            a, b = b, a
+        return all(b.get(src, listing_url) == listing_url for src, listing_url in a.items())
+
+    def join(i, j):
+        a, b = clusters.find(i), clusters.find(j)
+        merged = {**listings_of(a), **listings_of(b)}
+        listings.pop(a, None)
+        listings.pop(b, None)
+        clusters.union(a, b)
+        listings[clusters.find(a)] = merged
+
+    def distance(i, j):
+        """ยิ่งน้อยยิ่งน่าจะเป็นคันเดียวกัน: ทะเบียนตรงมาก่อน แล้วตามระยะห่างของไมล์และราคา"""
+        if plate[i] and plate[i] == plate[j]:
+            return -1.0
+        return (abs(mileage[i] - mileage[j]) / MATCH_MILEAGE_KM
+                + abs(price[i] - price[j]) / (MATCH_PRICE_RATIO * max(price[i], price[j], 1.0)))
+
+    compared = set()
+    matches = []
+    unblocked = set()
+    oversized = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        oversized += len(members) > MAX_BLOCK_SIZE
+        pairs, skipped = _candidate_pairs(members, mileage)
+        unblocked.update(skipped)
+        for i, j in pairs:
+            if (i, j) in compared:
+                continue
+            compared.add((i, j))
+            if same_car(i, j):
+                matches.append((distance(i, j), i, j))
+    if oversized:
+        print(f"[dedupe] {oversized} block ใหญ่เกิน {MAX_BLOCK_SIZE} แถว เทียบเฉพาะแถวที่ไมล์ใกล้กัน "
+              f"({len(unblocked)} แถวในนั้นไม่มีเลขไมล์จึงไม่ได้ถูกเทียบ)")
+
+    # รวมคู่ที่ใกล้กันที่สุดก่อน คู่ที่จะทำให้กลุ่มมีสองประกาศจากแหล่งเดียวกันถูกข้าม
+    for _, i, j in sorted(matches):
+        a, b = clusters.find(i), clusters.find(j)
+        if a != b and compatible(a, b):
+            join(a, b)
+
+    roots = np.fromiter((clusters.find(i) for i in range(n)), dtype=np.int64, count=n)
+    # ใช้ตำแหน่งแถวแรกของแต่ละกลุ่มเป็น ID ผลจึงเหมือนเดิมทุกครั้งที่รันกับข้อมูลชุดเดิม
+    first_row = pd.Series(np.arange(n)).groupby(roots).transform("min").to_numpy()
+    return pd.Series(first_row, index=df.index, name=CLUSTER_COLUMN)
+
+
+def add_cluster_ids(df):
+    """คืนสำเนาของ df ที่เพิ่มคอลัมน์ Cluster ID และพิมพ์สรุปจำนวนประกาศที่ซ้ำ"""
+    df = df.copy()
+    df[CLUSTER_COLUMN] = assign_clusters(df)
+    sizes = df[CLUSTER_COLUMN].value_counts()
+    duplicated = sizes[sizes > 1]
+    print(f"[dedupe] {len(df)} ประกาศ = รถ {len(sizes)} คัน "
+          f"({len(duplicated)} คันลงประกาศซ้ำ รวม {int(duplicated.sum())} ประกาศ)")
+    return df
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+STORE_PATH = 'listings.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_listings (
+    source       TEXT NOT NULL,
+    listing_id   TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    first_seen   TEXT NOT NULL,
+    last_seen    TEXT NOT NULL,
+    updated_at   TEXT NOT NULL,
+    PRIMARY KEY (source, listing_id)
+);
+CREATE INDEX IF NOT EXISTS raw_listings_updated ON raw_listings (source, updated_at);
+"""
+
+# payload เปลี่ยนเมื่อไหร่ updated_at ถึงจะเปลี่ยน ส่วน last_seen อัปเดตทุกครั้งที่เห็น
+_UPSERT = """
+INSERT INTO raw_listings (source, listing_id, payload, content_hash, first_seen, last_seen, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, listing_id) DO UPDATE SET
+    last_seen = excluded.last_seen,
+    updated_at = CASE WHEN raw_listings.content_hash = excluded.content_hash
+                      THEN raw_listings.updated_at ELSE excluded.updated_at END,
+    payload = excluded.payload,
+    content_hash = excluded.content_hash
+"""
+
+
+_SELECT_PAYLOAD = "SELECT payload FROM raw_listings WHERE source = ? AND listing_id = ?"
+
+
+def content_hash(payload_json):
+    return hashlib.sha1(payload_json.encode('utf-8')).hexdigest()
+
+
+def key_from(*fields):
+    """Key function: the first non-empty field of a listing, else None (upsert_many then keys it by content hash)"""
+    def key(item):
+        for field in fields:
+            value = item.get(field)
+            if value not in (None, ''):
+                return value
+        return None
+    return key
+
+
+class ListingStore:
+    """Raw listings from every scraper in one SQLite file, keyed by (source, listing id).
+
+    The database runs in WAL mode, so one scraper can write while another (or
+    a formatter) reads. ``upsert_many`` writes a batch in one transaction;
+    rows whose payload hash is unchanged only get their ``last_seen`` bumped,
+    so ``iter_payloads(changed_since=...)`` returns just what really changed.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upsert_many(self, source, items, key, merge=False):
+        """Insert or update a batch of listings; returns the number written
+
+        ``key`` maps a listing to its id (e.g. ``key_from('id')``); listings
+        without one are keyed by their content hash. With ``merge=True`` each
+        listing is laid over the payload already stored under its id, so
+        fields another scraper added (e.g. phone/mileage from detail pages)
+        survive a later run that only has the search-result fields.
+        """
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._conn:
+            rows = []
+            for item in items:
+                listing_id = key(item)
+                if merge and listing_id is not None:
+                    stored = self._conn.execute(_SELECT_PAYLOAD, (source, str(listing_id))).fetchone()
+                    if stored:
+                        item = {**json.loads(stored[0]), **item}
+                payload = json.dumps(item, ensure_ascii=False, sort_keys=True)
+                digest = content_hash(payload)
+                rows.append((source, str(listing_id) if listing_id is not None else digest,
+                             payload, digest, now, now, now))
+            if rows:
+                self._conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def iter_payloads(self, source, changed_since=None):
+        """Yield the decoded payloads of one source, optionally only those updated since a timestamp"""
+        query = "SELECT payload FROM raw_listings WHERE source = ?"
+        params = [source]
+        if changed_since:
+            query += " AND updated_at >= ?"
+            params.append(changed_since)
+        query += " ORDER BY rowid"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for (payload,) in rows:
+            yield json.loads(payload)
+
+    def count(self, source=None):
+        with self._lock:
+            if source is None:
+                return self._conn.execute("SELECT COUNT(*) FROM raw_listings").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM raw_listings WHERE source = ?",
+                                      (source,)).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def upsert_listings(source, items, key, path=STORE_PATH, merge=False):
+    """Open the store, upsert one batch and close it again (for one-off scripts)"""
+    with ListingStore(path) as store:
+        return store.upsert_many(source, items, key, merge=merge)
@@ -1,76 +1,147 @@
-from bs4 import BeautifulSoup
 import json
 import os
-import time
-from selenium import webdriver  # Assuming you'll import webdriver for actual use
+import re
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from driver_factory import create_driver, collect_bandwidth, get_throttled, quit_driver, DATA_ONLY_BLOCK_TYPES
+from http_client import make_session
+from listing_store import ListingStore
+from page_extract import extract_ld_json
+from page_fingerprints import PageFingerprintIndex
+from rate_limiter import get_limiter, retry_after_seconds
+
+BASE_URL = 'https://www.one2car.com/%E0%B8%A3%E0%B8%96-%E0%B8%AA%E0%B8%B3%E0%B8%AB%E0%B8%A3%E0%B8%B1%E0%B8%9A-%E0%B8%82%E0%B8%B2%E0%B8%A2'
+
+# True = ดึงหน้าผ่าน HTTP ตรงๆ ไม่ต้องเปิด Chrome
+USE_HTTP = True
+# จำนวนคันต่อหน้า ใช้ 50 เท่ากับที่เว็บใช้เอง (ยังไม่ได้ยืนยันว่าเว็บรับค่าที่ใหญ่กว่านี้ ถ้าเปลี่ยนต้องลบ
+# one2car_fingerprints.json และไฟล์ในโฟลเดอร์ one2car ก่อน เพราะเลขหน้าจะไม่ตรงกับของเดิม)
+PAGE_SIZE = 50
+# hash + listing id ของแต่ละหน้า (อยู่นอกโฟลเดอร์ one2car เพราะ formatter อ่านทุกไฟล์ .json ในนั้น)
+FINGERPRINT_FILE = 'one2car_fingerprints.json'
+# หยุดเมื่อเจอหน้าที่ไม่เปลี่ยนติดกันกี่หน้า (0 = ดึงจนถึง end_page เสมอ)
+STOP_AFTER_UNCHANGED = 0
+
+HTTP_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'th,en-US;q=0.7,en;q=0.3',
+}
+
+
+def build_page_url(page_number, page_size=PAGE_SIZE):
+    return f'{BASE_URL}?page_size={page_size}&page_number={page_number}'
+
+
+def parse_one2car_cars(json_ld_blocks):
+    """Turn the parsed ld+json blocks of a results page into per-car dicts"""
+    extracted_data = []
+    for data in json_ld_blocks:
+        # ตรวจสอบว่ามี itemListElement หรือไม่
+        if isinstance(data, list) and len(data) > 1 and 'itemListElement' in data[1]:
+            cars = data[1]['itemListElement']
+
+            for car in cars:
+                item = car['item']
+                extracted_data.append({
+                    'name': item.get('name'),
+                    'model': item.get('model'),
+                    'year': item.get('vehicleModelDate'),
+                    'price': item.get('offers', {}).get('price'),
+                    'currency': item.get('offers', {}).get('priceCurrency'),
+                    'mileage_km': item.get('mileageFromOdometer', {}).get('value') if item.get(
+                        'mileageFromOdometer') else None,
+                    'color': item.get('color'),
+                    'body_type': item.get('bodyType'),
+                    'fuel_type': item.get('fuelType'),
+                    'seating_capacity': item.get('seatingCapacity'),
+                    'brand': item.get('brand', {}).get('name'),
+                    'location': item.get('offers', {}).get('seller', {}).get('homeLocation', {}).get('address',
+                                                                                                     {}).get(
+                        'addressLocality'),
+                    'region': item.get('offers', {}).get('seller', {}).get('homeLocation', {}).get('address',
+                                                                                                   {}).get(
+                        'addressRegion'),
+                    'dealer_url': item.get('offers', {}).get('seller', {}).get('homeLocation', {}).get(
+                        'address', {}).get('url'),
+                    'page_url': item.get('mainEntityOfPage'),
+                    'image_url': item.get('image', [None])[0] if item.get('image') else None,
+                    'description': item.get('description')
+                })
+    return extracted_data
+
+
+def listing_id_of(car):
+    """Stable id of a listing: the number at the end of its page_url"""
+    url = car.get('page_url') or ''
+    match = re.search(r'(\d+)/?(?:[?#].*)?$', url)
+    return match.group(1) if match else url or car.get('name')
+
+
+def extract_cars_from_html(html, page_number):
+    """Pull the car list out of a results page (str or bytes) without a DOM"""
+    blocks, errors = extract_ld_json(html)
+    for e in errors:
+        print(f"❌ JSON Decode Error on page {page_number}:", e)
+    return parse_one2car_cars(blocks)
+
 
 def scrape_one2car_page(driver, page_number):
     """Scrape single page and return extracted data"""
-    url = f'https://www.one2car.com/%E0%B8%A3%E0%B8%96-%E0%B8%AA%E0%B8%B3%E0%B8%AB%E0%B8%A3%E0%B8%B1%E0%B8%9A-%E0%B8%82%E0%B8%B2%E0%B8%A2?page_size=50&page_number={page_number}'
+    url = build_page_url(page_number)
 
     try:
-        driver.get(url)
+        get_throttled(driver, url)
         # รอให้หน้าโหลดเสร็จ
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.TAG_NAME, "script"))
         )
 
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        json_ld_scripts = soup.find_all('script', type='application/ld+json')
-
-        extracted_data = []
-        for script in json_ld_scripts:
-            try:
-                data = json.loads(script.string)
-                # ตรวจสอบว่ามี itemListElement หรือไม่
-                if isinstance(data, list) and len(data) > 1 and 'itemListElement' in data[1]:
-                    cars = data[1]['itemListElement']
-
-                    for car in cars:
-                        item = car['item']
-                        extracted_data.append({
-                            'name': item.get('name'),
-                            'model': item.get('model'),
-                            'year': item.get('vehicleModelDate'),
-                            'price': item.get('offers', {}).get('price'),
-                            'currency': item.get('offers', {}).get('priceCurrency'),
-                            'mileage_km': item.get('mileageFromOdometer', {}).get('value') if item.get(
-                                'mileageFromOdometer') else None,
-                            'color': item.get('color'),
-                            'body_type': item.get('bodyType'),
-                            'fuel_type': item.get('fuelType'),
-                            'seating_capacity': item.get('seatingCapacity'),
-                            'brand': item.get('brand', {}).get('name'),
-                            'location': item.get('offers', {}).get('seller', {}).get('homeLocation', {}).get('address',
-                                                                                                             {}).get(
-                                'addressLocality'),
-                            'region': item.get('offers', {}).get('seller', {}).get('homeLocation', {}).get('address',
-                                                                                                           {}).get(
-                                'addressRegion'),
-                            'dealer_url': item.get('offers', {}).get('seller', {}).get('homeLocation', {}).get(
-                                'address', {}).get('url'),
-                            'page_url': item.get('mainEntityOfPage'),
-                            'image_url': item.get('image', [None])[0] if item.get('image') else None,
-                            'description': item.get('description')
-                        })
-
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON Decode Error on page {page_number}:", e)
-                continue
-
-        return extracted_data
+        return extract_cars_from_html(driver.page_source, page_number)
 
     except Exception as e:
         print(f"❌ Error scraping page {page_number}:", e)
         return []
 
 
-def scrape_all_pages(driver, start_page=1, end_page=None):  # Changed end_page default to None
-    """Scrape all pages and save to JSON files"""
+def scrape_one2car_page_http(session, page_number, page_size=PAGE_SIZE, conditional_headers=None):
+    """Scrape single page over plain HTTP (no browser)
+
+    Returns ``(cars, validators)``. With ``conditional_headers``
+    (If-None-Match / If-Modified-Since from the fingerprint index) the server
+    can answer 304 for an unchanged page; ``cars`` is then None and nothing
+    was downloaded. ``validators`` holds the response's ETag / Last-Modified.
+    """
+    url = build_page_url(page_number, page_size)
+
+    try:
+        with get_limiter().throttle(url) as slot:
+            response = session.get(url, timeout=30, headers=conditional_headers)
+            slot['status'] = response.status_code
+            slot['retry_after'] = retry_after_seconds(response.headers)
+        validators = PageFingerprintIndex.validators_from(response.headers)
+        if response.status_code == 304 and conditional_headers:
+            return None, validators
+        if response.status_code != 200:
+            print(f"❌ HTTP {response.status_code} on page {page_number}")
+            return [], {}
+        return extract_cars_from_html(response.content, page_number), validators
+
+    except Exception as e:
+        print(f"❌ Error scraping page {page_number}:", e)
+        return [], {}
+
+
+def scrape_all_pages(driver=None, start_page=1, end_page=None, session=None):  # Changed end_page default to None
+    """Scrape all pages and save to JSON files
+
+    Pass a requests Session as ``session`` to fetch pages over HTTP instead
+    of through the Selenium ``driver``. Over HTTP each page is requested
+    conditionally with its stored ETag / Last-Modified, and a 304 reuses the
+    saved file; otherwise the file is only rewritten when the content
+    fingerprint changed.
+    """
 
     # สร้างโฟลเดอร์ one2car ถ้ายังไม่มี
     os.makedirs('one2car', exist_ok=True)
@@ -89,49 +160,97 @@ def scrape_all_pages(driver, start_page=1, end_page=None):  # Changed end_page d
             except ValueError:
                 print("Invalid input. Please enter a valid integer for the end page.")
 
+    index = PageFingerprintIndex(FINGERPRINT_FILE)
+    store = ListingStore()
+    counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+    shifted_total = 0
+    unchanged_streak = 0
+
     for page_num in range(start_page, end_page + 1):
         print(f"🔄 Scraping page {page_num}/{end_page}")
-
-        # ตรวจสอบว่าไฟล์นี้มีอยู่แล้วหรือไม่
         file_path = f'one2car/{page_num}.json'
-        if os.path.exists(file_path):
-            print(f"⏭️  Page {page_num} already exists, skipping...")
-            continue
 
         # Scrape หน้านี้
-        data = scrape_one2car_page(driver, page_num)
-
-        if data:
-            # บันทึกเป็นไฟล์ JSON
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"✅ Saved {len(data)} cars from page {page_num}")
+        validators = {}
+        if session is not None:
+            # ส่ง validator ของรอบก่อนไปด้วยเฉพาะหน้าที่ยังมีไฟล์อยู่ (304 จะใช้ไฟล์นั้นแทน)
+            conditional = index.conditional_headers(page_num) if os.path.exists(file_path) else None
+            data, validators = scrape_one2car_page_http(session, page_num, conditional_headers=conditional)
+            if data is None:
+                print(f"📭 Page {page_num} not modified (304), reusing {file_path}")
+                # 304 มักไม่ส่ง validator ครบ จึงเก็บของเดิมไว้
+                validators = {}
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
         else:
+            data = scrape_one2car_page(driver, page_num)
+            collect_bandwidth(driver)
+
+        if not data:
             print(f"⚠️  No data found on page {page_num}")
+            continue
 
-        # หน่วงเวลาเพื่อไม่ให้ server โดน rate limit
-        time.sleep(2)
+        ids = [listing_id_of(car) for car in data]
+        # upsert ทุกหน้า (ถูกมากเมื่อ hash เท่าเดิม) เพื่อให้ last_seen ของรถที่ยังอยู่เป็นปัจจุบัน
+        store.upsert_many("one2car", data, listing_id_of)
+        status, shifted = index.check(page_num, data, ids)
+        counts[status] += 1
+        if shifted:
+            shifted_total += len(shifted)
+            print(f"↕️  {len(shifted)} listings on page {page_num} moved here from another page")
+
+        if status == 'unchanged' and os.path.exists(file_path):
+            print(f"⏭️  Page {page_num} unchanged, not rewriting")
+            if validators and index.set_validators(page_num, validators):
+                index.save()
+            unchanged_streak += 1
+            if STOP_AFTER_UNCHANGED and unchanged_streak >= STOP_AFTER_UNCHANGED:
+                print(f"🛑 {unchanged_streak} unchanged pages in a row, stopping early")
+                break
+            continue
+        unchanged_streak = 0
+
+        # บันทึกเป็นไฟล์ JSON
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        index.update(page_num, data, ids, validators)
+        index.save()
+        print(f"✅ Saved {len(data)} cars from page {page_num} ({status})")
+
+    store.close()
+    print(f"📊 Pages new: {counts['new']}, changed: {counts['changed']}, unchanged: {counts['unchanged']}, "
+          f"shifted listings: {shifted_total}")
+    # การหน่วงเวลาถูกจัดการโดย adaptive rate limiter แทน time.sleep แบบตายตัว
+    get_limiter().report()
 
 
 # เรียกใช้งาน
 if __name__ == "__main__":
-    # จำเป็นต้องสร้าง driver ก่อนเรียกใช้ฟังก์ชัน scrape_all_pages
-    # ตัวอย่างการสร้าง Chrome driver (ต้องติดตั้ง ChromeDriver และระบุ path หรืออยู่ใน PATH)
-    try:
-        # For headless Browse (no browser window)
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')
-        driver = webdriver.Chrome(options=options)
-        # Or for visible browser:
-        # driver = webdriver.Chrome()
+    if USE_HTTP:
+        # โหมด HTTP ไม่ต้องใช้ ChromeDriver
+        session = make_session(headers=HTTP_HEADERS)
+        try:
+            scrape_all_pages(start_page=1, session=session)  # end_page is prompted from user
+            print("🎉 Scraping completed!")
+        finally:
+            session.close()
+    else:
+        # จำเป็นต้องสร้าง driver ก่อนเรียกใช้ฟังก์ชัน scrape_all_pages
+        # ตัวอย่างการสร้าง Chrome driver (ต้องติดตั้ง ChromeDriver และระบุ path หรืออยู่ใน PATH)
+        try:
+            # For headless Browse (no browser window)
+            # only the ld+json scripts are read, so images/fonts/CSS/trackers are blocked
+            driver = create_driver(headless=True, block_types=DATA_ONLY_BLOCK_TYPES)
+            # Or for visible browser:
+            # driver = create_driver(headless=False, block_types=DATA_ONLY_BLOCK_TYPES)
 
-        scrape_all_pages(driver, start_page=1)  # Now end_page is prompted from user
-        print("🎉 Scraping completed!")
+            scrape_all_pages(driver, start_page=1)  # Now end_page is prompted from user
+            print("🎉 Scraping completed!")
 
-    except Exception as e:
-        print(f"An error occurred during WebDriver setup or execution: {e}")
-        print(
-            "Please ensure you have ChromeDriver installed and it's accessible in your system's PATH, or specify its path.")
-    finally:
-        if 'driver' in locals() and driver:
-            driver.quit()  # Close the browser when done
\ No newline at end of file
+        except Exception as e:
+            print(f"An error occurred during WebDriver setup or execution: {e}")
+            print(
+                "Please ensure you have ChromeDriver installed and it's accessible in your system's PATH, or specify its path.")
+        finally:
+            if 'driver' in locals() and driver:
+                quit_driver(driver)  # Close the browser when done
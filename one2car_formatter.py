@@ -1,112 +1,120 @@
-import json
+import multiprocessing
 import os
 import pandas as pd
 
-
-def build_one2car_database_from_json(directory_path):
+from car_canon import canonical_brand, canonical_model, sub_model_from_name
+from car_template import CarRecord, ColumnarBuilder
+from formatter_output import output_path_for, write_output
+from formatter_parallel import build_from_directory
+from listing_store import ListingStore, STORE_PATH
+
+
+def one2car_car_info(car, source_name="one2car"):
+    """แปลงข้อมูลรถ 1 คันจากไฟล์ one2car ให้อยู่ในรูปแบบ template"""
+    # --- การดึงข้อมูลและคำนวณฟิลด์ที่ซับซ้อน ---
+
+    # 1. คำนวณ Sub Model
+    full_name = car.get('name', '')
+    brand_name = car.get('brand', '')
+    model_name = car.get('model', '')
+    year_str = str(car.get('year', ''))
+    # ลบยี่ห้อ/รุ่น/ปีออกจากชื่อเต็มเพื่อให้ได้รุ่นย่อย
+    sub_model = sub_model_from_name(full_name, brand_name, model_name, year_str)
+
+    # 2. ดึงชื่อผู้ขายจาก URL
+    dealer_url = car.get('dealer_url', '')
+    seller_name = dealer_url.split('/')[-1] if dealer_url else 'N/A'
+
+    return CarRecord(
+        sources=source_name,
+        brand=canonical_brand(brand_name),
+        model=canonical_model(brand_name, model_name),
+        sub_model=sub_model,
+        year=car.get('year'),
+        price=car.get('price'),
+        mileage=car.get('mileage_km'),
+        plate_no="N/A",
+        seller_name=seller_name,
+        phone_number='N/A',
+        url=car.get('page_url')
+    )
+
+
+def one2car_cars(car_list):
+    """ไฟล์ one2car 1 หน้าเป็น list ของรถอยู่แล้ว"""
+    return car_list
+
+
+def build_one2car_database_from_json(directory_path, workers=1):
     """
     สแกนไฟล์ JSON ของข้อมูลจาก one2car ทั้งหมดในไดเรกทอรีที่ระบุ,
     ดึงข้อมูลรถยนต์, และแปลงเป็น Pandas DataFrame ตาม template
 
     Args:
         directory_path (str): เส้นทางไปยังโฟลเดอร์ที่มีไฟล์ JSON
+        workers (int): จำนวน process ที่ใช้อ่านไฟล์พร้อมกัน (1 = อ่านทีละไฟล์ใน process นี้)
 
     Returns:
         pandas.DataFrame: ตารางข้อมูลรถยนต์ทั้งหมดที่รวบรวมได้
                           หรือ DataFrame ว่างถ้าไม่พบข้อมูล
     """
-    all_cars_data = []
-    source_name = "one2car"
+    return build_from_directory(directory_path, one2car_cars, one2car_car_info, "one2car",
+                                workers)
 
-    if not os.path.isdir(directory_path):
-        print(f"ผิดพลาด: ไม่พบโฟลเดอร์ '{directory_path}' กรุณาตรวจสอบตำแหน่ง")
-        return pd.DataFrame()
 
-    print(f"เริ่มต้นสแกนไฟล์ในโฟลเดอร์ '{directory_path}'...")
+def build_one2car_database_from_store(store_path=STORE_PATH, changed_since=None):
+    """
+    อ่านข้อมูลดิบของ one2car จาก listing store (SQLite) แทนการอ่านไฟล์ JSON ในโฟลเดอร์
+    และแปลงเป็น Pandas DataFrame ตาม template เดียวกัน
 
-    files_in_directory = os.listdir(directory_path)
-    json_files = [f for f in files_in_directory if f.endswith('.json')]
+    Args:
+        store_path (str): เส้นทางไปยังไฟล์ฐานข้อมูล listing store
+        changed_since (str): ถ้าระบุ จะอ่านเฉพาะรายการที่เปลี่ยนตั้งแต่เวลานี้ ("YYYY-mm-dd HH:MM:SS")
 
-    if not json_files:
-        print("ไม่พบไฟล์ .json ในโฟลเดอร์")
+    Returns:
+        pandas.DataFrame: ตารางข้อมูลรถยนต์ หรือ DataFrame ว่างถ้าไม่พบข้อมูล
+    """
+    if not os.path.exists(store_path):
+        print(f"ผิดพลาด: ไม่พบ listing store '{store_path}'")
         return pd.DataFrame()
 
-    print(f"พบ {len(json_files)} ไฟล์ JSON จะเริ่มทำการประมวลผล...")
+    with ListingStore(store_path) as store:
+        all_cars_data = ColumnarBuilder().extend(one2car_car_info(car)
+                                                 for car in store.iter_payloads("one2car", changed_since))
 
-    for filename in json_files:
-        file_path = os.path.join(directory_path, filename)
-        print(f"  - กำลังอ่านไฟล์: {filename}")
-        try:
-            # --- อ่านไฟล์ด้วย encoding 'utf-8-sig' ตามที่กำหนด ---
-            with open(file_path, 'r', encoding='utf-8-sig') as f:
-                car_list = json.load(f)
-
-            for car in car_list:
-                # --- การดึงข้อมูลและคำนวณฟิลด์ที่ซับซ้อน ---
-
-                # 1. คำนวณ Sub Model
-                full_name = car.get('name', '')
-                brand_name = car.get('brand', '')
-                model_name = car.get('model', '')
-                year_str = str(car.get('year', ''))
-                # ลบส่วนที่ไม่ต้องการออกจากชื่อเต็มเพื่อให้ได้รุ่นย่อย
-                sub_model = full_name.replace(brand_name, '').replace(model_name, '').replace(year_str, '').strip()
-
-                # 2. ดึงชื่อผู้ขายจาก URL
-                dealer_url = car.get('dealer_url', '')
-                seller_name = dealer_url.split('/')[-1] if dealer_url else 'N/A'
-
-                car_info = {
-                    "Sources": source_name,
-                    "Brand": brand_name,
-                    "Model": model_name,
-                    "Sub Model": sub_model,
-                    "Year": car.get('year'),
-                    "Price": car.get('price'),
-                    "Mileage": car.get('mileage_km'),
-                    "Plate No.": "N/A",
-                    "Seller Name": seller_name,
-                    "Phone Number":'N/A',
-                    "URL": car.get('page_url')
-                }
-                all_cars_data.append(car_info)
-
-        except json.JSONDecodeError:
-            print(f"    คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {filename} ได้")
-        except Exception as e:
-            print(f"    เกิดข้อผิดพลาดขณะประมวลผลไฟล์ {filename}: {e}")
-
-    if not all_cars_data:
-        print("ไม่พบข้อมูลรถยนต์ในไฟล์ JSON ทั้งหมด")
+    if not len(all_cars_data):
+        print("ไม่พบข้อมูลรถยนต์ใน listing store")
         return pd.DataFrame()
 
-    df = pd.DataFrame(all_cars_data)
-
-    column_order = [
-        "Sources", "Brand", "Model", "Sub Model", "Year",
-        "Price", "Mileage", "Plate No.", "Seller Name","Phone Number", "URL"
-    ]
-    df = df[column_order]
-
-    return df
+    return all_cars_data.to_frame()
 
 
 # --- ส่วนหลักของโปรแกรม ---
 if __name__ == "__main__":
+    # จำเป็นสำหรับ process pool เมื่อ build เป็น .exe ด้วย PyInstaller
+    multiprocessing.freeze_support()
+
     DATA_DIRECTORY = 'one2car'
     OUTPUT_DIRECTORY = 'combined'
     OUTPUT_FILENAME = 'one2car_combined_data.csv'
+    READ_FROM_STORE = False  # True = อ่านจาก listing store (listings.db) แทนไฟล์ JSON
+    OUTPUT_FORMAT = 'csv'  # 'csv', 'parquet' หรือ 'dataset' (parquet แบ่งโฟลเดอร์ตาม Sources)
+    WORKERS = os.cpu_count() or 1  # จำนวน process ที่อ่านไฟล์ JSON พร้อมกัน (1 = ไม่ใช้ process pool)
 
-    combined_dataframe = build_one2car_database_from_json(DATA_DIRECTORY)
+    if READ_FROM_STORE:
+        combined_dataframe = build_one2car_database_from_store()
+    else:
+        combined_dataframe = build_one2car_database_from_json(DATA_DIRECTORY, WORKERS)
 
     if not combined_dataframe.empty:
         try:
             print(f"\nกำลังเตรียมบันทึกไฟล์... ตรวจสอบโฟลเดอร์ '{OUTPUT_DIRECTORY}'")
             os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
 
-            output_path = os.path.join(OUTPUT_DIRECTORY, OUTPUT_FILENAME)
+            output_path = output_path_for(OUTPUT_DIRECTORY, OUTPUT_FILENAME, OUTPUT_FORMAT)
 
-            combined_dataframe.to_csv(output_path, index=False, encoding='utf-8-sig')
+            # บันทึกเป็น CSV หรือ Parquet ตาม OUTPUT_FORMAT
+            write_output(combined_dataframe, output_path, OUTPUT_FORMAT)
 
             print("\n----------------------------------------------------")
             print("การประมวลผลเสร็จสมบูรณ์!")
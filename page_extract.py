@@ -0,0 +1,128 @@
+import json
+import re
+from html.parser import HTMLParser
+
+# ดึงเฉพาะ <script type="application/ld+json"> โดยไม่ต้องสร้าง DOM ทั้งหน้า
+_LD_JSON_RE = re.compile(
+    r'<script[^>]*?type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+_LD_JSON_RE_BYTES = re.compile(_LD_JSON_RE.pattern.encode(), re.IGNORECASE | re.DOTALL)
+
+
+def iter_ld_json_blocks(html):
+    """Yield the raw text of every application/ld+json script in a page
+
+    Accepts str (driver.page_source) or bytes (response.content).
+    """
+    if isinstance(html, bytes):
+        for match in _LD_JSON_RE_BYTES.finditer(html):
+            yield match.group(1).decode('utf-8', errors='replace')
+    else:
+        for match in _LD_JSON_RE.finditer(html):
+            yield match.group(1)
+
+
+def extract_ld_json(html):
+    """Return (parsed blocks, errors) for every ld+json script in a page"""
+    blocks, errors = [], []
+    for raw in iter_ld_json_blocks(html):
+        try:
+            blocks.append(json.loads(raw))
+        except json.JSONDecodeError as e:
+            errors.append(e)
+    return blocks, errors
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def extract_js_json_var(html, var_name):
+    """Return the object assigned by ``var <var_name> = {...};`` in a page, or None
+
+    One regex search finds the assignment, then the JSON decoder reads the
+    object straight from that offset, so nested braces and braces inside
+    strings are handled and the rest of the page is never parsed. Accepts
+    str (driver.page_source) or bytes (response.content). Raises
+    json.JSONDecodeError if the object itself is malformed.
+    """
+    if isinstance(html, bytes):
+        pattern = rb'var\s+' + re.escape(var_name.encode()) + rb'\s*=\s*(?=\{)'
+        match = re.search(pattern, html)
+        if not match:
+            return None
+        # decode เฉพาะส่วนตั้งแต่ตัวแปรเป็นต้นไป ไม่ต้อง decode ทั้งหน้า
+        text, start = html[match.end():].decode('utf-8', errors='replace'), 0
+    else:
+        match = re.search(r'var\s+' + re.escape(var_name) + r'\s*=\s*(?=\{)', html)
+        if not match:
+            return None
+        text, start = html, match.end()
+
+    obj, _ = _JSON_DECODER.raw_decode(text, start)
+    return obj
+
+
+def extract_sch_data_json(html):
+    """Return the taladrod search-page ``SchDataJSON`` object, or None if absent"""
+    return extract_js_json_var(html, 'SchDataJSON')
+
+
+WAREHOUSE_FIELDS = ('index', 'brand', 'model', 'mileage', 'price_range')
+
+
+def warehouse_record(cells, link):
+    """Map one krungsri warehouse row (cell texts + data-href) to its record, or None"""
+    if len(cells) < len(WAREHOUSE_FIELDS):
+        return None
+    record = {field: cells[i].strip() for i, field in enumerate(WAREHOUSE_FIELDS)}
+    record['link'] = link
+    return record
+
+
+class _WarehouseRowParser(HTMLParser):
+    """Collects the cell texts and data-href of every ``tr.clickable-row``"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'tr' and 'clickable-row' in (attrs.get('class') or '').split():
+            self._row = {'cells': [], 'link': attrs.get('data-href')}
+        elif self._row is not None and tag == 'td':
+            self._cell = []
+        elif self._cell is not None and tag == 'br':
+            self._cell.append('\n')
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'td' and self._cell is not None:
+            # ย่อช่องว่างแบบเดียวกับที่เบราว์เซอร์แสดงผล (.text)
+            lines = (' '.join(line.split()) for line in ''.join(self._cell).split('\n'))
+            self._row['cells'].append('\n'.join(line for line in lines if line))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+
+def parse_warehouse_rows(html):
+    """Return the records of every clickable-row in a krungsri warehouse page
+
+    Works on raw HTML (str or bytes), so a page can be parsed without a
+    browser; rows with fewer than five cells are skipped like before.
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    parser = _WarehouseRowParser()
+    parser.feed(html)
+    parser.close()
+    records = (warehouse_record(row['cells'], row['link']) for row in parser.rows)
+    return [record for record in records if record]
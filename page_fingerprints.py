@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+
+
+class PageFingerprintIndex:
+    """Content hash and listing ids of every crawled results page, kept in one JSON file.
+
+    ``check`` compares a freshly scraped page with what was stored last time,
+    so a recrawl only rewrites pages whose content changed and can tell when
+    listings moved to a different page (new cars pushed in at the top shift
+    everything below them). The ETag / Last-Modified of each page are kept
+    too, so the next crawl can send a conditional request and skip the
+    download when the server answers 304. ``save`` writes the index atomically.
+    """
+
+    # ชื่อ header ของ validator -> key ที่เก็บใน index
+    VALIDATORS = {'ETag': 'etag', 'Last-Modified': 'last_modified'}
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        # listing id -> page ที่เห็นครั้งล่าสุด ใช้ตรวจว่ารถเลื่อนไปหน้าอื่นหรือไม่
+        self._page_of = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.pages = json.load(f)
+            for page, entry in self.pages.items():
+                for listing_id in entry.get('ids', []):
+                    self._page_of[listing_id] = int(page)
+
+    @staticmethod
+    def fingerprint(records):
+        payload = json.dumps(records, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(payload).hexdigest()
+
+    def check(self, page, records, ids):
+        """Return (status, shifted ids) for a page; status is 'new', 'unchanged' or 'changed'"""
+        entry = self.pages.get(str(page))
+        shifted = [listing_id for listing_id in ids
+                   if self._page_of.get(listing_id, page) != page]
+        if entry is None:
+            return 'new', shifted
+        if entry.get('hash') == self.fingerprint(records):
+            return 'unchanged', shifted
+        return 'changed', shifted
+
+    @classmethod
+    def validators_from(cls, response_headers):
+        """The ETag / Last-Modified of a response, keyed as stored in the index"""
+        return {key: response_headers[header] for header, key in cls.VALIDATORS.items()
+                if response_headers.get(header)}
+
+    def conditional_headers(self, page):
+        """If-None-Match / If-Modified-Since for a page, from the validators stored with it"""
+        entry = self.pages.get(str(page)) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def set_validators(self, page, validators):
+        """Replace the stored validators of a known page; returns True if they changed"""
+        entry = self.pages.get(str(page))
+        if entry is None:
+            return False
+        changed = False
+        for key in self.VALIDATORS.values():
+            if entry.get(key) != validators.get(key):
+                changed = True
+                if validators.get(key):
+                    entry[key] = validators[key]
+                else:
+                    entry.pop(key, None)
+        return changed
+
+    def update(self, page, records, ids, validators=None):
+        self.pages[str(page)] = {'hash': self.fingerprint(records), 'ids': list(ids), **(validators or {})}
+        for listing_id in ids:
+            self._page_of[listing_id] = page
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.pages, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
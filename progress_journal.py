@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+
+
+class ProgressJournal:
+    """Append-only JSONL journal of per-car enrichment results keyed by ``cid``.
+
+    Instead of rewriting the whole data file after every car, each result is
+    appended as one line to ``<data file>.journal.jsonl``. On startup
+    ``replay`` applies the journal to the freshly loaded data, so an
+    interrupted run resumes where it stopped. ``compact`` writes the merged
+    data back to the main file (atomically) and empties the journal.
+    """
+
+    def __init__(self, data_path, journal_path=None):
+        self.data_path = data_path
+        self.journal_path = journal_path or f"{data_path}.journal.jsonl"
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def replay(self, data):
+        """Apply journaled results to ``data`` in place; returns the number of cars updated"""
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        results = {}
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # บรรทัดสุดท้ายอาจเขียนไม่จบถ้าโปรแกรมถูกปิดกลางคัน
+                    continue
+                cid = entry.pop('cid', None)
+                if cid is not None:
+                    results.setdefault(str(cid), {}).update(entry)
+
+        applied = 0
+        for item in data:
+            fields = results.get(str(item.get('cid')))
+            if fields:
+                item.update(fields)
+                applied += 1
+        self.pending = len(results)
+        return applied
+
+    def append(self, cid, fields):
+        """Record one car's result; the line is flushed before returning"""
+        line = json.dumps({'cid': cid, **fields}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+                if self._ends_mid_line():
+                    self._file.write('\n')
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.pending += 1
+
+    def _ends_mid_line(self):
+        # ถ้าครั้งก่อนเขียนบรรทัดสุดท้ายไม่จบ ให้ขึ้นบรรทัดใหม่ก่อนต่อท้าย
+        if os.path.getsize(self.journal_path) == 0:
+            return False
+        with open(self.journal_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def compact(self, data):
+        """Write ``data`` to the main file and truncate the journal"""
+        with self._lock:
+            tmp_path = f"{self.data_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.data_path)
+
+            # ลบ journal หลังจากไฟล์หลักถูกเขียนเสร็จแล้วเท่านั้น
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,170 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+def host_of(url_or_host):
+    return urlparse(url_or_host).netloc or url_or_host
+
+
+def status_from_error(error):
+    """Pull the status code out of an in-browser fetch error such as 'HTTP 429'"""
+    match = re.search(r'HTTP (\d{3})', str(error or ''))
+    return int(match.group(1)) if match else None
+
+
+def retry_after_seconds(headers):
+    """Numeric Retry-After header value in seconds, or None"""
+    value = (headers or {}).get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _HostState:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.fast_latency = None   # EWMA ที่ไวต่อการเปลี่ยนแปลง
+        self.slow_latency = None   # EWMA ที่ช้า ใช้เป็น baseline
+        self.requests = 0
+        self.failures = 0
+        self.backoffs = 0
+        self.waited = 0.0
+
+
+class AdaptiveRateLimiter:
+    """Token bucket per host whose rate is tuned by AIMD.
+
+    Every healthy response adds ``increase`` req/s to that host's rate (up to
+    ``max_rate``). A 429, a 5xx, a transport error, or latency rising above
+    ``latency_factor`` x its own baseline (and above ``latency_floor``) multiplies the rate by ``decrease``
+    (down to ``min_rate``), at most once per refill interval. A Retry-After
+    value pauses the host entirely. Thread-safe; one instance is shared by
+    all scrapers in a process through ``get_limiter()``.
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=0.1, max_rate=10.0, increase=0.1, decrease=0.5,
+                 latency_factor=2.0, latency_floor=0.5, burst=2, log=print):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.burst = burst
+        self.log = log
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self.initial_rate, self.burst)
+        return self._hosts[host]
+
+    def wait(self, url):
+        """Block until the host of ``url`` has a token available"""
+        host = host_of(url)
+        while True:
+            with self._lock:
+                state = self._state(host)
+                now = time.monotonic()
+                state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * state.rate)
+                state.last_refill = now
+                if now >= state.blocked_until and state.tokens >= 1:
+                    state.tokens -= 1
+                    return
+                delay = max(state.blocked_until - now, (1 - state.tokens) / state.rate)
+                state.waited += delay
+            time.sleep(delay)
+
+    def record(self, url, status=None, latency=None, retry_after=None, error=False):
+        """Feed back one response; ``status=None`` means unknown (e.g. a Selenium page load)"""
+        host = host_of(url)
+        with self._lock:
+            state = self._state(host)
+            state.requests += 1
+
+            slow_down, reason = False, None
+            if error or status == 429 or (status is not None and status >= 500):
+                slow_down, reason = True, f"HTTP {status}" if status else "request error"
+            if latency is not None:
+                state.fast_latency = latency if state.fast_latency is None else 0.3 * latency + 0.7 * state.fast_latency
+                # latency ต่ำกว่า latency_floor ถือว่าเร็วพอเสมอ ไม่ให้ noise เล็กๆ ทำให้ลด rate
+                if (state.slow_latency is not None and state.fast_latency > self.latency_floor
+                        and state.fast_latency > self.latency_factor * state.slow_latency):
+                    slow_down, reason = True, reason or f"latency {state.fast_latency:.2f}s"
+                state.slow_latency = latency if state.slow_latency is None else 0.05 * latency + 0.95 * state.slow_latency
+
+            now = time.monotonic()
+            if retry_after:
+                state.blocked_until = max(state.blocked_until, now + float(retry_after))
+            if slow_down:
+                state.failures += 1
+                # ลดได้ครั้งเดียวต่อช่วงเวลาหนึ่ง ไม่ให้ error ที่มาพร้อมกันหลายตัวลด rate ซ้ำๆ
+                if now - state.last_decrease >= 1 / state.rate:
+                    old_rate = state.rate
+                    state.rate = max(self.min_rate, state.rate * self.decrease)
+                    state.last_decrease = now
+                    state.backoffs += 1
+                    if self.log:
+                        self.log(f"🐢 {host}: {old_rate:.2f} → {state.rate:.2f} req/s ({reason})")
+            elif status is None or status < 400:
+                state.rate = min(self.max_rate, state.rate + self.increase)
+
+    @contextmanager
+    def throttle(self, url):
+        """Wait for a token, time the block, and record the outcome
+
+        Set ``slot['status']`` (and optionally ``slot['retry_after']``)
+        inside the block; an exception is recorded as a failed request.
+        """
+        self.wait(url)
+        slot = {'status': None, 'retry_after': None}
+        started = time.monotonic()
+        try:
+            yield slot
+        except Exception:
+            self.record(url, slot['status'], time.monotonic() - started, error=True)
+            raise
+        self.record(url, slot['status'], time.monotonic() - started, slot['retry_after'])
+
+    def stats(self):
+        """Snapshot of the current rate and counters for every host"""
+        with self._lock:
+            return {
+                host: {
+                    'rate': round(state.rate, 3),
+                    'requests': state.requests,
+                    'failures': state.failures,
+                    'backoffs': state.backoffs,
+                    'avg_latency': round(state.slow_latency, 3) if state.slow_latency is not None else None,
+                    'seconds_waited': round(state.waited, 1),
+                }
+                for host, state in self._hosts.items()
+            }
+
+    def report(self, log=print):
+        for host, s in self.stats().items():
+            log(f"🚦 {host}: {s['requests']} requests, {s['failures']} slow/failed, {s['backoffs']} backoffs, "
+                f"now {s['rate']} req/s, avg latency {s['avg_latency']}s, waited {s['seconds_waited']}s")
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_limiter():
+    """The process-wide limiter shared by every scraper and worker thread"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = AdaptiveRateLimiter()
+        return _default_limiter
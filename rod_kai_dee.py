@@ -1,15 +1,17 @@
 import os
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, simpledialog
-from seleniumwire import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 import json
 import time
-import re
 import threading
 
+from driver_factory import create_driver, ensure_on, quit_driver
+from kaidee_next import (KAIDEE_HOME, MAX_WORKERS, KaideeListingClient,
+                         fetch_pages_concurrently, find_last_page)
+from listing_store import key_from, upsert_listings
+from rate_limiter import get_limiter
+
 class KaideeScraperApp:
     def __init__(self, master):
         self.master = master
@@ -18,6 +20,7 @@ class KaideeScraperApp:
 
         self.driver = None
         self.token = None
+        self.client = None
         self.all_car_data = []
         self.scraping_thread = None
 
@@ -73,6 +76,10 @@ class KaideeScraperApp:
         self.log_area.config(state=tk.DISABLED) # Disable after writing
         self.master.update_idletasks() # Update GUI immediately
 
+    def log_threadsafe(self, message):
+        """Log from worker threads through the Tk main loop."""
+        self.master.after(0, self.log_message, message)
+
     def launch_browser_threaded(self):
         """Starts the browser launch in a separate thread."""
         self.btn_launch_browser.config(state=tk.DISABLED) # Disable to prevent multiple clicks
@@ -84,26 +91,19 @@ class KaideeScraperApp:
         """Actual browser launch logic."""
         try:
             self.log_message("Setting up Firefox driver...")
-            chrome_options = Options()
-            # chrome_options.add_argument("--headless")  # Uncomment to run headless if needed
             chromedriver_path = os.path.join(os.getcwd(), "drivers", "chromedriver.exe")
-            chrome_options.add_argument("--window-size=1200,800")
-            self.driver = webdriver.Chrome(service=Service(chromedriver_path), options=chrome_options)
+            # token อ่านจาก __NEXT_DATA__ ได้โดยตรง ไม่ต้องผ่าน proxy ของ seleniumwire แล้ว
+            self.driver = create_driver(headless=False,  # set True to run headless if needed
+                                        window_size="1200,800",
+                                        service=Service(chromedriver_path))
             # You can set window size after launching if not headless
             # self.driver.set_window_size(1200, 800)
             self.log_message("Firefox browser launched successfully.")
 
-            self.log_message("Navigating to https://rod.kaidee.com/c11-auto-car...")
-            self.driver.get('https://rod.kaidee.com/c11-auto-car')
+            self.log_message(f"Navigating to {KAIDEE_HOME}...")
+            ensure_on(self.driver, KAIDEE_HOME)
             self.log_message(f"Current Page Title: {self.driver.title}")
 
-            self.log_message("Navigating to https://rod.kaidee.com/c11a5-auto-car-toyota...")
-            self.driver.get('https://rod.kaidee.com/c11a5-auto-car-toyota')
-            self.log_message("Waiting for 5 seconds for page to load and requests to occur...")
-            time.sleep(5)
-            self.log_message(f"New Page Title: {self.driver.title}")
-            self.log_message("Finished waiting.")
-
             self.master.after(0, self.enable_get_token_button) # Enable button on main thread
         except Exception as e:
             self.master.after(0, lambda: messagebox.showerror("Error", f"Failed to launch browser: {e}"))
@@ -125,7 +125,7 @@ class KaideeScraperApp:
             return
 
         self.btn_get_token.config(state=tk.DISABLED) # Disable while running
-        self.log_message("Collecting token from network requests in background...")
+        self.log_message("Reading token (Next.js buildId) in background...")
         self.scraping_thread = threading.Thread(target=self._get_token)
         self.scraping_thread.start()
 
@@ -133,22 +133,17 @@ class KaideeScraperApp:
         """Actual token collection logic."""
         self.token = None
         try:
-            for request in self.driver.requests:
-                if request.method == 'GET' and 'rod.kaidee.com/_next/data/' in request.url:
-                    self.log_message(f"Checking URL: {request.url}")
-                    match = re.search(r'/_next/data/([^/]+)/th/auto/listing\.json', request.url)
-                    if match:
-                        self.token = match.group(1)
-                        self.log_message(f"Found token: {self.token}")
-                        break
+            # cache บนดิสก์ก่อน แล้วค่อยอ่าน window.__NEXT_DATA__.buildId จากหน้าเว็บ
+            self.client = KaideeListingClient.from_driver(self.driver, log=self.log_message)
+            self.token = self.client.get_token(driver=self.driver)
 
             if self.token:
                 self.log_message(f"Extracted token: {self.token}")
                 self.master.after(0, lambda: self.btn_scrape_data.config(state=tk.NORMAL)) # Enable scrape button
                 self.log_message("Token found. You can now enter Max Pages and click 'Scrape Data'.")
             else:
-                self.log_message("Token not found. The specific request might not have occurred or the URL pattern needs adjustment.")
-                self.log_message("Consider increasing the initial wait time or checking other request URLs.")
+                self.log_message("Token not found. The page did not expose __NEXT_DATA__.buildId.")
+                self.log_message("Check that the page finished loading, then try again.")
                 self.master.after(0, lambda: messagebox.showwarning("Token Not Found", "Token could not be extracted. Check logs for details."))
 
         except Exception as e:
@@ -185,58 +180,20 @@ class KaideeScraperApp:
 
     def _scrape_data(self, max_page):
         """Actual data scraping logic."""
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:137.0) Gecko/20100101 Firefox/137.0',
-            'Accept': '*/*',
-            'Accept-Language': 'th,en-US;q=0.7,en;q=0.3',
-            'Referer': 'https://rod.kaidee.com/',
-            'x-nextjs-data': '1',
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin'
-        }
-
-        for page_no in range(1, max_page + 1):
-            try:
-                js_code = f"""
-                return fetch('https://rod.kaidee.com/_next/data/{self.token}/th/auto/listing.json?categoryId=11&attributeId=1&page={page_no}', {{
-                    method: 'GET',
-                    headers: {json.dumps(headers)},
-                    credentials: 'include'
-                }})
-                .then(response => {{
-                    if (!response.ok) throw new Error(`HTTP ${{response.status}}`);
-                    return response.json();
-                }})
-                .catch(error => ({{error: error.message}}));
-                """
-                response = self.driver.execute_script(js_code)
-
-                if 'error' in response:
-                    self.log_message(f"Error on page {page_no}: {response['error']}")
-                    continue
-
-                if 'pageProps' in response and 'ads' in response['pageProps']:
-                    ads = response['pageProps']['ads']
-                    if ads and len(ads) > 0:
-                        car_ads = [ad_data for ad_data in ads if 'title' in ad_data]
-                        self.all_car_data.extend(car_ads)
-                        self.log_message(f"Page {page_no}: Scraped {len(car_ads)} car ads (out of {len(ads)} total items). Total collected: {len(self.all_car_data)}")
-                    else:
-                        self.log_message(f"Page {page_no}: No car ads found. This might be the last page.")
-                        break
-                else:
-                    self.log_message(f"Page {page_no}: Invalid response structure or missing 'pageProps'/'ads'.")
-
-                time.sleep(1) # Rate limiting
-
-            except Exception as e:
-                self.log_message(f"An unexpected exception occurred on page {page_no}: {str(e)}")
-                continue
+        try:
+            # หาหน้าสุดท้ายจริงก่อน (Max Pages เป็นแค่เพดาน) แล้วดึงทุกหน้าพร้อมกัน
+            self.log_message(f"Finding the last listing page (up to {max_page})...")
+            last_page = find_last_page(self.client, max_page=max_page, log=self.log_message)
+            self.log_message(f"Fetching pages 1-{last_page} with {MAX_WORKERS} workers...")
+            self.all_car_data = fetch_pages_concurrently(self.client, range(1, last_page + 1),
+                                                         workers=MAX_WORKERS, log=self.log_threadsafe)
+            self.token = self.client.token
+        except Exception as e:
+            self.log_message(f"An unexpected exception occurred while scraping: {str(e)}")
 
         self.log_message(f"\n--- Scraping Complete ---")
         self.log_message(f"Total unique car listings collected: {len(self.all_car_data)}")
+        get_limiter().report(log=self.log_message)
         self.save_data()
         self.master.after(0, lambda: self.btn_scrape_data.config(state=tk.NORMAL)) # Re-enable scrape button
         self.master.after(0, lambda: messagebox.showinfo("Scraping Done", f"Scraping completed! Total {len(self.all_car_data)} listings collected."))
@@ -247,7 +204,8 @@ class KaideeScraperApp:
             try:
                 with open('rod_kaidee.json', 'w', encoding='utf-8') as f:
                     json.dump(self.all_car_data, f, ensure_ascii=False, indent=2)
-                self.log_message("Data successfully saved to **rod_kaidee.json**")
+                upsert_listings("rod_kaidee", self.all_car_data, key_from('id'))
+                self.log_message("Data successfully saved to **rod_kaidee.json** and the listing store")
             except Exception as e:
                 self.log_message(f"Error saving data to file: {e}")
                 self.master.after(0, lambda: messagebox.showerror("Save Error", f"Error saving data: {e}"))
@@ -259,13 +217,14 @@ class KaideeScraperApp:
         if self.driver:
             self.log_message("Closing the browser...")
             try:
-                self.driver.quit()
+                quit_driver(self.driver, log=self.log_message)
                 self.log_message("Browser closed successfully.")
             except Exception as e:
                 self.log_message(f"Error closing browser: {e}")
                 messagebox.showerror("Error", f"Error closing browser: {e}")
             self.driver = None
             self.token = None
+            self.client = None
             self.all_car_data = []
 
         self.btn_launch_browser.config(state=tk.NORMAL)
@@ -2,21 +2,55 @@ import json
 import os
 import pandas as pd
 
-
-def build_kaidee_database_from_json(input_filepath):
+from car_canon import canonical_brand, canonical_model
+from car_template import CarRecord, ColumnarBuilder, concat_frames
+from formatter_output import output_path_for, write_output
+from json_stream import CHUNK_ROWS, frames_from_records, iter_json_array
+from listing_store import ListingStore, STORE_PATH
+
+
+def kaidee_car_info(car, source_name="rod_kaidee"):
+    """แปลงประกาศ 1 รายการจาก Kaidee ให้อยู่ในรูปแบบ template"""
+    # ใช้ .get() ซ้อนกันเพื่อเข้าถึงข้อมูลใน nested object อย่างปลอดภัย
+    auto_info = car.get('autoInfo', {})
+    member_info = car.get('member', {})
+
+    # สร้าง URL ของประกาศจาก ID
+    listing_id = car.get('id')
+    page_url = f"https://www.kaidee.com/product/{listing_id}" if listing_id else "N/A"
+    phone_number = car.get("contactInfo").get("phone", 'N/A')
+    return CarRecord(
+        sources=source_name,
+        brand=canonical_brand(auto_info.get('brand')),
+        model=canonical_model(auto_info.get('brand'), auto_info.get('model')),
+        sub_model=auto_info.get('submodel'),
+        year=auto_info.get('year'),
+        price=car.get('price'),
+        mileage=auto_info.get('mileage'),
+        plate_no="N/A",
+        seller_name=member_info.get('name'),
+        phone_number=phone_number,
+        url=page_url
+    )
+
+
+def build_kaidee_database_from_json(input_filepath, stream=True, chunk_rows=CHUNK_ROWS):
     """
     อ่านข้อมูลรถยนต์จากไฟล์ JSON ของ Kaidee,
     ดึงข้อมูลจาก nested objects, และแปลงเป็น Pandas DataFrame ตาม template
 
     Args:
         input_filepath (str): เส้นทางไปยังไฟล์ JSON ที่ต้องการอ่าน
+        stream (bool): True = อ่านทีละคันจาก array โดยไม่โหลดทั้งไฟล์ (หน่วยความจำคงที่)
+                       False = json.load ทั้งไฟล์แบบเดิม
+        chunk_rows (int): จำนวนคันต่อ DataFrame ย่อยก่อนนำมาต่อกัน
 
     Returns:
         pandas.DataFrame: ตารางข้อมูลรถยนต์ทั้งหมดที่ประมวลผลแล้ว
                           หรือ DataFrame ว่างถ้าไม่พบข้อมูล/ไฟล์
     """
     source_name = "rod_kaidee"
-    processed_data = []
+    frames = []
 
     # ตรวจสอบว่าไฟล์มีอยู่จริงหรือไม่
     if not os.path.exists(input_filepath):
@@ -27,66 +61,78 @@ def build_kaidee_database_from_json(input_filepath):
 
     try:
         # อ่านไฟล์ JSON ด้วย encoding 'utf-8' ซึ่งเป็นมาตรฐาน
-        with open(input_filepath, 'r', encoding='utf-8') as f:
-            car_list = json.load(f)
-
-        # วนลูปเพื่อประมวลผลข้อมูลทีละรายการ
-        for car in car_list:
-            # ใช้ .get() ซ้อนกันเพื่อเข้าถึงข้อมูลใน nested object อย่างปลอดภัย
-            auto_info = car.get('autoInfo', {})
-            member_info = car.get('member', {})
-
-            # สร้าง URL ของประกาศจาก ID
-            listing_id = car.get('id')
-            page_url = f"https://www.kaidee.com/product/{listing_id}" if listing_id else "N/A"
-            phone_number = car.get("contactInfo").get("phone", 'N/A')
-            car_info = {
-                "Sources": source_name,
-                "Brand": auto_info.get('brand'),
-                "Model": auto_info.get('model'),
-                "Sub Model": auto_info.get('submodel'),
-                "Year": auto_info.get('year'),
-                "Price": car.get('price'),
-                "Mileage": auto_info.get('mileage'),
-                "Plate No.": "N/A",
-                "Seller Name": member_info.get('name'),
-                "Phone Number": phone_number,
-                "URL": page_url
-            }
-            processed_data.append(car_info)
-
-    except json.JSONDecodeError:
-        print(f"    คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {input_filepath} ได้ (อาจมีโครงสร้างผิด)")
+        if stream:
+            car_list = iter_json_array(input_filepath, encoding='utf-8')
+        else:
+            with open(input_filepath, 'r', encoding='utf-8') as f:
+                car_list = json.load(f)
+
+        # ประมวลผลทีละรายการ แล้วสร้าง DataFrame ทีละ chunk_rows คัน
+        for frame in frames_from_records(car_list, lambda car: kaidee_car_info(car, source_name),
+                                         chunk_rows):
+            frames.append(frame)
+
+    except json.JSONDecodeError as e:
+        print(f"    คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {input_filepath} ได้ทั้งหมด ({e.msg})")
+        # โหมด stream จะเก็บรถที่อ่านได้ก่อนจุดที่ไฟล์เสียไว้ ผลลัพธ์จึงเป็นข้อมูลเพียงบางส่วน
+        if frames:
+            print(f"    คำเตือน: ข้อมูลไม่ครบ! ใช้ได้เพียง {sum(len(frame) for frame in frames)} รายการแรก "
+                  f"ก่อนจุดที่ไฟล์เสีย รายการหลังจากนั้นหายไปจากผลลัพธ์")
     except Exception as e:
         print(f"เกิดข้อผิดพลาดร้ายแรงขณะอ่านหรือประมวลผลไฟล์ JSON: {e}")
         return pd.DataFrame()
 
-    if not processed_data:
+    if not frames:
         print("ไม่พบข้อมูลที่สามารถประมวลผลได้ในไฟล์")
         return pd.DataFrame()
 
-    # สร้าง DataFrame จาก list ของข้อมูลที่ประมวลผลแล้ว
-    final_df = pd.DataFrame(processed_data)
-
-    # จัดลำดับคอลัมน์ให้ตรงตาม Template
-    column_order = [
-        "Sources", "Brand", "Model", "Sub Model", "Year",
-        "Price", "Mileage", "Plate No.", "Seller Name", "Phone Number","URL"
-    ]
-    final_df = final_df[column_order]
+    # ต่อ DataFrame ย่อยเข้าด้วยกัน (คอลัมน์เรียงตาม Template แล้ว)
+    final_df = concat_frames(frames)
 
     return final_df
 
 
+def build_kaidee_database_from_store(store_path=STORE_PATH, changed_since=None):
+    """
+    อ่านข้อมูลดิบของ rod_kaidee จาก listing store (SQLite) แทนการอ่านไฟล์ JSON
+    และแปลงเป็น Pandas DataFrame ตาม template เดียวกัน
+
+    Args:
+        store_path (str): เส้นทางไปยังไฟล์ฐานข้อมูล listing store
+        changed_since (str): ถ้าระบุ จะอ่านเฉพาะรายการที่เปลี่ยนตั้งแต่เวลานี้ ("YYYY-mm-dd HH:MM:SS")
+
+    Returns:
+        pandas.DataFrame: ตารางข้อมูลรถยนต์ หรือ DataFrame ว่างถ้าไม่พบข้อมูล
+    """
+    if not os.path.exists(store_path):
+        print(f"ผิดพลาด: ไม่พบ listing store '{store_path}'")
+        return pd.DataFrame()
+
+    with ListingStore(store_path) as store:
+        all_cars_data = ColumnarBuilder().extend(kaidee_car_info(car)
+                                                 for car in store.iter_payloads("rod_kaidee", changed_since))
+
+    if not len(all_cars_data):
+        print("ไม่พบข้อมูลรถยนต์ใน listing store")
+        return pd.DataFrame()
+
+    return all_cars_data.to_frame()
+
+
 # --- ส่วนหลักของโปรแกรม ---
 if __name__ == "__main__":
     # กำหนดชื่อไฟล์ข้อมูลและไฟล์ผลลัพธ์
     DATA_FILE = 'rod_kaidee.json'
     OUTPUT_DIRECTORY = 'combined'
     OUTPUT_FILENAME = 'rod_kaidee_combined_data.csv'
+    READ_FROM_STORE = False  # True = อ่านจาก listing store (listings.db) แทนไฟล์ JSON
+    OUTPUT_FORMAT = 'csv'  # 'csv', 'parquet' หรือ 'dataset' (parquet แบ่งโฟลเดอร์ตาม Sources)
 
     # เรียกใช้ฟังก์ชันหลักเพื่อประมวลผล
-    combined_dataframe = build_kaidee_database_from_json(DATA_FILE)
+    if READ_FROM_STORE:
+        combined_dataframe = build_kaidee_database_from_store()
+    else:
+        combined_dataframe = build_kaidee_database_from_json(DATA_FILE)
 
     # ตรวจสอบว่ามีข้อมูลที่ถูกประมวลผลหรือไม่ ก่อนทำการบันทึก
     if not combined_dataframe.empty:
@@ -94,9 +140,10 @@ if __name__ == "__main__":
             print(f"\nกำลังเตรียมบันทึกไฟล์... ตรวจสอบโฟลเดอร์ '{OUTPUT_DIRECTORY}'")
             os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
 
-            output_path = os.path.join(OUTPUT_DIRECTORY, OUTPUT_FILENAME)
+            output_path = output_path_for(OUTPUT_DIRECTORY, OUTPUT_FILENAME, OUTPUT_FORMAT)
 
-            combined_dataframe.to_csv(output_path, index=False, encoding='utf-8-sig')
+            # บันทึกเป็น CSV หรือ Parquet ตาม OUTPUT_FORMAT
+            write_output(combined_dataframe, output_path, OUTPUT_FORMAT)
 
             print("\n----------------------------------------------------")
             print("การประมวลผลเสร็จสมบูรณ์!")
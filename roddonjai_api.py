@@ -0,0 +1,137 @@
+import threading
+from urllib.parse import urlparse
+
+from driver_factory import ensure_on
+from http_client import make_session, harvest_browser_session
+from rate_limiter import get_limiter, retry_after_seconds
+
+HOME_URL = 'https://www.roddonjai.com'
+API_BASE = 'https://api-buyer.roddonjai.com/api-gateway/buyer'
+SEARCH_CAR_PROFILE_URL = f'{API_BASE}/home-page/search-car-profile-advance'
+SEARCH_BLUEBOOK_URL = f'{API_BASE}/service-page/search-bluebook-card'
+
+API_HEADERS = {
+    'Accept': 'application/json, text/plain, */*',
+    'Content-Type': 'application/json',
+    'Origin': 'https://www.roddonjai.com',
+    'Referer': 'https://www.roddonjai.com/',
+}
+
+
+def build_car_profile_payload(brand_name, page_no, page_size):
+    """Build the search-car-profile-advance request body for one brand page"""
+    return {
+        "pageNo": page_no,
+        "pageSize": page_size,
+        "keyword": "",
+        "brandList": [brand_name],
+        "modelList": [],
+        "subModelList": [],
+        "carFuelList": [],
+        "carTypeList": None,
+        "colorCodeList": None,
+        "gearList": None,
+        "inspectionScore": None,
+        "sellingPointList": None,
+        "sellerSubType": None,
+        "minMileage": "",
+        "maxMileage": "",
+        "locationId": "",
+        "carInterestList": None,
+        "yearFrom": "",
+        "yearTo": "",
+        "sortedBy": "",
+        "isExcellentPrice": False,
+        "isGoodPrice": False,
+        "isFairPrice": False,
+        "provinceList": None,
+        "location": None,
+        "maxPrice": "20000000",
+        "minPrice": "0"
+    }
+
+
+def build_bluebook_payload():
+    """Build the search-bluebook-card request body (whole catalogue, no filters)"""
+    return {
+        "keyword": "",
+        "bluebookCode": "",
+        "carType": "",
+        "carSubSegment": "",
+        "brand": "",
+        "carModel": "",
+        "yearStart": "",
+        "yearEnd": "",
+        "carSubModel": "",
+        "carGear": [{"code": "M"}, {"code": "A"}],
+        "carPrice": None,
+        "carPriceFrom": 0,
+        "carPriceTo": 20000000,
+        "termPaymentPrice": "",
+        "sortType": ""
+    }
+
+
+class RoddonjaiClient:
+    """Pooled HTTP client for the roddonjai buyer API.
+
+    A browser is only needed once, to pick up the cookies and User-Agent the
+    API expects (see ``from_driver``). Every request after that goes over a
+    keep-alive connection pool instead of a WebDriver round trip.
+
+    The client is safe to share between threads; ``max_per_host`` caps how
+    many requests may be in flight to any one host at the same time, and the
+    shared adaptive rate limiter paces how often they start.
+    """
+
+    def __init__(self, session=None, pool_size=10, timeout=30, max_per_host=4, limiter=None):
+        self.session = session or make_session(pool_size=max(pool_size, max_per_host), headers=API_HEADERS)
+        self.timeout = timeout
+        self.limiter = limiter or get_limiter()
+        self.max_per_host = max_per_host
+        self._host_slots = {}
+        self._slots_lock = threading.Lock()
+
+    @classmethod
+    def from_driver(cls, driver, pool_size=10, timeout=30, max_per_host=4):
+        """Open the homepage once in the browser (or reuse a warm tab) and copy its session"""
+        ensure_on(driver, HOME_URL)
+        client = cls(pool_size=pool_size, timeout=timeout, max_per_host=max_per_host)
+        harvest_browser_session(driver, client.session)
+        return client
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def post_json(self, url, payload):
+        """POST a JSON payload and return the decoded body, or {'error': ...}"""
+        try:
+            with self._host_slot(url), self.limiter.throttle(url) as slot:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                slot['status'] = response.status_code
+                slot['retry_after'] = retry_after_seconds(response.headers)
+            if response.status_code != 200:
+                return {'error': f"HTTP {response.status_code}"}
+            return response.json()
+        except Exception as e:
+            return {'error': str(e)}
+
+    def search_car_profile(self, brand_name, page_no, page_size=100):
+        """Fetch one page of used-car listings for a brand"""
+        payload = build_car_profile_payload(brand_name, page_no, page_size)
+        return self.post_json(SEARCH_CAR_PROFILE_URL, payload)
+
+    def search_bluebook_card(self, page_no, page_size):
+        """Fetch one bluebook page; returns the searchBluebookCard object or {'error': ...}"""
+        url = f"{SEARCH_BLUEBOOK_URL}?pageNo={page_no}&pageSize={page_size}"
+        response = self.post_json(url, build_bluebook_payload())
+        if 'error' in response:
+            return response
+        return response.get('searchBluebookCard') or {'error': 'missing searchBluebookCard'}
+
+    def close(self):
+        self.session.close()
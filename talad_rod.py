@@ -1,65 +1,57 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-import re
 import json
-import time
 from tqdm import tqdm
 
+from driver_factory import create_driver, collect_bandwidth, get_throttled, quit_driver, DATA_ONLY_BLOCK_TYPES
+from listing_store import key_from, upsert_listings
+from page_extract import extract_sch_data_json
+from rate_limiter import get_limiter
+
 # โหลด URL จากไฟล์ JSON
 # โหลด URL จากไฟล์ JSON (เอาแค่ 5 ลิงก์แรก)
 with open("taladrod_links.json", "r", encoding="utf-8") as f:
     car_urls = json.load(f)  # แก้ตรงนี้ เอาแค่ 5 ลิงก์
 
 
-# ตั้งค่า Selenium Headless
-chrome_options = Options()
-chrome_options.add_argument("--headless")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--window-size=1920x1080")
-
-driver = webdriver.Chrome(options=chrome_options)
+# ตั้งค่า Selenium Headless (อ่านแค่ inline script จึงบล็อกรูป/ฟอนต์/CSS/โฆษณา)
+driver = create_driver(headless=True, window_size="1920,1080", block_types=DATA_ONLY_BLOCK_TYPES)
 
 all_cars = []
 
 for idx, url in enumerate(tqdm(car_urls, desc="🚗 ดึงข้อมูลรถ", unit="url"), start=1):
     try:
-        driver.get(url)
-        time.sleep(2)  # รอ JavaScript โหลด (ปรับได้)
+        # SchDataJSON อยู่ใน HTML ตั้งแต่แรก ไม่ต้องรอ JS; ความถี่ถูกคุมด้วย rate limiter
+        get_throttled(driver, url)
 
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        script_tag = soup.find('script', text=re.compile(r'SchDataJSON'))
+        data = extract_sch_data_json(driver.page_source)
+        collect_bandwidth(driver)
 
-        if not script_tag:
+        if data is None:
             tqdm.write(f"[{idx}] ⚠️ ไม่พบ script SchDataJSON ใน: {url}")
             continue
 
-        match = re.search(r'var SchDataJSON\s*=\s*(\{.*?\});', script_tag.string, re.DOTALL)
-        if match:
-            data = json.loads(match.group(1))
-            car_count = 0
-            for car in data.get('cars', []):
-                car_info = {
-                    "year": car.get('yr4'),
-                    "title": car.get('title'),
-                    "price": car.get('prc'),
-                    "image": car.get('img'),
-                    "url": url
-                }
-                all_cars.append(car)
-                car_count += 1
-
-            tqdm.write(f"[{idx}] ✅ {car_count} คันจาก: {url}")
-        else:
-            tqdm.write(f"[{idx}] ❌ ไม่พบข้อมูล JSON ใน: {url}")
+        car_count = 0
+        for car in data.get('cars', []):
+            car_info = {
+                "year": car.get('yr4'),
+                "title": car.get('title'),
+                "price": car.get('prc'),
+                "image": car.get('img'),
+                "url": url
+            }
+            all_cars.append(car)
+            car_count += 1
+
+        tqdm.write(f"[{idx}] ✅ {car_count} คันจาก: {url}")
     except Exception as e:
         tqdm.write(f"[{idx}] ❌ Error: {e}")
 
-driver.quit()
+quit_driver(driver, log=tqdm.write)
+get_limiter().report()
 
 # บันทึกผลลงไฟล์
 with open("talarod_cars.json", "w", encoding="utf-8") as f:
     json.dump(all_cars, f, ensure_ascii=False, indent=2)
+# merge=True: ไม่ทับเบอร์/ไมล์ที่ talarod_get_mileage_phone เติมไว้ใน store แล้ว
+upsert_listings("talad_rod", all_cars, key_from('cid'), merge=True)
 
 print(f"\n✅ เสร็จสิ้น ดึงข้อมูลรถทั้งหมด {len(all_cars)} คัน → talarod_cars.json")
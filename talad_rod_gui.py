@@ -2,11 +2,11 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
 import json
 import threading
-import time
-import re
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
+
+from driver_factory import create_driver, collect_bandwidth, get_throttled, quit_driver, DATA_ONLY_BLOCK_TYPES
+from listing_store import key_from, upsert_listings
+from page_extract import extract_sch_data_json
+from rate_limiter import get_limiter
 
 
 class CarScraperGUI:
@@ -190,17 +190,13 @@ class CarScraperGUI:
 
     def _run_scraper_thread(self, urls_to_scrape):
         all_cars = []
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--window-size=1920x1080")
-        chrome_options.add_argument(
-            "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+        user_agent = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
 
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = create_driver(headless=True, window_size="1920,1080", user_agent=user_agent,
+                                   block_types=DATA_ONLY_BLOCK_TYPES)
             total_urls = len(urls_to_scrape)
             self.progress_bar["maximum"] = total_urls
 
@@ -211,26 +207,20 @@ class CarScraperGUI:
 
                 try:
                     self.log(f"[{idx}/{total_urls}] Processing: {url}", "black")
-                    driver.get(url)
-                    time.sleep(2)
+                    get_throttled(driver, url)
 
-                    soup = BeautifulSoup(driver.page_source, "html.parser")
-                    script_tag = soup.find('script', text=re.compile(r'SchDataJSON'))
+                    data = extract_sch_data_json(driver.page_source)
+                    collect_bandwidth(driver)
 
-                    if not script_tag:
+                    if data is None:
                         self.log(f"[{idx}] ⚠️ Cannot find SchDataJSON script in: {url}", "orange")
                         continue
 
-                    match = re.search(r'var SchDataJSON\s*=\s*(\{.*?\});', script_tag.string, re.DOTALL)
-                    if match:
-                        data = json.loads(match.group(1))
-                        car_count = 0
-                        for car in data.get('cars', []):
-                            all_cars.append(car)
-                            car_count += 1
-                        self.log(f"[{idx}] ✅ Found {car_count} cars from: {url}", "green")
-                    else:
-                        self.log(f"[{idx}] ❌ Cannot find JSON data in: {url}", "red")
+                    car_count = 0
+                    for car in data.get('cars', []):
+                        all_cars.append(car)
+                        car_count += 1
+                    self.log(f"[{idx}] ✅ Found {car_count} cars from: {url}", "green")
                 except Exception as e:
                     self.log(f"[{idx}] ❌ Error processing {url}: {e}", "red")
                 finally:
@@ -238,6 +228,8 @@ class CarScraperGUI:
 
             if not self.stop_event.is_set():
                 if all_cars:
+                    # merge=True: ไม่ทับเบอร์/ไมล์ที่ talarod_get_mileage_phone เติมไว้ใน store แล้ว
+                    upsert_listings("talad_rod", all_cars, key_from('cid'), merge=True)
                     save_path = filedialog.asksaveasfilename(
                         defaultextension=".json",
                         filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
@@ -256,7 +248,8 @@ class CarScraperGUI:
             self.log(f"Fatal error during scraping: {e}", "red")
         finally:
             if driver:
-                driver.quit()
+                quit_driver(driver, log=self.log)
+                get_limiter().report(log=self.log)
             self.running_scraper = False
             self.master.after(0, lambda: self.start_button.config(state=tk.NORMAL))
             self.master.after(0, lambda: self.stop_button.config(state=tk.DISABLED))
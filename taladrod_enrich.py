@@ -0,0 +1,113 @@
+import queue
+import re
+import threading
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from driver_factory import create_driver, collect_bandwidth, get_throttled, quit_driver
+
+DETAIL_URL = "https://www.taladrod.com/w40/icar/cardet.aspx?cid={cid}"
+MILEAGE_RE = re.compile(r'เลขไมล์\s*([\d,\.]+)\s*กม\.')
+
+
+def make_headless_driver():
+    """Create one isolated headless Chrome for a detail-page worker"""
+    # seller .text depends on CSS, so only images/fonts/media/trackers are blocked;
+    # never attach to the shared daemon browser, each worker needs its own
+    return create_driver(headless=True, attach=False)
+
+
+def needs_enrichment(item, retry_na=False):
+    """True if the car still has no phone/mileage/seller (or only N/A when retry_na)"""
+    fields = [item.get(key) for key in ("phone", "mileage", "sell_name")]
+    if any(value is None for value in fields):
+        return True
+    return retry_na and any(value == "N/A" for value in fields)
+
+
+def scrape_car_detail(driver, cid, strip_mileage_commas=False, render_timeout=5):
+    """Visit cardet.aspx for one CID and return its phone, mileage and seller name"""
+    # ความถี่ของ request ทุก worker ถูกคุมรวมกันด้วย rate limiter ของ host
+    get_throttled(driver, DETAIL_URL.format(cid=cid))
+    try:
+        WebDriverWait(driver, render_timeout).until(EC.presence_of_element_located((By.ID, "xTelNo")))
+    except Exception:
+        pass  # ไม่มีเบอร์โทรในหน้านี้ ดึงข้อมูลที่เหลือต่อ
+
+    # --- Extract phone ---
+    try:
+        tel_raw = driver.find_element(By.ID, "xTelNo").get_attribute("innerText")
+        phone_list = [num.strip() for num in tel_raw.split("\n") if num.strip()]
+        joined_phones = ", ".join(phone_list)
+    except Exception:
+        joined_phones = "N/A"
+
+    # --- Extract seller ---
+    try:
+        sell_name = driver.find_element(By.ID, 'xSeller').text
+    except Exception:
+        sell_name = "N/A"
+
+    # --- Extract mileage ---
+    match = MILEAGE_RE.search(driver.page_source)
+    mileage = match.group(1) if match else "N/A"
+    if strip_mileage_commas and match:
+        mileage = mileage.replace(',', '')
+
+    return {"phone": joined_phones, "mileage": mileage, "sell_name": sell_name}
+
+
+def enrich_with_pool(jobs, on_result, workers=4, make_driver=make_headless_driver,
+                     stop_event=None, log=print, **detail_kwargs):
+    """Enrich cars with N headless drivers pulling from one shared queue
+
+    ``jobs`` is a list of (index, item) pairs. Each worker owns its own
+    driver and calls ``on_result(index, item, result, error)`` for every car;
+    those calls are serialized under one lock, so the callback may update
+    ``item``, write the journal and report progress without extra locking.
+    On failure ``result`` holds N/A values and ``error`` the exception.
+    """
+    work = queue.Queue()
+    for job in jobs:
+        work.put(job)
+    stop_event = stop_event or threading.Event()
+    result_lock = threading.Lock()
+
+    def worker(worker_no):
+        try:
+            driver = make_driver()
+        except Exception as e:
+            log(f"❌ Worker {worker_no}: could not start WebDriver: {e}")
+            return
+        try:
+            while not stop_event.is_set():
+                try:
+                    index, item = work.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    result, error = scrape_car_detail(driver, item.get('cid'), **detail_kwargs), None
+                except Exception as e:
+                    result = {"phone": "N/A", "mileage": "N/A", "sell_name": "N/A"}
+                    error = e
+                collect_bandwidth(driver)
+                with result_lock:
+                    on_result(index, item, result, error)
+        finally:
+            quit_driver(driver, log=lambda msg: log(f"Worker {worker_no}: {msg}"))
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True)
+               for n in range(1, min(workers, len(jobs)) + 1)]
+    for thread in threads:
+        thread.start()
+    try:
+        # join แบบมี timeout เพื่อให้ Ctrl+C ยังทำงานได้
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        raise
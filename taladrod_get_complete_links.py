@@ -1,27 +1,20 @@
 import json
-import time
 
 # --- CONFIG ---
 INPUT_FILE = 'taladrod_links.json'
 OUTPUT_FILE = 'taladrod_complete_links.json'
 
 # --- SETUP CHROME WITH WEBDRIVER MANAGER ---
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_factory import (create_driver, chromedriver_service, collect_bandwidth, get_throttled, quit_driver,
+                            DATA_ONLY_BLOCK_TYPES)
+from rate_limiter import get_limiter
 
-# Setup Chrome Options
-options = Options()
-options.add_argument('--headless')  # Remove this line if you want to see the browser
-options.add_argument('--disable-gpu')
-options.add_argument('--no-sandbox')
+# Use Service wrapper for ChromeDriverManager (path cached between runs)
+service = chromedriver_service()
 
-# Use Service wrapper for ChromeDriverManager
-service = Service(ChromeDriverManager().install())
-
-# Create WebDriver with service and options
-driver = webdriver.Chrome(service=service, options=options)
+# Create WebDriver with service and options (only the <title> is read)
+driver = create_driver(headless=True,  # set False if you want to see the browser
+                       service=service, block_types=DATA_ONLY_BLOCK_TYPES)
 
 
 # --- READ JSON URL LIST ---
@@ -33,9 +26,9 @@ results = []
 # --- FETCH TITLE FOR EACH URL ---
 for url in url_list:
     try:
-        driver.get(url)
-        time.sleep(2)  # wait for page to load
+        get_throttled(driver, url)  # paced by the shared per-host rate limiter
         title = driver.title
+        collect_bandwidth(driver)
         results.append({'link': url, 'title': title})
         print(f"✅ {url} --> {title}")
     except Exception as e:
@@ -46,5 +39,6 @@ for url in url_list:
 with open(OUTPUT_FILE, 'w', encoding='utf-8-sig') as f:
     json.dump(results, f, ensure_ascii=False, indent=4)
 
-driver.quit()
+quit_driver(driver)
+get_limiter().report()
 print(f"\n📁 Saved titles to {OUTPUT_FILE}")
@@ -2,21 +2,73 @@ import json
 import os
 import pandas as pd
 
-
-def build_taladrod_database_from_json(input_filepath):
+from car_canon import canonical_brand, canonical_model, sub_model_from_name
+from car_template import CarRecord, ColumnarBuilder, concat_frames
+from formatter_output import output_path_for, write_output
+from json_stream import CHUNK_ROWS, frames_from_records, iter_json_array
+from listing_store import ListingStore, STORE_PATH
+
+
+def taladrod_car_info(car, source_name="talad_rod"):
+    """แปลงข้อมูลรถ 1 คันจาก Talad Rod ให้อยู่ในรูปแบบ template"""
+    # --- การคำนวณและทำความสะอาดข้อมูล ---
+    name_mmt = car.get('namemmt', '').strip()
+
+    # 1. ดึง Brand (คำแรกของชื่อ)
+    brand = name_mmt.split(' ')[0] if name_mmt else 'N/A'
+
+    # 2. ดึง Model
+    model = car.get('model', '')
+
+    # 3. คำนวณ Sub Model
+    sub_model = sub_model_from_name(name_mmt, brand, model)
+
+    # 4. ทำความสะอาด Price
+    price_str = car.get('prc', '0').replace(',', '')
+    price = float(price_str) if price_str.isdigit() else 'N/A'
+
+    # --- ส่วนที่แก้ไข: สร้าง Plate No. ตามที่ผู้ใช้กำหนด (JvNm + iPgVw) ---
+    province = car.get('jvnm', '').strip()
+    page_view_num = car.get('ipgvw', '').strip()
+    # นำข้อมูลมาต่อกัน ถ้ามีข้อมูลอย่างน้อยหนึ่งอย่าง
+    plate_no = f"{province}{page_view_num}" if province or page_view_num else "N/A"
+
+    # 6. สร้าง URL
+    car_id = car.get('cid')
+    page_url = f"https://www.taladrod.com/w/card/{car_id}" if car_id else "N/A"
+
+    return CarRecord(
+        sources=source_name,
+        brand=canonical_brand(brand),
+        model=canonical_model(brand, model),
+        sub_model=sub_model,
+        year=car.get('yr'),
+        price=price,
+        mileage=car.get('mileage'),
+        plate_no=plate_no,  # <-- ใช้ค่าที่คำนวณใหม่
+        seller_name=car.get('sell_name'),
+        phone_number=car.get('phone'),
+        url=page_url
+    )
+
+
+def build_taladrod_database_from_json(input_filepath, stream=True, chunk_rows=CHUNK_ROWS):
     """
     อ่านข้อมูลรถยนต์จากไฟล์ JSON ของ Talad Rod,
     ประมวลผลข้อมูล และแปลงเป็น Pandas DataFrame ตาม template
 
     Args:
         input_filepath (str): เส้นทางไปยังไฟล์ JSON ที่ต้องการอ่าน
+        stream (bool): True = อ่านทีละคันจาก array โดยไม่โหลดทั้งไฟล์ (หน่วยความจำคงที่)
+                       False = json.load ทั้งไฟล์แบบเดิม
+        chunk_rows (int): จำนวนคันต่อ DataFrame ย่อยก่อนนำมาต่อกัน
 
     Returns:
         pandas.DataFrame: ตารางข้อมูลรถยนต์ทั้งหมดที่ประมวลผลแล้ว
                           หรือ DataFrame ว่างถ้าไม่พบข้อมูล/ไฟล์
     """
     source_name = "talad_rod"
-    processed_data = []
+    frames = []
 
     if not os.path.exists(input_filepath):
         print(f"ผิดพลาด: ไม่พบไฟล์ '{input_filepath}' กรุณาตรวจสอบว่ามีไฟล์นี้อยู่จริง")
@@ -25,89 +77,86 @@ def build_taladrod_database_from_json(input_filepath):
     print(f"กำลังอ่านข้อมูลจากไฟล์ '{input_filepath}'...")
 
     try:
-        with open(input_filepath, 'r', encoding='utf-8') as f:
-            car_list = json.load(f)
-
-        for car in car_list:
-            # --- การคำนวณและทำความสะอาดข้อมูล ---
-            name_mmt = car.get('namemmt', '').strip()
-
-            # 1. ดึง Brand
-            brand = name_mmt.split(' ')[0] if name_mmt else 'N/A'
-
-            # 2. ดึง Model
-            model = car.get('model', '')
-
-            # 3. คำนวณ Sub Model
-            sub_model = name_mmt.replace(brand, '', 1).replace(model, '', 1).strip()
-
-            # 4. ทำความสะอาด Price
-            price_str = car.get('prc', '0').replace(',', '')
-            price = float(price_str) if price_str.isdigit() else 'N/A'
-
-            # --- ส่วนที่แก้ไข: สร้าง Plate No. ตามที่ผู้ใช้กำหนด (JvNm + iPgVw) ---
-            province = car.get('jvnm', '').strip()
-            page_view_num = car.get('ipgvw', '').strip()
-            # นำข้อมูลมาต่อกัน ถ้ามีข้อมูลอย่างน้อยหนึ่งอย่าง
-            plate_no = f"{province}{page_view_num}" if province or page_view_num else "N/A"
-
-            # 6. สร้าง URL
-            car_id = car.get('cid')
-            page_url = f"https://www.taladrod.com/w/card/{car_id}" if car_id else "N/A"
-
-            car_info = {
-                "Sources": source_name,
-                "Brand": brand,
-                "Model": model,
-                "Sub Model": sub_model,
-                "Year": car.get('yr'),
-                "Price": price,
-                "Mileage": car.get('mileage'),
-                "Plate No.": plate_no,  # <-- ใช้ค่าที่คำนวณใหม่
-                "Seller Name":  car.get('sell_name'),
-                "Phone Number": car.get('phone'),
-                "URL": page_url
-            }
-            processed_data.append(car_info)
-
-    except json.JSONDecodeError:
-        print(f"    คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {input_filepath} ได้")
+        if stream:
+            car_list = iter_json_array(input_filepath, encoding='utf-8')
+        else:
+            with open(input_filepath, 'r', encoding='utf-8') as f:
+                car_list = json.load(f)
+
+        # ประมวลผลทีละคัน แล้วสร้าง DataFrame ทีละ chunk_rows คัน
+        for frame in frames_from_records(car_list, lambda car: taladrod_car_info(car, source_name),
+                                         chunk_rows):
+            frames.append(frame)
+
+    except json.JSONDecodeError as e:
+        print(f"    คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {input_filepath} ได้ทั้งหมด ({e.msg})")
+        # โหมด stream จะเก็บรถที่อ่านได้ก่อนจุดที่ไฟล์เสียไว้ ผลลัพธ์จึงเป็นข้อมูลเพียงบางส่วน
+        if frames:
+            print(f"    คำเตือน: ข้อมูลไม่ครบ! ใช้ได้เพียง {sum(len(frame) for frame in frames)} รายการแรก "
+                  f"ก่อนจุดที่ไฟล์เสีย รายการหลังจากนั้นหายไปจากผลลัพธ์")
     except Exception as e:
         print(f"เกิดข้อผิดพลาดร้ายแรงขณะอ่านหรือประมวลผลไฟล์ JSON: {e}")
         return pd.DataFrame()
 
-    if not processed_data:
+    if not frames:
         print("ไม่พบข้อมูลที่สามารถประมวลผลได้ในไฟล์")
         return pd.DataFrame()
 
-    final_df = pd.DataFrame(processed_data)
-
-    column_order = [
-        "Sources", "Brand", "Model", "Sub Model", "Year",
-        "Price", "Mileage", "Plate No.", "Seller Name","Phone Number", "URL"
-    ]
-    final_df = final_df[column_order]
+    final_df = concat_frames(frames)
 
     return final_df
 
 
+def build_taladrod_database_from_store(store_path=STORE_PATH, changed_since=None):
+    """
+    อ่านข้อมูลดิบของ talad_rod จาก listing store (SQLite) แทนการอ่านไฟล์ JSON
+    และแปลงเป็น Pandas DataFrame ตาม template เดียวกัน
+
+    Args:
+        store_path (str): เส้นทางไปยังไฟล์ฐานข้อมูล listing store
+        changed_since (str): ถ้าระบุ จะอ่านเฉพาะรายการที่เปลี่ยนตั้งแต่เวลานี้ ("YYYY-mm-dd HH:MM:SS")
+
+    Returns:
+        pandas.DataFrame: ตารางข้อมูลรถยนต์ หรือ DataFrame ว่างถ้าไม่พบข้อมูล
+    """
+    if not os.path.exists(store_path):
+        print(f"ผิดพลาด: ไม่พบ listing store '{store_path}'")
+        return pd.DataFrame()
+
+    with ListingStore(store_path) as store:
+        all_cars_data = ColumnarBuilder().extend(taladrod_car_info(car)
+                                                 for car in store.iter_payloads("talad_rod", changed_since))
+
+    if not len(all_cars_data):
+        print("ไม่พบข้อมูลรถยนต์ใน listing store")
+        return pd.DataFrame()
+
+    return all_cars_data.to_frame()
+
+
 # --- ส่วนหลักของโปรแกรม ---
 if __name__ == "__main__":
     # --- ส่วนที่แก้ไข: เปลี่ยนชื่อไฟล์ Input ---
     DATA_FILE = 'talarod.json'
     OUTPUT_DIRECTORY = 'combined'
     OUTPUT_FILENAME = 'talad_rod_combined_data.csv'
+    READ_FROM_STORE = False  # True = อ่านจาก listing store (listings.db) แทนไฟล์ JSON
+    OUTPUT_FORMAT = 'csv'  # 'csv', 'parquet' หรือ 'dataset' (parquet แบ่งโฟลเดอร์ตาม Sources)
 
-    combined_dataframe = build_taladrod_database_from_json(DATA_FILE)
+    if READ_FROM_STORE:
+        combined_dataframe = build_taladrod_database_from_store()
+    else:
+        combined_dataframe = build_taladrod_database_from_json(DATA_FILE)
 
     if not combined_dataframe.empty:
         try:
             print(f"\nกำลังเตรียมบันทึกไฟล์... ตรวจสอบโฟลเดอร์ '{OUTPUT_DIRECTORY}'")
             os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
 
-            output_path = os.path.join(OUTPUT_DIRECTORY, OUTPUT_FILENAME)
+            output_path = output_path_for(OUTPUT_DIRECTORY, OUTPUT_FILENAME, OUTPUT_FORMAT)
 
-            combined_dataframe.to_csv(output_path, index=False, encoding='utf-8-sig')
+            # บันทึกเป็น CSV หรือ Parquet ตาม OUTPUT_FORMAT
+            write_output(combined_dataframe, output_path, OUTPUT_FORMAT)
 
             print("\n----------------------------------------------------")
             print("การประมวลผลเสร็จสมบูรณ์!")
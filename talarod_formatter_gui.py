@@ -7,19 +7,50 @@ import threading
 import sys
 from datetime import datetime
 
+from car_canon import canonical_brand, canonical_model, sub_model_from_name
+from car_template import CarRecord, concat_frames
+from formatter_output import write_output
+from json_stream import CHUNK_ROWS, frames_from_records, iter_json_array
+
 
 # ==============================================================================
 #  ส่วนตรรกะหลักในการประมวลผลข้อมูล (Logic Core)
 #  (ส่วนนี้ไม่มีการเปลี่ยนแปลง)
 # ==============================================================================
 
-def build_taladrod_database_from_json(input_filepath):
+def taladrod_car_info(car, source_name="talad_rod"):
+    """แปลงข้อมูลรถ 1 คันให้อยู่ในรูปแบบ template (ค่าที่ไม่มีใช้ 'N/A')"""
+    name_mmt = car.get('namemmt', '').strip()
+    brand = name_mmt.split(' ')[0] if name_mmt else 'N/A'
+    model = car.get('model', 'N/A')
+    sub_model = sub_model_from_name(name_mmt, brand, model)
+    if not sub_model:
+        sub_model = 'N/A'
+    price_str = str(car.get('prc', '0')).replace(',', '')
+    price = float(price_str) if price_str.isdigit() else 'N/A'
+    province = car.get('jvnm', '').strip()
+    page_view_num = car.get('ipgvw', '').strip()
+    plate_no = f"{province}{page_view_num}" if province or page_view_num else "N/A"
+    car_id = car.get('cid')
+    page_url = f"https://www.taladrod.com/w/card/{car_id}" if car_id else "N/A"
+
+    return CarRecord(
+        sources=source_name, brand=canonical_brand(brand), model=canonical_model(brand, model),
+        sub_model=sub_model, year=car.get('yr', 'N/A'),
+        price=price, mileage=car.get('mileage', 'N/A'),
+        plate_no=plate_no, seller_name=car.get('sell_name', 'N/A'),
+        phone_number=car.get('phone', 'N/A'), url=page_url
+    )
+
+
+def build_taladrod_database_from_json(input_filepath, stream=True, chunk_rows=CHUNK_ROWS):
     """
     อ่านข้อมูลรถยนต์จากไฟล์ JSON ของ Talad Rod,
     ประมวลผลข้อมูล และแปลงเป็น Pandas DataFrame ตาม template
+    stream=True จะอ่านทีละคันและสร้าง DataFrame ทีละ chunk_rows คัน หน่วยความจำจึงคงที่
     """
     source_name = "talad_rod"
-    processed_data = []
+    frames = []
 
     if not os.path.exists(input_filepath):
         print(f"(!) ผิดพลาด: ไม่พบไฟล์ '{input_filepath}'")
@@ -28,34 +59,19 @@ def build_taladrod_database_from_json(input_filepath):
     print(f"[*] กำลังอ่านข้อมูลจากไฟล์: '{os.path.basename(input_filepath)}'...")
 
     try:
-        with open(input_filepath, 'r', encoding='utf-8') as f:
-            car_list = json.load(f)
-
-        print(f"[*] พบข้อมูลรถยนต์ {len(car_list)} รายการ กำลังประมวลผล...")
-
-        for car in car_list:
-            name_mmt = car.get('namemmt', '').strip()
-            brand = name_mmt.split(' ')[0] if name_mmt else 'N/A'
-            model = car.get('model', 'N/A')
-            sub_model = name_mmt.replace(brand, '', 1).replace(model, '', 1).strip()
-            if not sub_model:
-                sub_model = 'N/A'
-            price_str = str(car.get('prc', '0')).replace(',', '')
-            price = float(price_str) if price_str.isdigit() else 'N/A'
-            province = car.get('jvnm', '').strip()
-            page_view_num = car.get('ipgvw', '').strip()
-            plate_no = f"{province}{page_view_num}" if province or page_view_num else "N/A"
-            car_id = car.get('cid')
-            page_url = f"https://www.taladrod.com/w/card/{car_id}" if car_id else "N/A"
-
-            car_info = {
-                "Sources": source_name, "Brand": brand, "Model": model,
-                "Sub Model": sub_model, "Year": car.get('yr', 'N/A'),
-                "Price": price, "Mileage": car.get('mileage', 'N/A'),
-                "Plate No.": plate_no, "Seller Name": car.get('sell_name', 'N/A'),
-                "Phone Number": car.get('phone', 'N/A'), "URL": page_url
-            }
-            processed_data.append(car_info)
+        if stream:
+            car_list = iter_json_array(input_filepath, encoding='utf-8')
+        else:
+            with open(input_filepath, 'r', encoding='utf-8') as f:
+                car_list = json.load(f)
+            print(f"[*] พบข้อมูลรถยนต์ {len(car_list)} รายการ กำลังประมวลผล...")
+
+        processed = 0
+        for frame in frames_from_records(car_list, lambda car: taladrod_car_info(car, source_name),
+                                         chunk_rows):
+            frames.append(frame)
+            processed += len(frame)
+            print(f"[*] ประมวลผลแล้ว {processed} รายการ...")
 
     except json.JSONDecodeError:
         print(f"(!) คำเตือน: ไม่สามารถอ่านข้อมูล JSON จากไฟล์ {input_filepath} ได้ รูปแบบไฟล์อาจไม่ถูกต้อง")
@@ -64,16 +80,11 @@ def build_taladrod_database_from_json(input_filepath):
         print(f"(!) เกิดข้อผิดพลาดร้ายแรงขณะอ่านหรือประมวลผลไฟล์ JSON: {e}")
         return pd.DataFrame()
 
-    if not processed_data:
+    if not frames:
         print("(!) ไม่พบข้อมูลที่สามารถประมวลผลได้ในไฟล์")
         return pd.DataFrame()
 
-    final_df = pd.DataFrame(processed_data)
-    column_order = [
-        "Sources", "Brand", "Model", "Sub Model", "Year",
-        "Price", "Mileage", "Plate No.", "Seller Name", "Phone Number", "URL"
-    ]
-    final_df = final_df[column_order]
+    final_df = concat_frames(frames)
     return final_df
 
 
@@ -136,9 +147,9 @@ class App(tk.Tk):
 
     def select_output_file(self):
         filepath = filedialog.asksaveasfilename(
-            title="เลือกตำแหน่งบันทึกไฟล์ CSV",
+            title="เลือกตำแหน่งบันทึกไฟล์ CSV หรือ Parquet",
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet"), ("All files", "*.*")]
         )
         if filepath:
             self.output_filepath.set(filepath)
@@ -166,11 +177,13 @@ class App(tk.Tk):
             df = build_taladrod_database_from_json(input_path)
 
             if not df.empty:
-                print(f"\n[*] กำลังเตรียมบันทึกไฟล์ CSV...")
+                # เลือกรูปแบบไฟล์จากนามสกุลที่ผู้ใช้ตั้ง
+                output_format = 'parquet' if output_path.lower().endswith('.parquet') else 'csv'
+                print(f"\n[*] กำลังเตรียมบันทึกไฟล์ {output_format.upper()}...")
                 output_dir = os.path.dirname(output_path)
                 if output_dir:
                     os.makedirs(output_dir, exist_ok=True)
-                df.to_csv(output_path, index=False, encoding='utf-8-sig')
+                write_output(df, output_path, output_format)
 
                 print("\n" + "-" * 50)
                 print("การประมวลผลเสร็จสมบูรณ์!")
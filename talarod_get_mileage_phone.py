@@ -1,13 +1,17 @@
 import json
-import time
-import re
 from tqdm import tqdm
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+
+from listing_store import key_from, upsert_listings
+from progress_journal import ProgressJournal
+from rate_limiter import get_limiter
+from taladrod_enrich import enrich_with_pool, needs_enrichment
 
 # --- Load JSON File ---
 filename = 'talarod.json'
+# เขียนผลลง journal ทีละบรรทัด และรวมกลับเข้าไฟล์หลักทุกๆ COMPACT_EVERY คัน
+COMPACT_EVERY = 500
+# จำนวน headless Chrome ที่เปิดพร้อมกัน (1 = ทีละคันแบบเดิม)
+WORKERS = 4
 
 try:
     with open(filename, 'r', encoding='utf-8') as f:
@@ -17,67 +21,49 @@ except Exception as e:
     print(f"❌ Error loading JSON: {e}")
     exit(1)
 
-# --- Setup Chrome Driver ---
-chrome_options = Options()
-chrome_options.add_argument("--headless")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--no-sandbox")
-driver = webdriver.Chrome(options=chrome_options)
-
-# --- Loop with tqdm progress bar ---
-for idx, item in enumerate(tqdm(data, desc="🚗 Processing", unit="car"), start=1):
-    cid = item.get('cid')
+journal = ProgressJournal(filename)
+resumed = journal.replay(data)
+if resumed:
+    print(f"🔁 Resumed {resumed} entries from {journal.journal_path}")
 
-    if not cid:
+# --- Build work list ---
+jobs = []
+for idx, item in enumerate(data, start=1):
+    if not item.get('cid'):
         tqdm.write(f"[{idx}] ❌ Missing CID — skipped.")
-        continue
-
-    if 'phone' in item and 'mileage' in item and 'sell_name' in item:
-        tqdm.write(f"[{idx}] ⏩ CID {cid} already processed — skipping.")
-        continue
+    elif needs_enrichment(item):
+        jobs.append((idx, item))
+print(f"⏩ {len(data) - len(jobs)} entries already processed or skipped, {len(jobs)} to visit with {WORKERS} workers.")
 
-    url = f"https://www.taladrod.com/w40/icar/cardet.aspx?cid={cid}"
-    tqdm.write(f"[{idx}] 🌐 Visiting: {url}")
+progress = tqdm(total=len(jobs), desc="🚗 Processing", unit="car")
 
-    try:
-        driver.get(url)
-        time.sleep(2)
 
-        # --- Extract phone ---
-        try:
-            tel_element = driver.find_element(By.ID, "xTelNo")
-            tel_raw = tel_element.get_attribute("innerText")
-            sell_raw = driver.find_element(By.ID,'xSeller')
-            phone_list = [num.strip() for num in tel_raw.split("\n") if num.strip()]
-            joined_phones = ", ".join(phone_list)
-        except Exception:
-            joined_phones = "N/A"
-
-        # --- Extract mileage ---
-        try:
-            page_text = driver.page_source
-            match = re.search(r'เลขไมล์\s*([\d,\.]+)\s*กม\.', page_text)
-            mileage = match.group(1) if match else "N/A"
-            sell_name = sell_raw.text
-        except Exception:
-            mileage = "N/A"
+def on_result(idx, item, result, error):
+    """Merge one worker result into the dataset (calls are serialized by the pool)"""
+    cid = item.get('cid')
+    item.update(result)
+    if error:
+        tqdm.write(f"[{idx}] ❌ Error for CID {cid}: {error}")
+    else:
+        tqdm.write(f"[{idx}] ✅ 📞 {result['phone']} | 🛞 {result['mileage']} | {result['sell_name']}")
 
-        # --- Update item ---
-        item["phone"] = joined_phones
-        item["mileage"] = mileage
-        item["sell_name"] = sell_name
-        tqdm.write(f"[{idx}] ✅ 📞 {joined_phones} | 🛞 {mileage} | {sell_name}")
+    # --- Journal after each item, compact periodically ---
+    journal.append(cid, result)
+    if journal.pending >= COMPACT_EVERY:
+        journal.compact(data)
+    progress.update(1)
 
-    except Exception as e:
-        item["phone"] = "N/A"
-        item["mileage"] = "N/A"
-        item["sell_name"] = "N/A"
-        tqdm.write(f"[{idx}] ❌ Error for CID {cid}: {e}")
 
-    # --- Save after each item ---
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# --- Run the worker pool ---
+try:
+    enrich_with_pool(jobs, on_result, workers=WORKERS, log=tqdm.write)
+finally:
+    progress.close()
+    get_limiter().report(log=tqdm.write)
+    # รวม journal เข้าไฟล์หลักแม้ถูกหยุดกลางคัน (Ctrl+C)
+    if journal.pending:
+        journal.compact(data)
+    # ส่งรถที่มีเบอร์/ไมล์แล้วเข้า listing store (แถวที่ไม่เปลี่ยนจะไม่ถูกนับว่าอัปเดต)
+    upsert_listings("talad_rod", data, key_from('cid'), merge=True)
 
-# --- Cleanup ---
-driver.quit()
-print(f"\n✅ All done! Updated file saved continuously to '{filename}'")
+print(f"\n✅ All done! Updated file saved to '{filename}'")
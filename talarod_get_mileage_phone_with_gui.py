@@ -1,12 +1,17 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 import json
-import time
-import re
 import threading
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+
+from listing_store import key_from, upsert_listings
+from progress_journal import ProgressJournal
+from rate_limiter import get_limiter
+from taladrod_enrich import enrich_with_pool, needs_enrichment
+
+# เขียนผลลง journal ทีละคัน และรวมกลับเข้าไฟล์หลักทุกๆ COMPACT_EVERY คัน
+COMPACT_EVERY = 500
+# จำนวน headless Chrome ที่เปิดพร้อมกัน
+WORKERS = 4
 
 
 # --- คลาสสำหรับสร้างแอปพลิเคชัน GUI ---
@@ -18,6 +23,7 @@ class CarScraperApp:
 
         self.data = []
         self.filepath = None
+        self.journal = None
         self.driver = None
         self.is_running = False
 
@@ -79,6 +85,10 @@ class CarScraperApp:
         self.log_widget.config(state='disabled')
         self.log_widget.see(tk.END)  # Auto-scroll
 
+    def log_threadsafe(self, message):
+        """ส่ง Log จาก worker thread ไปเขียนใน Main thread"""
+        self.master.after(0, self.log, message)
+
     def load_file(self):
         """เปิดหน้าต่างเพื่อเลือกไฟล์ JSON"""
         filepath = filedialog.askopenfilename(
@@ -98,6 +108,12 @@ class CarScraperApp:
             with open(self.filepath, 'r', encoding='utf-8') as f:
                 self.data = json.load(f)
             self.log(f"✅ Loaded {self.filepath} with {len(self.data)} entries.")
+            if self.journal:
+                self.journal.close()
+            self.journal = ProgressJournal(self.filepath)
+            resumed = self.journal.replay(self.data)
+            if resumed:
+                self.log(f"🔁 Resumed {resumed} entries from {self.journal.journal_path}")
             self.populate_listbox()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load or parse JSON file:\n{e}")
@@ -142,91 +158,59 @@ class CarScraperApp:
 
     def run_scraping(self, selected_indices):
         """กระบวนการ Scraping ที่จะรันใน Background Thread"""
-        self.log("\n--- Starting Scraping Process ---")
-        try:
-            # --- Setup Chrome Driver ---
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--no-sandbox")
-            driver = webdriver.Chrome(options=chrome_options)
-        except Exception as e:
-            self.log(
-                f"❌ Critical Error: Could not start WebDriver. Please check your Chrome/ChromeDriver installation. Error: {e}")
-            self.master.after(0, self.scraping_finished)  # เรียกฟังก์ชันจบการทำงานใน Main thread
-            return
-
-        total_selected = len(selected_indices)
-        for i, list_idx in enumerate(selected_indices):
-            item_index = list_idx  # Index ใน self.data ตรงกับใน listbox
-            item = self.data[item_index]
+        self.log_threadsafe("\n--- Starting Scraping Process ---")
+
+        jobs = []
+        for list_idx in selected_indices:
+            item = self.data[list_idx]  # Index ใน self.data ตรงกับใน listbox
+            if not item.get('cid'):
+                self.log_threadsafe(f"[{list_idx + 1}] ❌ Missing CID — skipped.")
+            elif not needs_enrichment(item, retry_na=True):
+                self.log_threadsafe(f"[{list_idx + 1}] ⏩ CID {item['cid']} already has full data — skipping.")
+            else:
+                jobs.append((list_idx, item))
+
+        total_jobs = len(jobs)
+        done = [0]
+        self.log_threadsafe(f"🚗 {total_jobs} cars to visit with {min(WORKERS, total_jobs)} browsers...")
+
+        def on_result(item_index, item, result, error):
+            # pool เรียกฟังก์ชันนี้ทีละครั้ง (serialized) จึงนับ progress ได้ถูกต้อง
+            done[0] += 1
             cid = item.get('cid')
-
-            self.log(f"--- ({i + 1}/{total_selected}) Processing CID: {cid} ---")
-
-            if not cid:
-                self.log(f"[{item_index + 1}] ❌ Missing CID — skipped.")
-                continue
-
-            # ใช้ `get` เพื่อป้องกัน lỗi ถ้า key ไม่มีอยู่
-            if item.get('phone') and item.get('mileage') and item.get('sell_name'):
-                if item['phone'] != 'N/A' and item['mileage'] != 'N/A' and item['sell_name'] != 'N/A':
-                    self.log(f"[{item_index + 1}] ⏩ CID {cid} already has full data — skipping.")
-                    continue
-
-            url = f"https://www.taladrod.com/w40/icar/cardet.aspx?cid={cid}"
-            self.log(f"[{item_index + 1}] 🌐 Visiting: {url}")
-
-            try:
-                driver.get(url)
-                time.sleep(2)  # รอให้หน้าเว็บโหลดสมบูรณ์
-
-                # --- Extract phone ---
-                try:
-                    tel_element = driver.find_element(By.ID, "xTelNo")
-                    tel_raw = tel_element.get_attribute("innerText")
-                    phone_list = [num.strip() for num in tel_raw.split("\n") if num.strip()]
-                    joined_phones = ", ".join(phone_list)
-                except Exception:
-                    joined_phones = "N/A"
-
-                # --- Extract mileage and seller ---
-                try:
-                    sell_raw = driver.find_element(By.ID, 'xSeller')
-                    sell_name = sell_raw.text
-                    page_text = driver.page_source
-                    match = re.search(r'เลขไมล์\s*([\d,\.]+)\s*กม\.', page_text)
-                    mileage = match.group(1).replace(',', '') if match else "N/A"
-                except Exception:
-                    mileage = "N/A"
-                    sell_name = "N/A"
-
-                # --- Update item ---
-                item["phone"] = joined_phones
-                item["mileage"] = mileage
-                item["sell_name"] = sell_name
-                self.log(f"[{item_index + 1}] ✅ 📞 {joined_phones} | 🛞 {mileage} km | 👤 {sell_name}")
-
+            item.update(result)
+            if error:
+                self.log_threadsafe(f"[{item_index + 1}] ❌ ({done[0]}/{total_jobs}) Error for CID {cid}: {error}")
+            else:
+                self.log_threadsafe(
+                    f"[{item_index + 1}] ✅ ({done[0]}/{total_jobs}) 📞 {result['phone']} | "
+                    f"🛞 {result['mileage']} km | 👤 {result['sell_name']}")
                 # --- อัปเดต Listbox ใน Main Thread ---
-                self.master.after(0, self.update_listbox_item, item_index, item)
+                self.master.after(0, self.update_listbox_item, item_index, dict(item))
 
-            except Exception as e:
-                item["phone"] = "N/A"
-                item["mileage"] = "N/A"
-                item["sell_name"] = "N/A"
-                self.log(f"[{item_index + 1}] ❌ Error for CID {cid}: {e}")
-
-            # --- Save after each item ---
+            # --- Journal after each item, compact periodically ---
             try:
-                with open(self.filepath, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, ensure_ascii=False, indent=2)
-                self.log(f"💾 Saved progress to {self.filepath}")
+                self.journal.append(cid, result)
+                if self.journal.pending >= COMPACT_EVERY:
+                    self.journal.compact(self.data)
+                    self.log_threadsafe(f"💾 Saved progress to {self.filepath}")
             except Exception as e:
-                self.log(f"❌ Error saving file: {e}")
+                self.log_threadsafe(f"❌ Error saving file: {e}")
+
+        if jobs:
+            enrich_with_pool(jobs, on_result, workers=WORKERS, log=self.log_threadsafe,
+                             strip_mileage_commas=True)
 
         # --- Cleanup ---
-        driver.quit()
-        self.log("\n✅ All selected cars processed! Updated file saved.")
+        get_limiter().report(log=self.log_threadsafe)
+        try:
+            if self.journal.pending:
+                self.journal.compact(self.data)
+            self.log_threadsafe(f"💾 Saved progress to {self.filepath}")
+            upsert_listings("talad_rod", self.data, key_from('cid'), merge=True)
+        except Exception as e:
+            self.log_threadsafe(f"❌ Error saving file: {e}")
+        self.log_threadsafe("\n✅ All selected cars processed! Updated file saved.")
         self.master.after(0, self.scraping_finished)  # เรียกฟังก์ชันจบการทำงานใน Main thread
 
     def update_listbox_item(self, index, item):